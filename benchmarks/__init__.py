@@ -0,0 +1 @@
+"""Offline benchmarks: synthetic clips and a fake Gemini backend, no API calls."""
@@ -0,0 +1,141 @@
+"""Deterministic stand-in for the Gemini backend."""
+
+from __future__ import annotations
+from types import SimpleNamespace
+import asyncio
+import datetime
+import hashlib
+import json
+import threading
+import time
+
+from google.genai import errors, types
+
+from src.analyzers import GeminiAnalyzer
+
+CANNED_RESPONSE = {
+    "overall_assessment": "LIKELY_AUTHENTIC",
+    "confidence": 0.2,
+    "book_analysis": {"book_detected": True, "title": "Synthetic", "author": "Benchmark",
+                      "likely_real_book": True, "spelling_issues": [], "ai_text_artifacts": [], "score": 0.2},
+    "movement_analysis": {"body_pacing": "natural", "movement_path_issues": [],
+                          "hand_tremor_detected": False, "impossible_physics": [], "score": 0.2},
+    "ai_signals": {"blending_artifacts": [], "lighting_issues": [], "temporal_anomalies": [],
+                   "body_part_anomalies": [], "score": 0.2},
+    "eye_analysis": {"observations": [], "abnormalities": [], "score": 0.2},
+    "identity_analysis": {"matches_reference": True, "consistency": "high", "score": 0.2},
+    "key_findings": [],
+    "evidence_frames": [],
+}
+
+
+class FakeModels:
+    """`client.models` / `client.aio.models` replacement that sleeps instead of calling the API."""
+
+    def __init__(self, latency: float, is_async: bool = False, counter: dict = None, caches: "FakeCaches" = None):
+        self.latency = latency
+        self.is_async = is_async
+        self.counter = counter if counter is not None else {"calls": 0}
+        self.caches = caches
+        self._lock = threading.Lock()
+
+    def _response(self, config):
+        cached_content = getattr(config, "cached_content", None)
+        cached_tokens = self.caches.tokens(cached_content) if cached_content and self.caches else None
+        with self._lock:
+            self.counter["calls"] += 1
+            if cached_content:
+                self.counter["cached_calls"] = self.counter.get("cached_calls", 0) + 1
+        text = "```json\n" + json.dumps(CANNED_RESPONSE) + "\n```"
+        return SimpleNamespace(text=text, usage_metadata=types.GenerateContentResponseUsageMetadata(
+            cached_content_token_count=cached_tokens))
+
+    def generate_content(self, model, contents, config=None):
+        if self.is_async:
+            return self._generate_async(config)
+        time.sleep(self.latency)
+        return self._response(config)
+
+    async def _generate_async(self, config):
+        await asyncio.sleep(self.latency)
+        return self._response(config)
+
+
+class FakeFiles:
+    """`client.files` replacement: uploads complete immediately and never expire in practice."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.uploads = 0
+
+    def upload(self, file, config=None):
+        time.sleep(self.latency)
+        self.uploads += 1
+        digest = hashlib.sha256(str(file).encode()).hexdigest()[:12]
+        return self.get(name=f"files/{digest}")
+
+    def get(self, name, config=None):
+        return types.File(
+            name=name, uri=f"https://fake.invalid/{name}", mime_type="video/mp4", state="ACTIVE",
+            expiration_time=datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(hours=48))
+
+
+class FakeCaches:
+    """`client.caches` replacement; a request naming an unknown or expired cache fails with 404 like the API."""
+
+    def __init__(self):
+        self.created = 0
+        self._expiry: dict = {}
+        self._tokens: dict = {}
+        self._lock = threading.Lock()
+
+    def create(self, model, config=None):
+        tokens = sum(len(p.text) // 4 + 1 if p.text else 258 for c in config.contents for p in c.parts)
+        with self._lock:
+            self.created += 1
+            name = f"cachedContents/{self.created}"
+            self._tokens[name] = tokens
+        return self.update(name=name, config=config)
+
+    def update(self, name, config=None):
+        with self._lock:
+            if name not in self._tokens:
+                raise errors.APIError(404, {"error": {"message": f"{name} not found", "status": "NOT_FOUND"}})
+            expire_time = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(
+                seconds=float(config.ttl.rstrip("s")))
+            self._expiry[name] = expire_time
+        return types.CachedContent(name=name, expire_time=expire_time)
+
+    def delete(self, name, config=None):
+        with self._lock:
+            self._tokens.pop(name, None)
+            self._expiry.pop(name, None)
+
+    def tokens(self, name: str) -> int:
+        with self._lock:
+            if name not in self._tokens or self._expiry[name] < datetime.datetime.now(datetime.timezone.utc):
+                raise errors.APIError(404, {"error": {"message": f"{name} not found", "status": "NOT_FOUND"}})
+            return self._tokens[name]
+
+
+class FakeGeminiClient:
+    """Minimal `genai.Client` look-alike with a fixed response latency."""
+
+    def __init__(self, latency: float = 0.5, upload_latency: float = 0.0):
+        self.counter = {"calls": 0}
+        self.caches = FakeCaches()
+        self.models = FakeModels(latency, counter=self.counter, caches=self.caches)
+        self.aio = SimpleNamespace(models=FakeModels(latency, is_async=True, counter=self.counter,
+                                                     caches=self.caches))
+        self.files = FakeFiles(upload_latency)
+
+
+class FakeGeminiAnalyzer(GeminiAnalyzer):
+    """The real analyzer (encoding, rate limiting, parsing) in front of a fake client."""
+
+    def __init__(self, latency: float = 0.5, upload_latency: float = 0.0, **kwargs):
+        super().__init__(client=FakeGeminiClient(latency, upload_latency), **kwargs)
+
+    @property
+    def calls(self) -> int:
+        return self.client.counter["calls"]
@@ -0,0 +1,235 @@
+"""Offline end-to-end benchmark: per-stage timings, memory and throughput without API calls.
+
+    python -m benchmarks.run --output bench.json
+    python -m benchmarks.run --quick --compare bench.json
+    python -m benchmarks.run --quick --decoders opencv,ffmpeg
+"""
+
+from __future__ import annotations
+from contextlib import contextmanager, redirect_stdout
+from pathlib import Path
+import argparse
+import io
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.fake_gemini import FakeGeminiAnalyzer
+from benchmarks.synthetic import VideoSpec, has_ffmpeg, make_photo, make_video
+from src.batch import BatchJob, run_batch
+from src.config import config
+from src.detector import DeepfakeDetector
+from src.preprocessing import VideoProcessor
+from src.preprocessing.ffmpeg_decoder import FFmpegDecoder
+
+DEFAULT_SPECS = [
+    VideoSpec(640, 360, 30, 10),
+    VideoSpec(1280, 720, 30, 10, audio=True),
+    VideoSpec(1920, 1080, 30, 10),
+    VideoSpec(1280, 720, 60, 20),
+]
+QUICK_SPECS = [
+    VideoSpec(640, 360, 30, 4),
+    VideoSpec(1280, 720, 30, 4, audio=True),
+]
+THROUGHPUT_SPEC = VideoSpec(640, 360, 30, 4)
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process so far (ru_maxrss is KB on Linux, bytes on macOS)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+@contextmanager
+def stage(stages: dict, name: str):
+    """Time a block into `stages[name]`, silencing the detector's progress output."""
+    record = stages.setdefault(name, {})
+    start = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        yield record
+    record["seconds"] = round(time.perf_counter() - start, 4)
+
+
+def bench_video(detector: DeepfakeDetector, photo: Path, video: Path, spec: VideoSpec, repeats: int) -> dict:
+    """Per-stage wall time for one clip; each stage keeps its best of `repeats` runs."""
+    best: dict = {}
+    for _ in range(repeats):
+        stages: dict = {}
+        with stage(stages, "probe"):
+            metadata = detector.video_processor.get_metadata(str(video))
+
+        with stage(stages, "scan") as record:
+            scanned = sum(1 for _ in detector.video_processor.iter_frames(
+                str(video), max_edge=config.face_analysis_max_edge, metadata=metadata))
+            record["frames"] = scanned
+
+        with stage(stages, "extract") as record:
+            extracted = detector._extract_planned_frames(str(video), metadata)[0]
+            record["frames"] = len(extracted.frames)
+
+        with stage(stages, "audio"):
+            if metadata.has_audio:
+                detector._transcribe_video(str(video))
+
+        with stage(stages, "gemini") as record:
+            ref_image = detector._load_reference(str(photo))
+            stats: dict = {}
+            detector.gemini_analyzer.analyze(ref_image, extracted.frames, "", stats)
+            record["payload_bytes"] = stats.get("payload_bytes", 0)
+        extracted.frames.close()
+
+        with stage(stages, "end_to_end"):
+            detector.analyze(reference_photo=str(photo), video_path=str(video))
+
+        for name, record in stages.items():
+            if name not in best or record["seconds"] < best[name]["seconds"]:
+                best[name] = record
+
+    for record in best.values():
+        if "frames" in record and record["seconds"] > 0:
+            record["frames_per_second"] = round(record["frames"] / record["seconds"], 1)
+    return {"video": spec.to_dict(), "decoder": detector.video_processor.decoder,
+            "has_audio": metadata.has_audio, "stages": best, "peak_rss_mb": peak_rss_mb()}
+
+
+def bench_throughput(detector: DeepfakeDetector, photo: Path, videos: list, levels: list) -> list:
+    """End-to-end clips/min and latency percentiles at each concurrency level.
+
+    Every job uses a distinct clip, so identical-request coalescing does not
+    flatter the numbers.
+    """
+    results = []
+    jobs = [BatchJob(id=video.stem, photo=str(photo), video=str(video)) for video in videos]
+    for level in levels:
+        with redirect_stdout(io.StringIO()):
+            summary = run_batch(detector, jobs, level, io.StringIO())
+        results.append({
+            "concurrency": level,
+            "jobs": summary["jobs"],
+            "failed": summary["failed"],
+            "wall_seconds": summary["wall_seconds"],
+            "throughput_per_minute": summary["throughput_per_minute"],
+            "latency_seconds": summary.get("latency_seconds", {}),
+            "peak_rss_mb": peak_rss_mb(),
+        })
+    return results
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=Path(__file__).resolve().parent, timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ""
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> list:
+    """Stages that got slower than `tolerance` (fractional) relative to the baseline."""
+    previous = {(s["video"]["name"], s.get("decoder", "opencv"), name): record["seconds"]
+                for s in baseline.get("scenarios", []) for name, record in s["stages"].items()}
+    regressions = []
+    for scenario in report["scenarios"]:
+        label = f"{scenario['video']['name']} [{scenario['decoder']}]"
+        for name, record in scenario["stages"].items():
+            before = previous.get((scenario["video"]["name"], scenario["decoder"], name))
+            if not before or before < 0.005:
+                continue
+            change = record["seconds"] / before - 1
+            line = f"{label:<42} {name:<12} {before:8.3f}s -> {record['seconds']:8.3f}s ({change:+.0%})"
+            print(line, file=sys.stderr)
+            if change > tolerance:
+                regressions.append(line)
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", "-o", help="Write the JSON report here (default: stdout)")
+    parser.add_argument("--quick", action="store_true", help="Small clips only, for a fast smoke run")
+    parser.add_argument("--latency", type=float, default=0.5, help="Fake Gemini response latency in seconds")
+    parser.add_argument("--repeats", type=int, default=2, help="Runs per clip; the best time per stage is kept")
+    parser.add_argument("--concurrency", default="1,2,4,8", help="Comma-separated throughput levels")
+    parser.add_argument("--decoders", default="opencv",
+                        help="Comma-separated video decoders to benchmark (opencv, ffmpeg)")
+    parser.add_argument("--workdir", help="Directory for generated clips (reused between runs)")
+    parser.add_argument("--compare", help="Baseline report to compare stage times against")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Allowed slowdown per stage before --compare fails (0.2 = 20%%)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    workdir = Path(args.workdir or Path(tempfile.gettempdir()) / "deepfake-bench")
+    specs = QUICK_SPECS if args.quick else DEFAULT_SPECS
+    levels = [int(level) for level in args.concurrency.split(",") if level]
+    decoders = [decoder for decoder in args.decoders.split(",") if decoder]
+    if "ffmpeg" in decoders and not FFmpegDecoder.available():
+        print("ffmpeg not found: skipping the ffmpeg decoder", file=sys.stderr)
+        decoders.remove("ffmpeg")
+    if not has_ffmpeg():
+        print("ffmpeg not found: clips are generated without audio", file=sys.stderr)
+        specs = [VideoSpec(s.width, s.height, s.fps, s.seconds) for s in specs]
+
+    print(f"Generating clips in {workdir}...", file=sys.stderr)
+    photo = make_photo(str(workdir))
+    videos = [(spec, make_video(spec, str(workdir))) for spec in specs]
+    throughput_videos = [make_video(THROUGHPUT_SPEC, str(workdir), seed=i + 1) for i in range(max(levels) * 2)]
+
+    with redirect_stdout(io.StringIO()):
+        detector = DeepfakeDetector(analyzer=FakeGeminiAnalyzer(latency=args.latency))
+    try:
+        scenarios = []
+        for decoder in decoders:
+            detector.video_processor = VideoProcessor(config.frame_extraction_fps, decoder=decoder)
+            for spec, video in videos:
+                print(f"Benchmarking {spec.name} ({decoder})...", file=sys.stderr)
+                scenarios.append(bench_video(detector, photo, video, spec, args.repeats))
+        print(f"Measuring throughput at concurrency {levels}...", file=sys.stderr)
+        throughput = bench_throughput(detector, photo, throughput_videos, levels)
+    finally:
+        detector.close()
+
+    report = {
+        "commit": git_commit(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "settings": {
+            "fake_latency_seconds": args.latency,
+            "repeats": args.repeats,
+            "max_analysis_frames": config.max_analysis_frames,
+            "frame_selection": config.frame_selection,
+            "frame_extraction_fps": config.frame_extraction_fps,
+            "local_face_analysis": detector.face_processor is not None,
+            "image_encoding": detector.gemini_analyzer.encoder.settings,
+        },
+        "scenarios": scenarios,
+        "throughput": throughput,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n")
+        print(f"Report written to {args.output}", file=sys.stderr)
+    else:
+        print(text)
+
+    if args.compare:
+        regressions = compare(report, json.loads(Path(args.compare).read_text()), args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} stage(s) slower than {args.tolerance:.0%}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Synthetic benchmark videos generated with OpenCV (audio muxed in with ffmpeg)."""
+
+from __future__ import annotations
+from dataclasses import asdict, dataclass
+from pathlib import Path
+import shutil
+import subprocess
+import wave
+
+import cv2
+import numpy as np
+
+
+@dataclass(frozen=True)
+class VideoSpec:
+    """Shape of one synthetic clip."""
+    width: int
+    height: int
+    fps: float
+    seconds: float
+    audio: bool = False
+
+    @property
+    def name(self) -> str:
+        return f"{self.width}x{self.height}_{self.fps:g}fps_{self.seconds:g}s{'_audio' if self.audio else ''}"
+
+    def to_dict(self) -> dict:
+        return {**asdict(self), "name": self.name}
+
+
+def has_ffmpeg() -> bool:
+    return shutil.which("ffmpeg") is not None
+
+
+def make_video(spec: VideoSpec, directory: str, seed: int = 0) -> Path:
+    """Write a clip with moving shapes, texture and a frame counter; reuse it if it already exists.
+
+    Content varies over time so frame selection and encoding behave as they
+    would on real footage rather than on a flat color.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / (f"{spec.name}_seed{seed}.mp4" if seed else f"{spec.name}.mp4")
+    if path.exists():
+        return path
+
+    silent_path = path.with_suffix(".silent.mp4") if spec.audio else path
+    rng = np.random.default_rng(seed)
+    texture = rng.integers(0, 40, (spec.height, spec.width, 3), dtype=np.uint8)
+    ys, xs = np.mgrid[0:spec.height, 0:spec.width]
+    background = np.stack([xs * 255 // max(1, spec.width - 1),
+                           ys * 255 // max(1, spec.height - 1),
+                           np.full_like(xs, 96)], axis=-1).astype(np.uint8)
+    background = cv2.add(background, texture)
+
+    writer = cv2.VideoWriter(str(silent_path), cv2.VideoWriter_fourcc(*"mp4v"), spec.fps,
+                             (spec.width, spec.height))
+    total = int(round(spec.fps * spec.seconds))
+    radius = max(8, min(spec.width, spec.height) // 8)
+    frame = np.empty_like(background)
+    for i in range(total):
+        t = i / spec.fps
+        np.copyto(frame, background)
+        cx = int((0.5 + 0.35 * np.sin(t * 1.3)) * spec.width)
+        cy = int((0.5 + 0.3 * np.cos(t * 0.9)) * spec.height)
+        cv2.circle(frame, (cx, cy), radius, (30, 200, 240), -1)
+        cv2.rectangle(frame, (spec.width - cx - radius, cy // 2),
+                      (spec.width - cx + radius, cy // 2 + radius), (220, 60, 60), -1)
+        cv2.putText(frame, f"{i:05d}", (10, spec.height - 10), cv2.FONT_HERSHEY_SIMPLEX,
+                    max(0.5, spec.height / 480), (255, 255, 255), 2)
+        writer.write(frame)
+    writer.release()
+
+    if spec.audio:
+        _mux_audio(silent_path, path, spec.seconds)
+        silent_path.unlink(missing_ok=True)
+    return path
+
+
+def _mux_audio(video_path: Path, output_path: Path, seconds: float, sample_rate: int = 16000):
+    """Add a tone with speech-like on/off bursts as an AAC track."""
+    wav_path = video_path.with_suffix(".wav")
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    envelope = (np.sin(2 * np.pi * 0.5 * t) > -0.2).astype(np.float32)
+    samples = (0.3 * envelope * np.sin(2 * np.pi * 220 * t) * 32767).astype(np.int16)
+    with wave.open(str(wav_path), "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(samples.tobytes())
+    try:
+        subprocess.run(["ffmpeg", "-y", "-loglevel", "error", "-i", str(video_path), "-i", str(wav_path),
+                        "-c:v", "copy", "-c:a", "aac", "-shortest", str(output_path)],
+                       check=True, capture_output=True, timeout=120)
+    finally:
+        wav_path.unlink(missing_ok=True)
+
+
+def make_photo(directory: str, size: int = 512) -> Path:
+    """Reference photo matching the synthetic clips' palette."""
+    path = Path(directory) / "reference.jpg"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if not path.exists():
+        image = np.full((size, size, 3), 96, dtype=np.uint8)
+        cv2.circle(image, (size // 2, size // 2), size // 3, (30, 200, 240), -1)
+        cv2.imwrite(str(path), image)
+    return path
@@ -1,7 +1,7 @@
 """Deepfake Detection Tool - Main Package."""
 
-from src.detector import DeepfakeDetector
-from src.models import DetectionResult, DetectionVerdict
+from src.detector import DeepfakeDetector, PreparedReference
+from src.models import DetectionResult, DetectionVerdict, SessionResult
 
 __version__ = "1.0.0"
-__all__ = ["DeepfakeDetector", "DetectionResult", "DetectionVerdict"]
+__all__ = ["DeepfakeDetector", "DetectionResult", "DetectionVerdict", "PreparedReference", "SessionResult"]
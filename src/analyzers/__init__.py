@@ -1,5 +1,7 @@
 """Analyzer modules."""
 
+from src.analyzers.encoding import ImageEncoder
 from src.analyzers.gemini import GeminiAnalyzer
+from src.analyzers.schema import GeminiReport, parse_report
 
-__all__ = ["GeminiAnalyzer"]
+__all__ = ["GeminiAnalyzer", "GeminiReport", "ImageEncoder", "parse_report"]
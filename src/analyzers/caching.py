@@ -0,0 +1,102 @@
+"""Gemini explicit context caching of the static request prefix."""
+
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Optional
+import time
+
+from google.genai import errors, types
+
+from src.config import config
+from src.analyzers.calls import estimate_tokens, request_key
+from src.analyzers.registry import ExpiringRegistry
+from src.utils.tracing import span
+
+CACHE_MODES = ("off", "prompt", "reference")
+# Leading request parts each mode caches: the prompt, or prompt + "Reference Photo" label + image
+PREFIX_PARTS = {"off": 0, "prompt": 1, "reference": 3}
+
+
+@dataclass
+class CachedContext:
+    """Handle to a cached request prefix on the Gemini API."""
+    name: str
+    expires_at: float
+    tokens: int = 0
+
+
+class ContextCacheRegistry(ExpiringRegistry):
+    """Maps request prefixes to cached contents so they are sent (and billed) in full only once.
+
+    The key is the model plus a content hash of the prefix parts, in the API
+    key's namespace. Entries whose TTL is running out are extended with
+    `caches.update` rather than recreated; expired ones are dropped and created
+    again. Prefixes estimated below `min_tokens` (the API's minimum for a
+    cache) are not cached, and a prefix the API refuses to cache is remembered
+    so later requests go inline without asking again.
+    """
+
+    entry_type = CachedContext
+
+    def __init__(self, path: str = None, ttl: float = None, refresh: float = None, min_tokens: int = None):
+        super().__init__(path, expiry_margin=30.0)
+        self.ttl = config.context_cache_ttl if ttl is None else ttl
+        self.refresh = config.context_cache_refresh if refresh is None else refresh
+        self.min_tokens = config.context_cache_min_tokens if min_tokens is None else min_tokens
+        self._refused: set = set()
+
+    def key(self, model: str, parts: list, namespace: str = "") -> str:
+        return f"{namespace}:{request_key(model, parts)}"
+
+    def get_or_create(self, client, model: str, parts: list, namespace: str = "") -> Optional[tuple]:
+        """Return (key, handle) for a cached prefix, creating or extending it as needed; None to send inline."""
+        tokens = estimate_tokens(parts, output_tokens=0)
+        if tokens < self.min_tokens:
+            return None
+        key = self.key(model, parts, namespace)
+        if key in self._refused:
+            return None
+        with self.key_lock(key), span("context_cache", tokens=tokens) as attrs:
+            entry = self.get(key)
+            if entry and entry.expires_at - time.time() < self.refresh:
+                entry = self._extend(client, key, entry)
+                attrs["refreshed"] = entry is not None
+            if entry is None:
+                try:
+                    entry = self._create(client, model, parts, tokens)
+                except errors.APIError as e:
+                    print(f"Context caching unavailable ({e}); sending the full request")
+                    attrs["error"] = str(e)
+                    if e.code == 400:
+                        with self._lock:
+                            self._refused.add(key)
+                    return None
+                attrs["created"] = True
+                self.put(key, entry)
+            return key, entry
+
+    def _create(self, client, model: str, parts: list, tokens: int) -> CachedContext:
+        cache = client.caches.create(model=model, config=types.CreateCachedContentConfig(
+            contents=[types.UserContent(parts=[_as_part(p) for p in parts])],
+            ttl=f"{int(self.ttl)}s", display_name="deepfake-detector-prefix"))
+        return CachedContext(name=cache.name, expires_at=self._expiry(cache), tokens=tokens)
+
+    def _extend(self, client, key: str, entry: CachedContext) -> Optional[CachedContext]:
+        """Push back the expiry of a live cache; None (and the entry dropped) if the API no longer has it."""
+        try:
+            cache = client.caches.update(name=entry.name, config=types.UpdateCachedContentConfig(
+                ttl=f"{int(self.ttl)}s"))
+        except errors.APIError:
+            self.invalidate(key)
+            return None
+        entry = CachedContext(name=entry.name, expires_at=self._expiry(cache), tokens=entry.tokens)
+        self.put(key, entry)
+        return entry
+
+    def _expiry(self, cache) -> float:
+        expire_time = getattr(cache, "expire_time", None)
+        return expire_time.timestamp() if expire_time else time.time() + self.ttl
+
+
+def _as_part(part) -> types.Part:
+    return types.Part.from_text(text=part) if isinstance(part, str) else part
@@ -0,0 +1,343 @@
+"""Shared Gemini call layer: rate limiting, retries and request coalescing."""
+
+from __future__ import annotations
+from concurrent.futures import Future
+from typing import Callable, Optional
+import asyncio
+import hashlib
+import io
+import itertools
+import json
+import random
+import re
+import threading
+import time
+
+from google.genai import errors, types
+from PIL import Image
+
+from src.config import config
+from src.utils.tracing import span
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+# Gemini bills an image up to 384px as 258 tokens and larger ones per 768px tile
+IMAGE_TOKENS = 258
+IMAGE_TILE = 768
+# Video is sampled at 1 fps (258 tokens/frame) plus 32 tokens/s of audio
+VIDEO_TOKENS_PER_SECOND = 290
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a call cannot be completed before its deadline."""
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at `per_minute / 60` per second.
+
+    The balance may go negative: callers debit up front and then sleep for the
+    returned delay, so concurrent callers queue up in arrival order instead of
+    polling.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, amount: float, now: float) -> float:
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return max(0.0, (amount - self.tokens) / self.rate)
+
+    def debit(self, amount: float):
+        self.tokens -= min(amount, self.capacity)
+
+    def credit(self, amount: float):
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute limits shared by all callers of one API key.
+
+    A rate-limit response from the server pauses every caller, not just the one
+    that received it, so a burst backs off together instead of storming.
+    """
+
+    def __init__(self, rpm: float = None, tpm: float = None):
+        rpm = config.gemini_rpm if rpm is None else rpm
+        tpm = config.gemini_tpm if tpm is None else tpm
+        self.requests = TokenBucket(rpm) if rpm > 0 else None
+        self.tokens = TokenBucket(tpm) if tpm > 0 else None
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens: int, max_wait: float = None) -> float:
+        """Reserve one request and `tokens`; returns the seconds to wait before sending.
+
+        Raises DeadlineExceeded without reserving anything if the wait would
+        exceed `max_wait`.
+        """
+        with self._lock:
+            now = time.monotonic()
+            wait = max(0.0, self._paused_until - now)
+            if self.requests:
+                wait = max(wait, self.requests.delay(1, now))
+            if self.tokens:
+                wait = max(wait, self.tokens.delay(tokens, now))
+            if max_wait is not None and wait > max_wait:
+                raise DeadlineExceeded(f"Rate limit wait of {wait:.1f}s exceeds deadline")
+            if self.requests:
+                self.requests.debit(1)
+            if self.tokens:
+                self.tokens.debit(tokens)
+            return wait
+
+    def settle(self, estimated: int, actual: int):
+        """Correct the token bucket once the real usage of a request is known."""
+        if self.tokens and actual:
+            with self._lock:
+                if actual > estimated:
+                    self.tokens.debit(actual - estimated)
+                else:
+                    self.tokens.credit(estimated - actual)
+
+    def refund(self, tokens: int):
+        """Return the tokens reserved for a request that failed without consuming them.
+
+        The request itself still counts against the requests-per-minute limit.
+        """
+        if self.tokens:
+            with self._lock:
+                self.tokens.credit(min(tokens, self.tokens.capacity))
+
+    def pause(self, seconds: float):
+        """Hold back all callers for `seconds`, e.g. after a 429."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+_limiters: dict = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(api_key: str) -> RateLimiter:
+    """Return the process-wide limiter for an API key, creating it on first use."""
+    key = hashlib.sha256(api_key.encode()).hexdigest()
+    with _limiters_lock:
+        if key not in _limiters:
+            _limiters[key] = RateLimiter()
+        return _limiters[key]
+
+
+def estimate_tokens(parts: list, output_tokens: int = None) -> int:
+    """Rough input + expected output token count for a list of content parts."""
+    total = config.gemini_output_tokens if output_tokens is None else output_tokens
+    for part in parts:
+        if isinstance(part, str):
+            total += len(part) // 4 + 1
+        elif getattr(part, "inline_data", None) is not None:
+            total += IMAGE_TOKENS * _image_tiles(part.inline_data.data)
+        elif getattr(part, "text", None):
+            total += len(part.text) // 4 + 1
+    return total
+
+
+def _image_tiles(data: bytes) -> int:
+    """Number of 768px tiles Gemini bills for an encoded image, read from its header."""
+    try:
+        width, height = Image.open(io.BytesIO(data)).size
+    except Exception:
+        return 1
+    if max(width, height) <= 384:
+        return 1
+    return -(-width // IMAGE_TILE) * -(-height // IMAGE_TILE)
+
+
+def request_key(model: str, parts: list, cached_content: str = None) -> str:
+    """Content hash of a request, used to coalesce identical concurrent calls."""
+    digest = hashlib.sha256(model.encode())
+    if cached_content:
+        digest.update(b"c" + cached_content.encode())
+    for part in parts:
+        if isinstance(part, str):
+            digest.update(b"t" + part.encode())
+        elif getattr(part, "inline_data", None) is not None:
+            digest.update(b"i" + part.inline_data.mime_type.encode() + part.inline_data.data)
+        else:
+            digest.update(b"p" + json.dumps(part.model_dump(mode="json", exclude_none=True),
+                                            sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Whether an error is worth retrying: rate limits, server errors and transport failures."""
+    if isinstance(error, errors.APIError):
+        return error.code in RETRYABLE_STATUS
+    return isinstance(error, (ConnectionError, TimeoutError)) or type(error).__module__.startswith("httpx")
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """Server-suggested delay from a Retry-After header or a RetryInfo detail, if any."""
+    response = getattr(error, "response", None)
+    header = getattr(response, "headers", {}).get("retry-after") if response is not None else None
+    if header:
+        try:
+            return float(header)
+        except ValueError:
+            pass
+    match = re.search(r"retryDelay['\"]?\s*:\s*['\"](\d+(?:\.\d+)?)s", str(getattr(error, "details", "")))
+    return float(match.group(1)) if match else None
+
+
+class GeminiCaller:
+    """Sends generate_content requests through a shared limiter with retries and coalescing.
+
+    Each attempt reserves capacity from the rate limiter before it is sent,
+    and a failed attempt gives its tokens back. Retryable failures back off
+    with full jitter (or the server's suggested delay) until `max_retries` or
+    the deadline runs out. Identical requests already in flight share one
+    network call; callers that join an in-flight request get its result or
+    its error.
+    """
+
+    def __init__(self, client, model_name: str, limiter: RateLimiter, max_retries: int = None,
+                 deadline: float = None, backoff_base: float = None, backoff_max: float = None):
+        self.client = client
+        self.model_name = model_name
+        self.limiter = limiter
+        self.max_retries = config.gemini_max_retries if max_retries is None else max_retries
+        self.deadline = config.gemini_deadline if deadline is None else deadline
+        self.backoff_base = config.gemini_backoff_base if backoff_base is None else backoff_base
+        self.backoff_max = config.gemini_backoff_max if backoff_max is None else backoff_max
+        self._inflight: dict = {}
+        self._inflight_lock = threading.Lock()
+
+    def generate(self, parts: list, generation_config: dict = None, tokens: int = None) -> str:
+        """Blocking generate_content call; returns the response text.
+
+        `tokens` overrides the estimated usage, e.g. for parts that reference
+        uploaded files the estimate cannot see into.
+        """
+        key = request_key(self.model_name, parts, (generation_config or {}).get("cached_content"))
+        future, leader = self._join(key)
+        if not leader:
+            with span("gemini_request", coalesced=True):
+                return future.result()
+        self._lead(future, key, lambda: self._generate(parts, generation_config, tokens))
+        return future.result()
+
+    async def generate_async(self, parts: list, generation_config: dict = None, tokens: int = None) -> str:
+        """Async generate_content call; returns the response text."""
+        key = request_key(self.model_name, parts, (generation_config or {}).get("cached_content"))
+        future, leader = self._join(key)
+        if leader:
+            try:
+                future.set_result(await self._generate_async(parts, generation_config, tokens))
+            except BaseException as e:
+                future.set_exception(e)
+            finally:
+                self._leave(key)
+            return future.result()
+        with span("gemini_request", coalesced=True):
+            return await asyncio.wrap_future(future)
+
+    def _join(self, key: str):
+        """Return (future, True) for the first caller of a request, else the in-flight future."""
+        with self._inflight_lock:
+            if key in self._inflight:
+                return self._inflight[key], False
+            future = self._inflight[key] = Future()
+            return future, True
+
+    def _leave(self, key: str):
+        with self._inflight_lock:
+            self._inflight.pop(key, None)
+
+    def _lead(self, future: Future, key: str, call: Callable[[], str]):
+        try:
+            future.set_result(call())
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            self._leave(key)
+
+    def _generate(self, parts: list, generation_config: dict = None, tokens: int = None) -> str:
+        estimated = tokens or estimate_tokens(parts)
+        deadline = time.monotonic() + self.deadline
+        with span("gemini_request", estimated_tokens=estimated) as attrs:
+            # _backoff raises once retries or the deadline run out, so the loop ends by returning or raising
+            for attempt in itertools.count():
+                attrs["attempts"] = attempt + 1
+                wait = self.limiter.reserve(estimated, max_wait=deadline - time.monotonic())
+                attrs["rate_limit_wait"] = attrs.get("rate_limit_wait", 0.0) + wait
+                time.sleep(wait)
+                try:
+                    response = self.client.models.generate_content(
+                        model=self.model_name, contents=parts,
+                        config=self._request_config(generation_config, deadline))
+                except Exception as e:
+                    self.limiter.refund(estimated)
+                    time.sleep(self._backoff(e, attempt, deadline))
+                    continue
+                self._settle(estimated, response, attrs)
+                return response.text
+
+    async def _generate_async(self, parts: list, generation_config: dict = None, tokens: int = None) -> str:
+        estimated = tokens or estimate_tokens(parts)
+        deadline = time.monotonic() + self.deadline
+        with span("gemini_request", estimated_tokens=estimated) as attrs:
+            # _backoff raises once retries or the deadline run out, so the loop ends by returning or raising
+            for attempt in itertools.count():
+                attrs["attempts"] = attempt + 1
+                wait = self.limiter.reserve(estimated, max_wait=deadline - time.monotonic())
+                attrs["rate_limit_wait"] = attrs.get("rate_limit_wait", 0.0) + wait
+                await asyncio.sleep(wait)
+                try:
+                    response = await self.client.aio.models.generate_content(
+                        model=self.model_name, contents=parts,
+                        config=self._request_config(generation_config, deadline))
+                except Exception as e:
+                    self.limiter.refund(estimated)
+                    await asyncio.sleep(self._backoff(e, attempt, deadline))
+                    continue
+                self._settle(estimated, response, attrs)
+                return response.text
+
+    @staticmethod
+    def _request_config(generation_config: Optional[dict], deadline: float) -> types.GenerateContentConfig:
+        """Per-request config whose HTTP timeout ends at the call's deadline."""
+        remaining_ms = max(1000, int((deadline - time.monotonic()) * 1000))
+        return types.GenerateContentConfig(**(generation_config or {}),
+                                           http_options=types.HttpOptions(timeout=remaining_ms))
+
+    def _backoff(self, error: Exception, attempt: int, deadline: float) -> float:
+        """Delay before the next attempt; re-raises `error` if it should not be retried."""
+        if not is_retryable(error) or attempt >= self.max_retries:
+            raise error
+        suggested = retry_after(error)
+        delay = suggested if suggested is not None else random.uniform(
+            0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        if time.monotonic() + delay >= deadline:
+            raise error
+        print(f"Gemini request failed ({error}); retrying in {delay:.1f}s")
+        if isinstance(error, errors.APIError) and error.code == 429:
+            # Everyone waits out a rate limit; the next reserve() sleeps until it ends
+            self.limiter.pause(delay)
+            return 0.0
+        return delay
+
+    def _settle(self, estimated: int, response, attrs: dict):
+        usage = getattr(response, "usage_metadata", None)
+        actual = getattr(usage, "total_token_count", None) or 0
+        if actual:
+            attrs["total_tokens"] = actual
+        cached = getattr(usage, "cached_content_token_count", None)
+        if cached:
+            attrs["cached_tokens"] = cached
+        self.limiter.settle(estimated, actual)
@@ -0,0 +1,79 @@
+"""Image payload encoding for Gemini uploads."""
+
+from __future__ import annotations
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import List, Sequence
+import io
+import threading
+import cv2
+import numpy as np
+from PIL import Image
+
+from src.config import config
+
+
+@dataclass
+class EncodedImage:
+    """Compressed image ready to send as an inline request part."""
+    data: bytes
+    mime_type: str
+    width: int
+    height: int
+
+
+class ImageEncoder:
+    """Downscales RGB arrays to a target long edge and compresses them as JPEG or WebP.
+
+    Encoding releases the GIL in OpenCV and Pillow, so batches are encoded in a
+    small thread pool shared by all requests using this encoder.
+    """
+
+    MIME_TYPES = {"jpeg": "image/jpeg", "webp": "image/webp"}
+
+    def __init__(self, max_edge: int = None, image_format: str = None, quality: int = None,
+                 workers: int = None):
+        self.max_edge = config.image_max_edge if max_edge is None else max_edge
+        self.image_format = (image_format or config.image_format).lower()
+        self.quality = config.image_quality if quality is None else quality
+        self.workers = workers or config.image_encode_workers
+        if self.image_format not in self.MIME_TYPES:
+            raise ValueError(f"Unsupported image format: {self.image_format}")
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    @property
+    def settings(self) -> dict:
+        """Settings that change the encoded bytes."""
+        return {"max_edge": self.max_edge, "format": self.image_format, "quality": self.quality}
+
+    def encode(self, image: np.ndarray) -> EncodedImage:
+        """Downscale (never upscale) and compress one RGB image."""
+        h, w = image.shape[:2]
+        if self.max_edge and max(h, w) > self.max_edge:
+            scale = self.max_edge / max(h, w)
+            image = cv2.resize(image, (max(1, round(w * scale)), max(1, round(h * scale))),
+                               interpolation=cv2.INTER_AREA)
+        buffer = io.BytesIO()
+        Image.fromarray(image).save(buffer, format=self.image_format.upper(), quality=self.quality)
+        return EncodedImage(
+            data=buffer.getvalue(),
+            mime_type=self.MIME_TYPES[self.image_format],
+            width=image.shape[1],
+            height=image.shape[0],
+        )
+
+    def encode_many(self, images: Sequence[np.ndarray]) -> List[EncodedImage]:
+        """Encode images in parallel, preserving order."""
+        if len(images) <= 1 or self.workers <= 1:
+            return [self.encode(image) for image in images]
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="image-encode")
+        return list(self._pool.map(self.encode, images))
+
+    def close(self):
+        """Shut down the encoding pool."""
+        if self._pool:
+            self._pool.shutdown(wait=False)
+            self._pool = None
@@ -1,65 +1,259 @@
 """Gemini API integration for multimodal deepfake analysis."""
 
 from __future__ import annotations
-from typing import List
-import json
-import re
+from typing import Optional, Sequence, Union
+import asyncio
+import hashlib
+from pathlib import Path
 import numpy as np
-from PIL import Image
 from google import genai
+from google.genai import errors, types
 
 from src.config import config
-from src.analyzers.prompts import DEEPFAKE_ANALYSIS_PROMPT
+from src.analyzers.caching import PREFIX_PARTS, ContextCacheRegistry
+from src.analyzers.calls import GeminiCaller, VIDEO_TOKENS_PER_SECOND, estimate_tokens, get_rate_limiter
+from src.analyzers.encoding import EncodedImage, ImageEncoder
+from src.analyzers.prompts import DEEPFAKE_ANALYSIS_PROMPT, VIDEO_ANALYSIS_PROMPT
+from src.analyzers.schema import ResponseError, parse_report, response_schema
+from src.analyzers.uploads import UploadRegistry
+from src.utils.tracing import run_in_executor, span
+
+# A reference photo as an RGB array, or already encoded for the request
+Reference = Union[np.ndarray, EncodedImage]
 
 
 class GeminiAnalyzer:
-    """Uses Gemini for multimodal deepfake detection."""
+    """Uses Gemini for multimodal deepfake detection.
+    
+    Requests go through a `GeminiCaller`, which shares a rate limiter with
+    every analyzer using the same API key, retries transient errors and
+    coalesces identical concurrent requests.
+    
+    `analyze` sends sampled frames; `analyze_video` uploads the whole video
+    through the Files API instead, reusing earlier uploads of the same content.
+    The reference photo may be passed already encoded, so a caller checking
+    several videos against one photo encodes it once.
+    A `client` can be injected (e.g. a local fake), in which case no API key
+    is needed.
     
-    def __init__(self, api_key: str = None):
+    Responses are requested as JSON constrained by a response schema (see
+    `src.analyzers.schema`) and validated into a `GeminiReport` in one pass.
+    
+    Every request starts with the same prompt and, for a given person, the
+    same reference photo. With `context_cache` set to "prompt" or "reference"
+    that prefix is stored as explicit cached content and requests carry only
+    the rest; prefixes below the API's minimum size are sent inline.
+    """
+    
+    def __init__(self, api_key: str = None, encoder: Optional[ImageEncoder] = None, client=None,
+                 uploads: Optional[UploadRegistry] = None, caches: Optional[ContextCacheRegistry] = None,
+                 context_cache: str = None):
         self.api_key = api_key or config.gemini_api_key
-        if not self.api_key:
+        if client is None and not self.api_key:
             raise ValueError("Gemini API key required")
-        self.client = genai.Client(api_key=self.api_key)
+        self.client = client or genai.Client(api_key=self.api_key)
         self.model_name = config.gemini_model
+        self.caller = GeminiCaller(self.client, self.model_name, get_rate_limiter(self.api_key or "local"))
+        self.max_frames = config.max_analysis_frames
+        self.prompt = DEEPFAKE_ANALYSIS_PROMPT
+        self.video_prompt = VIDEO_ANALYSIS_PROMPT
+        self.encoder = encoder or ImageEncoder()
+        self.uploads = uploads or UploadRegistry(config.upload_registry or None)
+        self.context_cache = context_cache or config.context_cache
+        if self.context_cache not in PREFIX_PARTS:
+            raise ValueError(f"Unknown context cache mode {self.context_cache!r}; use one of {list(PREFIX_PARTS)}")
+        self.caches = caches or ContextCacheRegistry(config.context_cache_registry or None)
+        self.generation_config = self._generation_config(video=False)
+        self.video_generation_config = self._generation_config(video=True)
+        # Uploaded files belong to the project of the key that uploaded them
+        self._namespace = hashlib.sha256((self.api_key or "local").encode()).hexdigest()[:16]
     
-    def analyze(self, reference: np.ndarray, frames: List[np.ndarray], transcription: str = "") -> dict:
-        """Perform multimodal analysis using Gemini."""
-        prompt = DEEPFAKE_ANALYSIS_PROMPT
-        if transcription:
-            prompt += f"\n\n## Audio Transcription:\n{transcription}"
+    def analyze(self, reference: Reference, frames: Sequence[np.ndarray], transcription: str = "",
+                stats: Optional[dict] = None) -> dict:
+        """Perform multimodal analysis using Gemini.
         
-        # Build content parts
-        parts = [prompt, "\n\n## Reference Photo:"]
-        parts.append(Image.fromarray(reference))
-        parts.append("\n\n## Video Frames (in order):")
-        
-        max_frames, step = 8, max(1, len(frames) // 8)
-        for i, idx in enumerate(range(0, len(frames), step)):
-            if i >= max_frames:
-                break
-            parts.append(f"\nFrame {i+1}:")
-            parts.append(Image.fromarray(frames[idx]))
+        If `stats` is given it receives the number of images and encoded bytes sent.
+        """
+        parts = self._build_parts(reference, frames, transcription, stats)
+        try:
+            return self._parse_response(self._generate(parts, self.generation_config))
+        except Exception as e:
+            print(f"Gemini API error: {e}")
+            return {"error": str(e), "overall_assessment": "INCONCLUSIVE", "confidence": 0.5}
+    
+    async def analyze_async(self, reference: Reference, frames: Sequence[np.ndarray],
+                            transcription: str = "", stats: Optional[dict] = None) -> dict:
+        """Perform multimodal analysis using the async Gemini client."""
+        loop = asyncio.get_running_loop()
+        parts = await run_in_executor(loop, self._build_parts, reference, frames, transcription, stats)
+        try:
+            return self._parse_response(await self._generate_async(parts, self.generation_config))
+        except Exception as e:
+            print(f"Gemini API error: {e}")
+            return {"error": str(e), "overall_assessment": "INCONCLUSIVE", "confidence": 0.5}
+    
+    def analyze_video(self, reference: Reference, video_path: str, duration_seconds: float = 0.0,
+                      stats: Optional[dict] = None) -> dict:
+        """Analyze the whole video through the Files API, reusing a previous upload when possible.
         
+        If the server rejects a reused handle (deleted or expired early), the
+        video is uploaded again once.
+        """
+        try:
+            for attempt in range(2):
+                parts, tokens = self._build_video_parts(reference, video_path, duration_seconds, stats)
+                try:
+                    return self._parse_response(self._generate(parts, self.video_generation_config, tokens))
+                except errors.APIError as e:
+                    if attempt or not self._stale_upload(e, video_path):
+                        raise
+        except Exception as e:
+            print(f"Gemini API error: {e}")
+            return {"error": str(e), "overall_assessment": "INCONCLUSIVE", "confidence": 0.5}
+    
+    async def analyze_video_async(self, reference: Reference, video_path: str, duration_seconds: float = 0.0,
+                                  stats: Optional[dict] = None) -> dict:
+        """Async variant of `analyze_video`; the upload runs in the loop's default executor."""
+        loop = asyncio.get_running_loop()
         try:
-            response = self.client.models.generate_content(
-                model=self.model_name,
-                contents=parts
-            )
-            return self._parse_response(response.text)
+            for attempt in range(2):
+                parts, tokens = await run_in_executor(
+                    loop, self._build_video_parts, reference, video_path, duration_seconds, stats)
+                try:
+                    return self._parse_response(await self._generate_async(
+                        parts, self.video_generation_config, tokens))
+                except errors.APIError as e:
+                    if attempt or not self._stale_upload(e, video_path):
+                        raise
         except Exception as e:
             print(f"Gemini API error: {e}")
             return {"error": str(e), "overall_assessment": "INCONCLUSIVE", "confidence": 0.5}
     
+    def _build_video_parts(self, reference: Reference, video_path: str, duration_seconds: float,
+                           stats: Optional[dict] = None) -> tuple:
+        """Upload (or reuse) the video and build request parts plus their estimated token count."""
+        with span("upload") as attrs:
+            handle, uploaded = self.uploads.get_or_upload(self.client, video_path, self._namespace)
+            attrs.update(uploaded=uploaded, bytes=Path(video_path).stat().st_size if uploaded else 0)
+        with span("encode") as attrs:
+            encoded, = self._encode(reference, [])
+            attrs.update(images=1, bytes=len(encoded.data))
+        parts = [
+            self.video_prompt,
+            "\n\n## Reference Photo:",
+            types.Part.from_bytes(data=encoded.data, mime_type=encoded.mime_type),
+            "\n\n## Video:",
+            types.Part.from_uri(file_uri=handle.uri, mime_type=handle.mime_type),
+        ]
+        tokens = estimate_tokens(parts) + int(VIDEO_TOKENS_PER_SECOND * max(1.0, duration_seconds))
+        
+        if stats is not None:
+            stats["images"] = 1
+            stats["video_uploaded"] = uploaded
+            stats["payload_bytes"] = (len(encoded.data) + len(self.video_prompt.encode())
+                                      + (Path(video_path).stat().st_size if uploaded else 0))
+        return parts, tokens
+    
+    def _generate(self, parts: list, generation_config: dict, tokens: int = None) -> str:
+        """Call Gemini with the cacheable prefix replaced by cached content when possible."""
+        tokens = tokens or estimate_tokens(parts)
+        cached = self._cached_request(parts, generation_config)
+        if cached:
+            key, request_parts, request_config = cached
+            try:
+                return self.caller.generate(request_parts, request_config, tokens=tokens)
+            except errors.APIError as e:
+                if not self._stale_cache(e, key):
+                    raise
+        return self.caller.generate(parts, generation_config, tokens=tokens)
+    
+    async def _generate_async(self, parts: list, generation_config: dict, tokens: int = None) -> str:
+        tokens = tokens or estimate_tokens(parts)
+        loop = asyncio.get_running_loop()
+        cached = await run_in_executor(loop, self._cached_request, parts, generation_config)
+        if cached:
+            key, request_parts, request_config = cached
+            try:
+                return await self.caller.generate_async(request_parts, request_config, tokens=tokens)
+            except errors.APIError as e:
+                if not self._stale_cache(e, key):
+                    raise
+        return await self.caller.generate_async(parts, generation_config, tokens=tokens)
+    
+    def _cached_request(self, parts: list, generation_config: dict) -> Optional[tuple]:
+        """(cache key, remaining parts, config naming the cached content), or None to send everything."""
+        prefix = PREFIX_PARTS[self.context_cache]
+        if not prefix:
+            return None
+        cached = self.caches.get_or_create(self.client, self.model_name, parts[:prefix], self._namespace)
+        if cached is None:
+            return None
+        key, entry = cached
+        return key, parts[prefix:], {**generation_config, "cached_content": entry.name}
+    
+    def _stale_cache(self, error: errors.APIError, key: str) -> bool:
+        """Drop cached content the server no longer accepts; True if the full request should be sent."""
+        if error.code not in (403, 404):
+            return False
+        print("Cached context is no longer available; sending the full request")
+        self.caches.invalidate(key)
+        return True
+    
+    def _stale_upload(self, error: errors.APIError, video_path: str) -> bool:
+        """Drop a reused file handle the server no longer accepts; True if a retry makes sense."""
+        if error.code not in (403, 404):
+            return False
+        print("Uploaded video is no longer available; uploading again")
+        self.uploads.invalidate(self.uploads.key(video_path, self._namespace))
+        return True
+    
+    def _build_parts(self, reference: Reference, frames: Sequence[np.ndarray], transcription: str,
+                     stats: Optional[dict] = None) -> list:
+        """Build the prompt, encoded reference photo and sampled frames as request content parts."""
+        max_frames = self.max_frames
+        step = max(1, len(frames) // max_frames)
+        selected = [frames[idx] for idx in range(0, len(frames), step)][:max_frames]
+        with span("encode") as attrs:
+            encoded = self._encode(reference, selected)
+            attrs.update(images=len(encoded), bytes=sum(len(e.data) for e in encoded))
+        images = [types.Part.from_bytes(data=e.data, mime_type=e.mime_type) for e in encoded]
+        
+        # Build content parts
+        # Prompt and reference first, so they form a cacheable prefix
+        parts = [self.prompt, "\n\n## Reference Photo:"]
+        parts.append(images[0])
+        if transcription:
+            parts.append(f"\n\n## Audio Transcription:\n{transcription}")
+        parts.append("\n\n## Video Frames (in order):")
+        for i, image in enumerate(images[1:]):
+            parts.append(f"\nFrame {i+1}:")
+            parts.append(image)
+        
+        if stats is not None:
+            stats["images"] = len(encoded)
+            stats["payload_bytes"] = (sum(len(e.data) for e in encoded) + len(self.prompt.encode())
+                                      + len(transcription.encode()))
+        return parts
+    
+    def _encode(self, reference: Reference, frames: list) -> list:
+        """Encode the reference (unless it already is) followed by the frames."""
+        if isinstance(reference, EncodedImage):
+            return [reference] + self.encoder.encode_many(frames)
+        return self.encoder.encode_many([reference] + frames)
+    
+    def close(self):
+        """Release the encoding pool."""
+        self.encoder.close()
+    
+    @staticmethod
+    def _generation_config(video: bool) -> dict:
+        return {"response_mime_type": "application/json", "response_schema": response_schema(video)}
+    
     def _parse_response(self, text: str) -> dict:
-        """Parse Gemini's JSON response."""
-        json_match = re.search(r'```json\s*(.*?)\s*```', text, re.DOTALL)
-        if json_match:
+        """Validate Gemini's JSON response into the dict the detector consumes."""
+        with span("parse", chars=len(text or "")) as attrs:
             try:
-                return json.loads(json_match.group(1))
-            except json.JSONDecodeError:
-                pass
-        try:
-            return json.loads(text)
-        except json.JSONDecodeError:
-            return {"raw_response": text, "overall_assessment": "INCONCLUSIVE", "confidence": 0.5}
-
+                return parse_report(text).to_dict()
+            except ResponseError as e:
+                attrs["error"] = str(e)
+                return {"raw_response": text, "overall_assessment": "INCONCLUSIVE", "confidence": 0.5}
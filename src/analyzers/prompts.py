@@ -1,6 +1,8 @@
 """Gemini prompts for deepfake analysis."""
 
-DEEPFAKE_ANALYSIS_PROMPT = """You are an expert deepfake detection analyst. Analyze the provided video frames and reference photo for signs of video manipulation or AI generation.
+from src.analyzers.schema import MAX_EVIDENCE, MAX_ITEMS, MAX_KEY_FINDINGS
+
+DEEPFAKE_ANALYSIS_PROMPT = f"""You are an expert deepfake detection analyst. Analyze the provided video frames and reference photo for signs of video manipulation or AI generation.
 
 ## Analysis Tasks:
 
@@ -45,40 +47,13 @@ DEEPFAKE_ANALYSIS_PROMPT = """You are an expert deepfake detection analyst. Anal
    - Match person to reference photo
    - Check face consistency across all frames
 
-## Response Format (JSON):
-```json
-{
-    "overall_assessment": "LIKELY_DEEPFAKE | LIKELY_AUTHENTIC | INCONCLUSIVE",
-    "confidence": 0.0-1.0,
-    "book_analysis": {
-        "book_detected": true/false,
-        "title": "string or null",
-        "author": "string or null",
-        "likely_real_book": true/false,
-        "spelling_issues": ["list of errors"],
-        "ai_text_artifacts": ["list of artifacts"],
-        "score": 0.0-1.0
-    },
-    "movement_analysis": {
-        "body_pacing": "natural/robotic/jerky",
-        "movement_path_issues": ["list of issues"],
-        "hand_tremor_detected": true/false,
-        "impossible_physics": ["list"],
-        "score": 0.0-1.0
-    },
-    "ai_signals": {
-        "blending_artifacts": ["list"],
-        "lighting_issues": ["list"],
-        "temporal_anomalies": ["list"],
-        "body_part_anomalies": ["list"],
-        "score": 0.0-1.0
-    },
-    "eye_analysis": {"observations": [], "abnormalities": [], "score": 0.0-1.0},
-    "identity_analysis": {"matches_reference": true/false, "consistency": "high/medium/low", "score": 0.0-1.0},
-    "key_findings": ["list of most important findings"],
-    "evidence_frames": [{"frame_index": 0, "issue": "description"}]
-}
-```
+## Response Format:
+Respond with JSON following the response schema. Every score is 0.0-1.0: 0.0=authentic, 0.5=uncertain, 1.0=deepfake ("confidence" is your confidence in the overall assessment). Keep list items to one short phrase, give at most {MAX_ITEMS} items per list ({MAX_KEY_FINDINGS} key findings, {MAX_EVIDENCE} evidence frames) with the most significant first, and return an empty list when nothing was found."""
+
+
+VIDEO_MODE_NOTE = """
 
-Score: 0.0=authentic, 0.5=uncertain, 1.0=deepfake. Be thorough and analytical."""
+## Input Note:
+The complete video (with its audio track) is attached instead of sampled frames. Use the full motion and the audio, including lip sync between speech and mouth movement. Evidence items carry "timestamp_seconds" (seconds from the start of the video)."""
 
+VIDEO_ANALYSIS_PROMPT = DEEPFAKE_ANALYSIS_PROMPT + VIDEO_MODE_NOTE
@@ -0,0 +1,76 @@
+"""Persistent, thread-safe registry of expiring server-side handles."""
+
+from __future__ import annotations
+from dataclasses import asdict
+from pathlib import Path
+from typing import Any, Dict, Optional
+import json
+import os
+import threading
+import time
+
+
+class ExpiringRegistry:
+    """Thread-safe map of keys to server-side handles that expire.
+
+    Entries are dataclasses of `entry_type` with an `expires_at` timestamp.
+    They are reused until `expiry_margin` seconds before they expire and can
+    be persisted to a JSON file so handles survive restarts. `key_lock` gives
+    one lock per key, so concurrent requests for the same handle wait for a
+    single creation.
+    """
+
+    entry_type: type = None
+
+    def __init__(self, path: str = None, expiry_margin: float = 0.0):
+        self.path = Path(path) if path else None
+        self.expiry_margin = expiry_margin
+        self._entries: Dict[str, Any] = self._load()
+        self._lock = threading.Lock()
+        self._key_locks: Dict[str, threading.Lock] = {}
+
+    def _load(self) -> dict:
+        if not self.path or not self.path.exists():
+            return {}
+        try:
+            with open(self.path) as f:
+                return {key: self.entry_type(**entry) for key, entry in json.load(f).items()}
+        except (OSError, ValueError, TypeError) as e:
+            print(f"Ignoring unreadable registry {self.path}: {e}")
+            return {}
+
+    def _save(self):
+        """Write the registry atomically; caller holds `_lock`."""
+        if not self.path:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump({key: asdict(entry) for key, entry in self._entries.items()}, f)
+        os.replace(tmp_path, self.path)
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return a handle that is still comfortably before expiry, dropping stale ones."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry.expires_at - self.expiry_margin > time.time():
+                return entry
+            if entry:
+                del self._entries[key]
+                self._save()
+            return None
+
+    def put(self, key: str, entry: Any):
+        with self._lock:
+            self._entries[key] = entry
+            self._save()
+
+    def invalidate(self, key: str):
+        """Forget a handle the server no longer accepts."""
+        with self._lock:
+            if self._entries.pop(key, None):
+                self._save()
+
+    def key_lock(self, key: str) -> threading.Lock:
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
@@ -0,0 +1,264 @@
+"""Response schema for Gemini's analysis and a single-pass validator for its output."""
+
+from __future__ import annotations
+from dataclasses import asdict, dataclass, field
+from typing import List, Optional
+import json
+
+from google.genai import types
+
+ASSESSMENTS = ("LIKELY_DEEPFAKE", "LIKELY_AUTHENTIC", "INCONCLUSIVE")
+PACING = ("natural", "robotic", "jerky")
+CONSISTENCY = ("high", "medium", "low")
+
+# Caps keep output tokens (and generation time) bounded
+MAX_ITEMS = 4
+MAX_KEY_FINDINGS = 5
+MAX_EVIDENCE = 6
+MAX_TEXT = 160
+
+
+def _text_list(max_items: int = MAX_ITEMS) -> dict:
+    return {"type": "ARRAY", "items": {"type": "STRING", "max_length": MAX_TEXT}, "max_items": max_items}
+
+
+def _score() -> dict:
+    return {"type": "NUMBER", "minimum": 0.0, "maximum": 1.0}
+
+
+def _object(properties: dict) -> dict:
+    return {"type": "OBJECT", "properties": properties, "required": list(properties),
+            "property_ordering": list(properties)}
+
+
+def response_schema(video: bool = False) -> types.Schema:
+    """Schema matching what the detector consumes; video mode reports evidence by timestamp."""
+    evidence_key = ("timestamp_seconds", {"type": "NUMBER", "minimum": 0.0}) if video else \
+        ("frame_index", {"type": "INTEGER", "minimum": 0})
+    return types.Schema.model_validate(_object({
+        "overall_assessment": {"type": "STRING", "enum": list(ASSESSMENTS)},
+        "confidence": _score(),
+        "book_analysis": _object({
+            "book_detected": {"type": "BOOLEAN"},
+            "title": {"type": "STRING", "nullable": True, "max_length": MAX_TEXT},
+            "author": {"type": "STRING", "nullable": True, "max_length": MAX_TEXT},
+            "likely_real_book": {"type": "BOOLEAN"},
+            "spelling_issues": _text_list(),
+            "ai_text_artifacts": _text_list(),
+            "score": _score(),
+        }),
+        "movement_analysis": _object({
+            "body_pacing": {"type": "STRING", "enum": list(PACING)},
+            "movement_path_issues": _text_list(),
+            "hand_tremor_detected": {"type": "BOOLEAN"},
+            "impossible_physics": _text_list(),
+            "score": _score(),
+        }),
+        "ai_signals": _object({
+            "blending_artifacts": _text_list(),
+            "lighting_issues": _text_list(),
+            "temporal_anomalies": _text_list(),
+            "body_part_anomalies": _text_list(),
+            "score": _score(),
+        }),
+        "eye_analysis": _object({
+            "observations": _text_list(),
+            "abnormalities": _text_list(),
+            "score": _score(),
+        }),
+        "identity_analysis": _object({
+            "matches_reference": {"type": "BOOLEAN"},
+            "consistency": {"type": "STRING", "enum": list(CONSISTENCY)},
+            "score": _score(),
+        }),
+        "key_findings": _text_list(MAX_KEY_FINDINGS),
+        "evidence_frames": {"type": "ARRAY", "max_items": MAX_EVIDENCE, "items": _object({
+            evidence_key[0]: evidence_key[1],
+            "issue": {"type": "STRING", "max_length": MAX_TEXT},
+        })},
+    }))
+
+
+class ResponseError(ValueError):
+    """Gemini's response is not a JSON object."""
+
+
+@dataclass
+class BookAnalysis:
+    book_detected: bool = False
+    title: Optional[str] = None
+    author: Optional[str] = None
+    likely_real_book: bool = True
+    spelling_issues: List[str] = field(default_factory=list)
+    ai_text_artifacts: List[str] = field(default_factory=list)
+    score: float = 0.5
+
+
+@dataclass
+class MovementAnalysis:
+    body_pacing: str = "natural"
+    movement_path_issues: List[str] = field(default_factory=list)
+    hand_tremor_detected: bool = False
+    impossible_physics: List[str] = field(default_factory=list)
+    score: float = 0.5
+
+
+@dataclass
+class AISignals:
+    blending_artifacts: List[str] = field(default_factory=list)
+    lighting_issues: List[str] = field(default_factory=list)
+    temporal_anomalies: List[str] = field(default_factory=list)
+    body_part_anomalies: List[str] = field(default_factory=list)
+    score: float = 0.5
+
+
+@dataclass
+class EyeAnalysis:
+    observations: List[str] = field(default_factory=list)
+    abnormalities: List[str] = field(default_factory=list)
+    score: float = 0.5
+
+
+@dataclass
+class IdentityAnalysis:
+    matches_reference: bool = False
+    consistency: str = "unknown"
+    score: float = 0.5
+
+
+@dataclass
+class EvidenceItem:
+    issue: str = ""
+    frame_index: Optional[int] = None
+    timestamp_seconds: Optional[float] = None
+
+
+@dataclass
+class GeminiReport:
+    """Validated analysis; sections Gemini left out are None."""
+    overall_assessment: str = "INCONCLUSIVE"
+    confidence: float = 0.5
+    book_analysis: Optional[BookAnalysis] = None
+    movement_analysis: Optional[MovementAnalysis] = None
+    ai_signals: Optional[AISignals] = None
+    eye_analysis: Optional[EyeAnalysis] = None
+    identity_analysis: Optional[IdentityAnalysis] = None
+    key_findings: List[str] = field(default_factory=list)
+    evidence_frames: List[EvidenceItem] = field(default_factory=list)
+
+    def to_dict(self) -> dict:
+        """Plain dict in the shape `DeepfakeDetector` consumes and caches."""
+        data = {key: value for key, value in asdict(self).items() if value is not None}
+        data["evidence_frames"] = [{k: v for k, v in item.items() if v is not None}
+                                   for item in data["evidence_frames"]]
+        return data
+
+
+def parse_report(text: str) -> GeminiReport:
+    """Decode and validate a response in one pass over the JSON.
+
+    Scores are clamped to [0, 1], lists are truncated to the schema caps,
+    unknown enum values fall back to neutral defaults and unexpected keys are
+    dropped, so a response that is valid JSON always yields a usable report.
+    Raises ResponseError when the text is not a JSON object.
+    """
+    text = (text or "").strip()
+    if text.startswith("```"):
+        # Tolerate a fenced block from models or backends without schema support
+        text = text.split("\n", 1)[-1].rsplit("```", 1)[0]
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError as e:
+        raise ResponseError(f"Response is not valid JSON: {e}") from None
+    if not isinstance(data, dict):
+        raise ResponseError("Response is not a JSON object")
+
+    return GeminiReport(
+        overall_assessment=_choice(data.get("overall_assessment"), ASSESSMENTS, "INCONCLUSIVE"),
+        confidence=_unit(data.get("confidence")),
+        book_analysis=_section(data, "book_analysis", lambda s: BookAnalysis(
+            book_detected=bool(s.get("book_detected", False)),
+            title=_optional_text(s.get("title")),
+            author=_optional_text(s.get("author")),
+            likely_real_book=bool(s.get("likely_real_book", True)),
+            spelling_issues=_texts(s.get("spelling_issues")),
+            ai_text_artifacts=_texts(s.get("ai_text_artifacts")),
+            score=_unit(s.get("score")),
+        )),
+        movement_analysis=_section(data, "movement_analysis", lambda s: MovementAnalysis(
+            body_pacing=_choice(s.get("body_pacing"), PACING, "natural"),
+            movement_path_issues=_texts(s.get("movement_path_issues")),
+            hand_tremor_detected=bool(s.get("hand_tremor_detected", False)),
+            impossible_physics=_texts(s.get("impossible_physics")),
+            score=_unit(s.get("score")),
+        )),
+        ai_signals=_section(data, "ai_signals", lambda s: AISignals(
+            blending_artifacts=_texts(s.get("blending_artifacts")),
+            lighting_issues=_texts(s.get("lighting_issues")),
+            temporal_anomalies=_texts(s.get("temporal_anomalies")),
+            body_part_anomalies=_texts(s.get("body_part_anomalies")),
+            score=_unit(s.get("score")),
+        )),
+        eye_analysis=_section(data, "eye_analysis", lambda s: EyeAnalysis(
+            observations=_texts(s.get("observations")),
+            abnormalities=_texts(s.get("abnormalities")),
+            score=_unit(s.get("score")),
+        )),
+        identity_analysis=_section(data, "identity_analysis", lambda s: IdentityAnalysis(
+            matches_reference=bool(s.get("matches_reference", False)),
+            consistency=_choice(s.get("consistency"), CONSISTENCY, "unknown"),
+            score=_unit(s.get("score")),
+        )),
+        key_findings=_texts(data.get("key_findings"), MAX_KEY_FINDINGS),
+        evidence_frames=[item for item in map(_evidence, _items(data.get("evidence_frames"), MAX_EVIDENCE))
+                         if item is not None],
+    )
+
+
+def _section(data: dict, key: str, build):
+    value = data.get(key)
+    return build(value) if isinstance(value, dict) else None
+
+
+def _unit(value, default: float = 0.5) -> float:
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return default
+    return default if number != number else min(1.0, max(0.0, number))
+
+
+def _choice(value, choices: tuple, default: str) -> str:
+    if isinstance(value, str):
+        for choice in choices:
+            if value.strip().lower() == choice.lower():
+                return choice
+    return default
+
+
+def _optional_text(value) -> Optional[str]:
+    if value is None or value == "":
+        return None
+    return str(value)[:MAX_TEXT]
+
+
+def _items(value, limit: int) -> list:
+    return value[:limit] if isinstance(value, list) else []
+
+
+def _texts(value, limit: int = MAX_ITEMS) -> List[str]:
+    return [str(item)[:MAX_TEXT] for item in _items(value, limit) if item not in (None, "")]
+
+
+def _evidence(value) -> Optional[EvidenceItem]:
+    if not isinstance(value, dict):
+        return None
+    item = EvidenceItem(issue=str(value.get("issue") or "")[:MAX_TEXT])
+    try:
+        if value.get("timestamp_seconds") is not None:
+            item.timestamp_seconds = max(0.0, float(value["timestamp_seconds"]))
+        else:
+            item.frame_index = max(0, int(value.get("frame_index") or 0))
+    except (TypeError, ValueError):
+        return None
+    return item
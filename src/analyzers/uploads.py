@@ -0,0 +1,75 @@
+"""Gemini Files API uploads with reuse by content hash."""
+
+from __future__ import annotations
+from dataclasses import dataclass
+from pathlib import Path
+import mimetypes
+import time
+
+from google.genai import types
+
+from src.config import config
+from src.analyzers.registry import ExpiringRegistry
+from src.utils.helpers import file_digest
+
+# Files API uploads are deleted after 48 hours
+DEFAULT_FILE_TTL_SECONDS = 48 * 3600
+
+
+@dataclass
+class UploadedFile:
+    """Handle to a processed file on the Files API."""
+    name: str
+    uri: str
+    mime_type: str
+    expires_at: float
+
+
+class UploadRegistry(ExpiringRegistry):
+    """Maps video content hashes to Files API handles so each video is uploaded once.
+
+    Handles are reused until shortly before the file expires on the server.
+    Keys carry a namespace (one per API key), because uploaded files are
+    private to the project that uploaded them.
+    """
+
+    entry_type = UploadedFile
+
+    def __init__(self, path: str = None, expiry_margin: float = None):
+        super().__init__(path, config.upload_expiry_margin if expiry_margin is None else expiry_margin)
+
+    def key(self, video_path: str, namespace: str = "") -> str:
+        return f"{namespace}:{file_digest(video_path)}"
+
+    def get_or_upload(self, client, video_path: str, namespace: str = "") -> tuple:
+        """Return (handle, uploaded_now) for a video, uploading it only when no live handle exists."""
+        key = self.key(video_path, namespace)
+        with self.key_lock(key):
+            entry = self.get(key)
+            if entry:
+                return entry, False
+            entry = self._upload(client, video_path, display_name=key.rsplit(":", 1)[-1][:32])
+            self.put(key, entry)
+            return entry, True
+
+    @staticmethod
+    def _upload(client, video_path: str, display_name: str) -> UploadedFile:
+        """Upload a video and wait until the Files API has finished processing it."""
+        mime_type = mimetypes.guess_type(video_path)[0] or "video/mp4"
+        print(f"Uploading video to Gemini Files API ({Path(video_path).stat().st_size / 1024 / 1024:.1f} MB)...")
+        file = client.files.upload(file=video_path, config=types.UploadFileConfig(
+            mime_type=mime_type, display_name=display_name))
+
+        deadline = time.monotonic() + config.upload_timeout
+        while file.state == types.FileState.PROCESSING:
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Uploaded file {file.name} still processing after {config.upload_timeout}s")
+            time.sleep(config.upload_poll_interval)
+            file = client.files.get(name=file.name)
+        if file.state == types.FileState.FAILED:
+            raise RuntimeError(f"Files API could not process {video_path}: {file.error}")
+
+        expires_at = (file.expiration_time.timestamp() if file.expiration_time
+                      else time.time() + DEFAULT_FILE_TTL_SECONDS)
+        return UploadedFile(name=file.name, uri=file.uri, mime_type=file.mime_type or mime_type,
+                            expires_at=expires_at)
@@ -0,0 +1,127 @@
+"""Batch analysis of many photo/video pairs with bounded concurrency."""
+
+from __future__ import annotations
+from typing import List, Optional, TextIO
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from pathlib import Path
+import csv
+import json
+import time
+
+import numpy as np
+
+VIDEO_EXTENSIONS = {".mp4", ".webm", ".mov"}
+PHOTO_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp"}
+
+
+@dataclass
+class BatchJob:
+    """One photo/video pair to analyze."""
+    id: str
+    photo: str
+    video: str
+
+
+def load_jobs(source: str, photo: Optional[str] = None) -> List[BatchJob]:
+    """Load jobs from a CSV/JSONL manifest or a directory of videos.
+
+    Manifest rows need `photo` and `video` columns and may carry an `id`;
+    relative paths are resolved against the manifest's directory. A missing
+    `photo` falls back to the `photo` argument.
+    """
+    path = Path(source)
+    if path.is_dir():
+        return _jobs_from_directory(path, photo)
+
+    if path.suffix == ".jsonl":
+        with open(path) as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+    else:
+        with open(path, newline="") as f:
+            rows = list(csv.DictReader(f))
+
+    jobs = []
+    for i, row in enumerate(rows):
+        row_photo = str(path.parent / row["photo"]) if row.get("photo") else photo
+        if not row_photo or not row.get("video"):
+            raise ValueError(f"{source}: row {i + 1} needs 'photo' and 'video'")
+        jobs.append(BatchJob(
+            id=str(row.get("id") or Path(row["video"]).stem),
+            photo=row_photo,
+            video=str(path.parent / row["video"]),
+        ))
+    return jobs
+
+
+def _jobs_from_directory(directory: Path, photo: Optional[str]) -> List[BatchJob]:
+    """Pair each video with `{person}_reference.*` by name prefix, or with `photo`."""
+    references = {}
+    videos = []
+    for path in sorted(directory.iterdir()):
+        suffix = path.suffix.lower()
+        if suffix in PHOTO_EXTENSIONS and path.stem.endswith("_reference"):
+            references[path.stem[:-len("_reference")]] = str(path)
+        elif suffix in VIDEO_EXTENSIONS:
+            videos.append(path)
+
+    jobs = []
+    for video in videos:
+        reference = references.get(video.stem.split("_")[0], photo)
+        if not reference:
+            raise ValueError(f"No reference photo for {video.name}; use --photo")
+        jobs.append(BatchJob(id=video.stem, photo=reference, video=str(video)))
+    return jobs
+
+
+def run_batch(detector, jobs: List[BatchJob], concurrency: int, out: TextIO) -> dict:
+    """Analyze jobs with at most `concurrency` in flight, writing one JSON line per finished job.
+
+    A job fails when analysis raises or when the Gemini call failed; the
+    INCONCLUSIVE result of a failed call is kept in the record but not counted
+    as a verdict.
+    """
+    def run(job: BatchJob):
+        start = time.time()
+        try:
+            result = detector.analyze(reference_photo=job.photo, video_path=job.video)
+            return job, time.time() - start, result.to_dict(), result.error
+        except Exception as e:
+            return job, time.time() - start, None, str(e)
+
+    start_time = time.time()
+    latencies, verdicts, failed = [], {}, 0
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        futures = [pool.submit(run, job) for job in jobs]
+        for future in as_completed(futures):
+            job, latency, result, error = future.result()
+            record = {"id": job.id, "photo": job.photo, "video": job.video,
+                      "latency_seconds": round(latency, 3)}
+            if result is not None:
+                record["result"] = result
+            if error is None:
+                verdicts[result["verdict"]] = verdicts.get(result["verdict"], 0) + 1
+                latencies.append(latency)
+            else:
+                record["error"] = error
+                failed += 1
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+
+    wall = time.time() - start_time
+    summary = {
+        "jobs": len(jobs),
+        "succeeded": len(jobs) - failed,
+        "failed": failed,
+        "verdicts": verdicts,
+        "concurrency": concurrency,
+        "wall_seconds": round(wall, 3),
+        "throughput_per_minute": round(len(jobs) / wall * 60, 2) if wall > 0 else 0.0,
+    }
+    if latencies:
+        summary["latency_seconds"] = {
+            "p50": round(float(np.percentile(latencies, 50)), 3),
+            "p95": round(float(np.percentile(latencies, 95)), 3),
+            "max": round(max(latencies), 3),
+        }
+    return summary
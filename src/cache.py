@@ -0,0 +1,98 @@
+"""On-disk result cache for repeated submissions."""
+
+from __future__ import annotations
+from typing import Optional
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+from src.config import config
+from src.utils.helpers import file_digest
+
+
+class ResultCache:
+    """Content-addressed cache of Gemini analyses and detection results.
+
+    Entries are JSON files named by a SHA-256 key over the input file bytes and
+    the analysis settings. An entry's mtime is its creation time: entries
+    created more than `ttl_hours` ago count as misses and are removed, however
+    often they are read. Reads set the access time instead, which drives LRU
+    eviction once the directory grows past `max_mb`.
+    """
+
+    def __init__(self, cache_dir: str, max_mb: float = None, ttl_hours: float = None):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = int((config.cache_max_mb if max_mb is None else max_mb) * 1024 * 1024)
+        self.ttl_seconds = (config.cache_ttl_hours if ttl_hours is None else ttl_hours) * 3600
+        self._lock = threading.Lock()
+
+    def make_key(self, video_path: str, reference_photo: str, reference_digest: str = None, **settings) -> str:
+        """Build a cache key from the input files' contents and analysis settings.
+
+        `reference_digest` skips re-hashing a reference photo whose digest is already known.
+        """
+        digest = hashlib.sha256()
+        digest.update(file_digest(video_path).encode())
+        digest.update((reference_digest or file_digest(reference_photo)).encode())
+        digest.update(json.dumps(settings, sort_keys=True, default=str).encode())
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    def get(self, key: str) -> Optional[dict]:
+        """Return the cached entry for `key`, or None on a miss or expiry."""
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+        if self.ttl_seconds and time.time() - entry.get("created", 0) > self.ttl_seconds:
+            path.unlink(missing_ok=True)
+            return None
+
+        try:
+            os.utime(path, (time.time(), path.stat().st_mtime))
+        except OSError:
+            pass
+        return entry
+
+    def put(self, key: str, entry: dict):
+        """Store an entry atomically and evict least recently used entries over budget."""
+        entry = {"created": time.time(), **entry}
+        path = self._path(key)
+        tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, path)
+        self._evict()
+
+    def _evict(self):
+        """Delete expired entries, then the least recently read until under `max_bytes`."""
+        with self._lock:
+            entries = []
+            now = time.time()
+            for path in self.cache_dir.glob("*.json"):
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_atime, stat.st_size, path))
+
+            if self.ttl_seconds:
+                for created, _, size, path in entries:
+                    if now - created > self.ttl_seconds:
+                        path.unlink(missing_ok=True)
+                entries = [e for e in entries if now - e[0] <= self.ttl_seconds]
+            total = sum(size for _, _, size, _ in entries)
+            for _, _, size, path in sorted(entries, key=lambda e: e[1]):
+                if total <= self.max_bytes:
+                    break
+                path.unlink(missing_ok=True)
+                total -= size
@@ -1,5 +1,7 @@
 """Output formatting utilities for CLI."""
 
+import sys
+
 
 def print_header(photo: str, video: str):
     """Print analysis header."""
@@ -47,3 +49,26 @@ def print_results(result):
             print(f"  Frame {ef.frame_number} ({ef.timestamp}): {ef.issue}")
     
     print("\n" + "=" * 60)
+
+
+def print_batch_summary(summary: dict, file=sys.stdout):
+    """Print aggregate batch throughput and latency."""
+    print("=" * 60, file=file)
+    print("BATCH SUMMARY", file=file)
+    print("=" * 60, file=file)
+    print(f"{'Jobs:':<24} {summary['jobs']} ({summary['succeeded']} ok, {summary['failed']} failed)", file=file)
+    for verdict, count in sorted(summary["verdicts"].items()):
+        print(f"  {verdict:<22} {count}", file=file)
+    print(f"{'Concurrency:':<24} {summary['concurrency']}", file=file)
+    print(f"{'Wall Time:':<24} {summary['wall_seconds']:.1f}s", file=file)
+    print(f"{'Throughput:':<24} {summary['throughput_per_minute']:.1f} clips/min", file=file)
+    latency = summary.get("latency_seconds")
+    if latency:
+        print(f"{'Latency p50/p95/max:':<24} {latency['p50']:.1f}s / {latency['p95']:.1f}s / {latency['max']:.1f}s", file=file)
+    print("=" * 60, file=file)
+
+
+def print_job_counts(counts: dict, file=sys.stdout):
+    """Print job queue counts by status."""
+    print("-" * 60, file=file)
+    print("  ".join(f"{status}: {count}" for status, count in counts.items()), file=file)
@@ -24,9 +24,98 @@ class Config:
     # Processing settings
     max_video_duration: int = int(os.getenv("MAX_VIDEO_DURATION", "60"))
     frame_extraction_fps: int = int(os.getenv("FRAME_EXTRACTION_FPS", "10"))
+    # Frame decoding and audio transcription run concurrently, each with its own deadline
+    frame_stage_timeout: float = float(os.getenv("FRAME_STAGE_TIMEOUT", "120"))
+    audio_stage_timeout: float = float(os.getenv("AUDIO_STAGE_TIMEOUT", "120"))
+    max_analysis_frames: int = int(os.getenv("MAX_ANALYSIS_FRAMES", "8"))
+    # "uniform" spaces frames evenly and decodes only those; "motion" picks informative,
+    # distinct frames but first decodes thumbnails of the whole target-FPS grid
+    frame_selection: str = os.getenv("FRAME_SELECTION", "uniform")
+    # "opencv" or "ffmpeg" (rawvideo pipe with decode-time sampling and scaling)
+    video_decoder: str = os.getenv("VIDEO_DECODER", "opencv")
+    # Decoded frames spill to a memory-mapped scratch file above this size
+    frame_memory_budget_mb: int = int(os.getenv("FRAME_MEMORY_BUDGET_MB", "512"))
+    frame_scratch_dir: str = os.getenv("FRAME_SCRATCH_DIR", "")
+    
+    # Local face layers (need MediaPipe face mesh; skipped when unavailable). The scan decodes
+    # the whole target-FPS grid, shared with "motion" selection, so it is opt-in
+    local_face_analysis: bool = os.getenv("LOCAL_FACE_ANALYSIS", "false").lower() == "true"
+    face_analysis_max_edge: int = int(os.getenv("FACE_ANALYSIS_MAX_EDGE", "480"))
+    min_blink_seconds: float = float(os.getenv("MIN_BLINK_SECONDS", "5"))
+    # Local identity layer (also needs deepface); similarity is cosine mapped to [0, 1]
+    local_identity_analysis: bool = os.getenv("LOCAL_IDENTITY_ANALYSIS", "true").lower() == "true"
+    identity_match_threshold: float = float(os.getenv("IDENTITY_MATCH_THRESHOLD", "0.70"))
+    embedding_cache_dir: str = os.getenv("EMBEDDING_CACHE_DIR", "")
+    # Local audio-visual sync layer (mouth landmarks vs. audio envelope)
+    local_av_sync: bool = os.getenv("LOCAL_AV_SYNC", "true").lower() == "true"
+    av_sync_min_correlation: float = float(os.getenv("AV_SYNC_MIN_CORRELATION", "0.3"))
+    
+    # Whisper transcription (model stays loaded in a shared worker)
+    whisper_model: str = os.getenv("WHISPER_MODEL", "base")
+    whisper_compute_type: str = os.getenv("WHISPER_COMPUTE_TYPE", "float32")
+    whisper_device: str = os.getenv("WHISPER_DEVICE", "")
+    transcript_cache_size: int = int(os.getenv("TRANSCRIPT_CACHE_SIZE", "256"))
+    # Voice activity detection: only detected speech is sent to Whisper
+    vad_enabled: bool = os.getenv("VAD_ENABLED", "true").lower() == "true"
+    vad_margin_db: float = float(os.getenv("VAD_MARGIN_DB", "12"))
+    vad_hangover_ms: float = float(os.getenv("VAD_HANGOVER_MS", "300"))
+    
+    # Batch mode
+    batch_concurrency: int = int(os.getenv("BATCH_CONCURRENCY", "4"))
+    # Videos of one analyze_many() session in flight at once
+    session_concurrency: int = int(os.getenv("SESSION_CONCURRENCY", "2"))
+    
+    # Per-stage timing spans are appended here as JSON lines (disabled when empty)
+    trace_file: str = os.getenv("TRACE_FILE", "")
+    
+    # Durable job queue (python -m src.main jobs ...)
+    jobs_db: str = os.getenv("JOBS_DB", "jobs.sqlite")
+    job_lease_seconds: float = float(os.getenv("JOB_LEASE_SECONDS", "300"))
+    job_max_attempts: int = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+    job_retry_backoff: float = float(os.getenv("JOB_RETRY_BACKOFF", "30"))
+    
+    # HTTP service mode
+    server_host: str = os.getenv("SERVER_HOST", "127.0.0.1")
+    server_port: int = int(os.getenv("SERVER_PORT", "8080"))
+    server_workers: int = int(os.getenv("SERVER_WORKERS", "2"))
+    server_queue_size: int = int(os.getenv("SERVER_QUEUE_SIZE", "8"))
+    max_upload_mb: float = float(os.getenv("MAX_UPLOAD_MB", "200"))
+    
+    # Result cache (disabled when no directory is set)
+    cache_dir: str = os.getenv("RESULT_CACHE_DIR", "")
+    cache_max_mb: float = float(os.getenv("RESULT_CACHE_MAX_MB", "256"))
+    cache_ttl_hours: float = float(os.getenv("RESULT_CACHE_TTL_HOURS", "168"))
+    
+    # Image payload encoding for Gemini uploads
+    image_max_edge: int = int(os.getenv("IMAGE_MAX_EDGE", "1024"))
+    image_format: str = os.getenv("IMAGE_FORMAT", "jpeg")
+    image_quality: int = int(os.getenv("IMAGE_QUALITY", "85"))
+    image_encode_workers: int = int(os.getenv("IMAGE_ENCODE_WORKERS", "4"))
     
     # Gemini model - using models/ prefix for google.genai
     gemini_model: str = os.getenv("GEMINI_MODEL", "models/gemini-2.5-flash")
+    # "frames" sends sampled stills; "video" uploads the whole clip through the Files API
+    analysis_mode: str = os.getenv("ANALYSIS_MODE", "frames")
+    upload_registry: str = os.getenv("UPLOAD_REGISTRY", "")
+    upload_expiry_margin: float = float(os.getenv("UPLOAD_EXPIRY_MARGIN", "3600"))
+    upload_timeout: float = float(os.getenv("UPLOAD_TIMEOUT", "300"))
+    upload_poll_interval: float = float(os.getenv("UPLOAD_POLL_INTERVAL", "2"))
+    # Explicit context caching of the request prefix: "off", "prompt" or "reference" (prompt + reference photo).
+    # Opt-in: creating a cache is an extra round trip and storage is billed for its TTL. The prompt alone
+    # is below the Flash minimum of 1024 tokens, so "prompt" only caches on models with a lower one.
+    context_cache: str = os.getenv("CONTEXT_CACHE", "off")
+    context_cache_registry: str = os.getenv("CONTEXT_CACHE_REGISTRY", "")
+    context_cache_ttl: float = float(os.getenv("CONTEXT_CACHE_TTL", "3600"))
+    context_cache_refresh: float = float(os.getenv("CONTEXT_CACHE_REFRESH", "600"))
+    context_cache_min_tokens: int = int(os.getenv("CONTEXT_CACHE_MIN_TOKENS", "1024"))
+    # Gemini call layer: quota shared per API key, retries bounded by a per-call deadline
+    gemini_rpm: float = float(os.getenv("GEMINI_RPM", "1000"))
+    gemini_tpm: float = float(os.getenv("GEMINI_TPM", "1000000"))
+    gemini_output_tokens: int = int(os.getenv("GEMINI_OUTPUT_TOKENS", "2048"))
+    gemini_max_retries: int = int(os.getenv("GEMINI_MAX_RETRIES", "5"))
+    gemini_deadline: float = float(os.getenv("GEMINI_DEADLINE", "180"))
+    gemini_backoff_base: float = float(os.getenv("GEMINI_BACKOFF_BASE", "1.0"))
+    gemini_backoff_max: float = float(os.getenv("GEMINI_BACKOFF_MAX", "30"))
     
     # Layer weights for final score (all analyzed by Gemini)
     layer_weights: dict = None
@@ -39,6 +128,7 @@ class Config:
                 "body_movement": 0.20,       # Body pacing, movement paths
                 "eye_analysis": 0.15,        # Blinking patterns, gaze
                 "identity_match": 0.10,      # Reference matching
+                "audio_visual_sync": 0.10,   # Local lip sync (only when a face and audio are present)
             }
     
     def validate(self) -> bool:
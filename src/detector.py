@@ -1,74 +1,625 @@
 """Core Deepfake Detector - Gemini-only analysis."""
 
+import asyncio
+import contextvars
+import importlib.util
 import time
+from dataclasses import asdict, dataclass
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from pathlib import Path
+from typing import Optional, Sequence, Union
 import numpy as np
 from PIL import Image
 
+from src.cache import ResultCache
 from src.config import config
 from src.models import (
-    DetectionResult, DetectionVerdict, LayerResult,
-    BookVerificationResult, EyeAnalysisResult, IdentityMatchResult, EvidenceFrame
+    DetectionResult, DetectionVerdict, LayerResult, SessionResult,
+    BookVerificationResult, EyeAnalysisResult, IdentityMatchResult, AudioVisualSyncResult, EvidenceFrame
 )
-from src.preprocessing import VideoProcessor, AudioProcessor
+from src.preprocessing import VideoProcessor, AudioProcessor, FaceProcessor, FrameSelector
+from src.preprocessing.face import EmbeddingCache
+from src.preprocessing.sync import SyncAnalyzer
 from src.analyzers import GeminiAnalyzer
-from src.utils.helpers import format_timestamp
+from src.analyzers.encoding import EncodedImage
+from src.utils.helpers import format_timestamp, file_digest
+from src.utils.tracing import Tracer, run_in_executor, span
+
+
+ANALYSIS_MODES = ("frames", "video")
+
+
+@dataclass
+class PreparedReference:
+    """Reference photo loaded, encoded for Gemini and embedded once, for reuse across videos."""
+    path: str
+    digest: str
+    image: np.ndarray
+    encoded: EncodedImage
+    embedding: Optional[np.ndarray] = None
 
 
 class DeepfakeDetector:
     """Gemini-powered deepfake detection."""
     
-    def __init__(self, api_key: str = None):
-        """Initialize detector with optional API key override."""
+    def __init__(self, api_key: str = None, cache_dir: str = None, analyzer: GeminiAnalyzer = None):
+        """Initialize detector with optional API key override, result cache directory and analyzer.
+        
+        An injected `analyzer` (e.g. a stub in tests) replaces the Gemini client,
+        so no API key is required.
+        """
         self.config = config
         if api_key:
             self.config.gemini_api_key = api_key
-        self.config.validate()
+        if analyzer is None:
+            self.config.validate()
         
         self.video_processor = VideoProcessor(target_fps=config.frame_extraction_fps)
         self.audio_processor = AudioProcessor()
-        self.gemini_analyzer = GeminiAnalyzer(api_key=self.config.gemini_api_key)
+        self.frame_selector = FrameSelector()
+        self.face_processor = self._create_face_processor() if config.local_face_analysis else None
+        self.identity_enabled = bool(
+            self.face_processor and config.local_identity_analysis and importlib.util.find_spec("deepface"))
+        self.sync_analyzer = SyncAnalyzer() if self.face_processor and config.local_av_sync else None
+        self.gemini_analyzer = analyzer or GeminiAnalyzer(api_key=self.config.gemini_api_key)
+        
+        cache_dir = cache_dir or self.config.cache_dir
+        self.cache = ResultCache(cache_dir) if cache_dir else None
+    
+    @staticmethod
+    def _create_face_processor():
+        """FaceProcessor for local face layers, or None when MediaPipe is unavailable."""
+        try:
+            return FaceProcessor(EmbeddingCache(config.embedding_cache_dir or None))
+        except (ImportError, AttributeError) as e:
+            print(f"MediaPipe face mesh unavailable ({e}). Skipping local face analysis.")
+            return None
+    
+    def warm_up(self):
+        """Load lazily initialized models (Whisper) ahead of the first analysis."""
+        self.audio_processor.warm_up()
+    
+    def analyze(self, reference_photo: Union[str, PreparedReference], video_path: str,
+                mode: str = None) -> DetectionResult:
+        """Perform Gemini-powered deepfake detection analysis.
+        
+        `reference_photo` is a path or a `PreparedReference` from
+        `prepare_reference`. `mode` is "frames" (decode locally and send
+        sampled stills) or "video" (upload the whole clip through the Files
+        API); it defaults to `config.analysis_mode`. Per-stage timings are
+        attached to the result and, when `config.trace_file` is set, appended
+        there as JSON lines.
+        """
+        tracer = Tracer()
+        try:
+            with tracer.activate(), span("analyze", mode=mode or self.config.analysis_mode):
+                result = self._analyze(reference_photo, video_path, mode)
+            result.timings = tracer.to_dict()
+            return result
+        finally:
+            self._export_trace(tracer, reference_photo, video_path)
     
-    def analyze(self, reference_photo: str, video_path: str) -> DetectionResult:
-        """Perform Gemini-powered deepfake detection analysis."""
+    def _analyze(self, reference_photo: Union[str, PreparedReference], video_path: str,
+                 mode: str = None) -> DetectionResult:
         start_time = time.time()
         result = DetectionResult()
+        mode = self._check_mode(mode)
+        self._check_inputs(reference_photo, video_path)
         
-        if not Path(reference_photo).exists():
-            raise FileNotFoundError(f"Reference photo not found: {reference_photo}")
-        if not Path(video_path).exists():
-            raise FileNotFoundError(f"Video file not found: {video_path}")
+        cache_key, cached = self._lookup_cache(reference_photo, video_path, mode)
+        if cached:
+            return self._finish(result, cached, None, start_time)
         
-        ref_image = np.array(Image.open(reference_photo).convert("RGB"))
+        if mode == "video":
+            print("Running Gemini video analysis...")
+            reference, metadata = self._prepare_video(reference_photo, video_path)
+            stats = {}
+            gemini_result = self.gemini_analyzer.analyze_video(
+                reference.encoded, video_path, metadata.duration_seconds, stats)
+            self._record_payload(result, stats)
+            return self._finish(result, self._video_entry(gemini_result, metadata), cache_key, start_time)
         
-        print("Extracting video frames...")
-        extracted = self.video_processor.extract_frames(video_path)
-        if not extracted.frames:
-            result.verdict = DetectionVerdict.INCONCLUSIVE
+        reference, extracted, transcription, signals = self._prepare(reference_photo, video_path)
+        if not len(extracted.frames):
             result.processing_time_seconds = time.time() - start_time
             return result
         
-        print(f"Extracted {len(extracted.frames)} frames at {extracted.fps} fps")
+        print("Running Gemini analysis...")
+        stats = {}
+        try:
+            gemini_result = self.gemini_analyzer.analyze(reference.encoded, extracted.frames, transcription, stats)
+        finally:
+            extracted.frames.close()
+        self._record_payload(result, stats)
+        return self._finish(result, self._analysis_entry(gemini_result, extracted, signals), cache_key, start_time)
+    
+    async def analyze_async(self, reference_photo: Union[str, PreparedReference], video_path: str,
+                            mode: str = None) -> DetectionResult:
+        """Async variant of `analyze` for use inside an event loop.
+        
+        Hashing, decoding and transcription run in the loop's default executor and
+        the Gemini request uses the SDK's async client, so many analyses can be in
+        flight on one loop without a thread per request.
+        """
+        tracer = Tracer()
+        try:
+            with tracer.activate(), span("analyze", mode=mode or self.config.analysis_mode):
+                result = await self._analyze_async(reference_photo, video_path, mode)
+            result.timings = tracer.to_dict()
+            return result
+        finally:
+            self._export_trace(tracer, reference_photo, video_path)
+    
+    async def _analyze_async(self, reference_photo: Union[str, PreparedReference], video_path: str,
+                             mode: str = None) -> DetectionResult:
+        loop = asyncio.get_running_loop()
+        start_time = time.time()
+        result = DetectionResult()
+        mode = self._check_mode(mode)
+        self._check_inputs(reference_photo, video_path)
+        
+        cache_key, cached = await run_in_executor(
+            loop, self._lookup_cache, reference_photo, video_path, mode)
+        if cached:
+            return self._finish(result, cached, None, start_time)
         
-        transcription = ""
-        if extracted.metadata.has_audio:
-            audio_data = self.audio_processor.extract_audio(video_path)
-            if audio_data:
-                transcription = self.audio_processor.transcribe(audio_data.audio_path)
+        if mode == "video":
+            print("Running Gemini video analysis...")
+            reference, metadata = await run_in_executor(
+                loop, self._prepare_video, reference_photo, video_path)
+            stats = {}
+            gemini_result = await self.gemini_analyzer.analyze_video_async(
+                reference.encoded, video_path, metadata.duration_seconds, stats)
+            self._record_payload(result, stats)
+            entry = self._video_entry(gemini_result, metadata)
+            return await run_in_executor(loop, self._finish, result, entry, cache_key, start_time)
+        
+        reference, extracted, transcription, signals = await run_in_executor(
+            loop, self._prepare, reference_photo, video_path)
+        if not len(extracted.frames):
+            result.processing_time_seconds = time.time() - start_time
+            return result
         
         print("Running Gemini analysis...")
-        gemini_result = self.gemini_analyzer.analyze(ref_image, extracted.frames, transcription)
-        result.gemini_analysis = str(gemini_result)
+        stats = {}
+        try:
+            gemini_result = await self.gemini_analyzer.analyze_async(
+                reference.encoded, extracted.frames, transcription, stats)
+        finally:
+            extracted.frames.close()
+        self._record_payload(result, stats)
+        entry = self._analysis_entry(gemini_result, extracted, signals)
+        return await run_in_executor(loop, self._finish, result, entry, cache_key, start_time)
+    
+    def analyze_many(self, reference_photo: str, videos: Sequence[str], mode: str = None,
+                     concurrency: int = None) -> SessionResult:
+        """Check several videos (retakes, other angles) against one reference photo.
+        
+        The reference is loaded, encoded and embedded once and shared by every
+        analysis. Videos go through the usual pipeline with at most
+        `concurrency` (default `config.session_concurrency`) in flight, so one
+        video decodes while another waits on Gemini. A video that fails, or
+        whose Gemini call fails, is reported in `errors` without stopping the
+        others. The session is
+        LIKELY_DEEPFAKE if any video is, LIKELY_AUTHENTIC only if every video
+        was analyzed and is, and INCONCLUSIVE otherwise; its score is the
+        highest per-video score.
+        """
+        start_time = time.time()
+        mode = self._check_mode(mode)
+        tracer = Tracer()
+        with tracer.activate(), span("prepare_reference"):
+            reference = self.prepare_reference(reference_photo, embed=mode == "frames")
+        session = SessionResult(videos=[str(v) for v in videos], timings=tracer.to_dict())
+        
+        workers = max(1, min(len(session.videos), concurrency or self.config.session_concurrency))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="session") as pool:
+            futures = [pool.submit(self.analyze, reference, video, mode) for video in session.videos]
+            for video, future in zip(session.videos, futures):
+                try:
+                    result = future.result()
+                    session.results.append(result)
+                    session.errors.append(result.error)
+                except Exception as e:
+                    print(f"Analysis of {video} failed: {e}")
+                    session.results.append(None)
+                    session.errors.append(str(e))
         
-        if "error" not in gemini_result:
-            result = self._process_gemini_results(result, gemini_result, extracted.fps)
+        session = self._session_verdict(session)
+        session.processing_time_seconds = time.time() - start_time
+        return session
+    
+    @staticmethod
+    def _session_verdict(session: SessionResult) -> SessionResult:
+        """Combine per-video verdicts; the weakest clip decides the session."""
+        results = [r for r in session.results if r is not None]
+        if results:
+            session.fake_confidence_score = max(r.fake_confidence_score for r in results)
+        if any(r.verdict == DetectionVerdict.LIKELY_DEEPFAKE for r in results):
+            session.verdict = DetectionVerdict.LIKELY_DEEPFAKE
+        elif results and len(results) == len(session.videos) and all(
+                r.verdict == DetectionVerdict.LIKELY_AUTHENTIC for r in results):
+            session.verdict = DetectionVerdict.LIKELY_AUTHENTIC
+        else:
+            session.verdict = DetectionVerdict.INCONCLUSIVE
+        return session
+    
+    def _export_trace(self, tracer: Tracer, reference_photo, video_path: str):
+        """Append the analysis' spans to `config.trace_file`; export problems never fail an analysis."""
+        if not self.config.trace_file:
+            return
+        try:
+            tracer.export(self.config.trace_file, video=str(video_path),
+                          reference=str(self._reference_path(reference_photo)))
+        except OSError as e:
+            print(f"Could not write trace to {self.config.trace_file}: {e}")
+    
+    def _check_mode(self, mode: str = None) -> str:
+        """Resolve and validate the analysis mode."""
+        mode = mode or self.config.analysis_mode
+        if mode not in ANALYSIS_MODES:
+            raise ValueError(f"Unknown analysis mode: {mode} (expected one of {', '.join(ANALYSIS_MODES)})")
+        return mode
+    
+    def _check_inputs(self, reference_photo, video_path: str):
+        """Raise FileNotFoundError for missing inputs."""
+        if not isinstance(reference_photo, PreparedReference) and not Path(reference_photo).exists():
+            raise FileNotFoundError(f"Reference photo not found: {reference_photo}")
+        if not Path(video_path).exists():
+            raise FileNotFoundError(f"Video file not found: {video_path}")
+    
+    def _lookup_cache(self, reference_photo, video_path: str, mode: str = "frames"):
+        """Return (cache_key, cached entry or None); both None when caching is off."""
+        if not self.cache:
+            return None, None
+        with span("cache_lookup") as attrs:
+            digest = reference_photo.digest if isinstance(reference_photo, PreparedReference) else None
+            cache_key = self.cache.make_key(video_path, self._reference_path(reference_photo), digest,
+                                            **self._cache_settings(mode))
+            cached = self.cache.get(cache_key)
+            attrs["hit"] = cached is not None
+        if cached:
+            print("Using cached Gemini analysis")
+        return cache_key, cached
+    
+    def _prepare(self, reference_photo, video_path: str):
+        """Prepare the reference, scan and decode the planned frames, and transcribe audio.
         
-        result = self._calculate_verdict(result, gemini_result)
+        Frame decoding and audio extraction/transcription are independent, so they
+        run concurrently in worker threads while the reference photo is prepared
+        here (unless it already is).
+        Each stage has its own deadline measured from the start of preparation. A
+        frame failure or timeout cancels the audio stage and is raised; an audio
+        failure or timeout only drops the transcription. Stages that are already
+        running cannot be interrupted, so their late results are discarded.
+        """
+        print("Extracting video frames...")
+        metadata = self.video_processor.get_metadata(video_path)
+        start = time.monotonic()
+        
+        # Each stage runs in its own copy of the context so its spans reach the active tracer
+        pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="detector-stage")
+        frames_future = pool.submit(contextvars.copy_context().run,
+                                    self._extract_planned_frames, video_path, metadata)
+        audio_future = (pool.submit(contextvars.copy_context().run, self._transcribe_video, video_path, metadata)
+                        if metadata.has_audio else None)
+        pool.shutdown(wait=False)
+        
+        try:
+            reference = self._ensure_prepared(reference_photo)
+            extracted, signals, mouth_track = frames_future.result(
+                timeout=max(0.0, self.config.frame_stage_timeout - (time.monotonic() - start)))
+        except BaseException as e:
+            if audio_future:
+                audio_future.cancel()
+            if not frames_future.cancel():
+                frames_future.add_done_callback(self._discard_frames)
+            if isinstance(e, FutureTimeoutError):
+                raise TimeoutError(f"Frame extraction exceeded {self.config.frame_stage_timeout}s") from None
+            raise
+        
+        if not len(extracted.frames):
+            if audio_future:
+                audio_future.cancel()
+            return reference, extracted, "", signals
+        print(f"Extracted {len(extracted.frames)} of {metadata.total_frames} frames")
+        
+        if reference.embedding is not None:
+            with span("identity", frames=len(extracted.frames)) as attrs:
+                try:
+                    identity = self.face_processor.measure_identity(reference.embedding, extracted.frames)
+                    if identity:
+                        signals["identity"] = asdict(identity)
+                except Exception as e:
+                    print(f"Local identity analysis failed: {e}")
+                    attrs["error"] = str(e)
+        
+        transcription, audio = "", None
+        if audio_future:
+            try:
+                transcription, audio = audio_future.result(
+                    timeout=max(0.0, self.config.audio_stage_timeout - (time.monotonic() - start)))
+            except FutureTimeoutError:
+                audio_future.cancel()
+                print(f"Audio stage exceeded {self.config.audio_stage_timeout}s; continuing without transcription")
+            except Exception as e:
+                print(f"Audio stage failed: {e}; continuing without transcription")
+        
+        if mouth_track is not None and audio is not None and audio.samples is not None:
+            with span("av_sync") as attrs:
+                try:
+                    # Lips only follow the audio while someone talks; without enough
+                    # speech the correlation measures music or noise, so skip it
+                    speech = self.audio_processor.analyze_audio_features(audio)
+                    attrs["speech_seconds"] = speech["speech_seconds"]
+                    if speech["speech_seconds"] >= self.sync_analyzer.min_seconds:
+                        times, mouth = mouth_track
+                        sync = self.sync_analyzer.measure(mouth, times, audio.samples, audio.sample_rate,
+                                                          self.video_processor.sampled_fps(metadata),
+                                                          speech["speech_segments"])
+                        if sync:
+                            signals["sync"] = asdict(sync)
+                except Exception as e:
+                    print(f"Audio-visual sync analysis failed: {e}")
+                    attrs["error"] = str(e)
+        return reference, extracted, transcription, signals
+    
+    def _prepare_video(self, reference_photo, video_path: str):
+        """Prepare the reference photo and probe the video; nothing is decoded in video mode."""
+        metadata = self.video_processor.get_metadata(video_path)
+        return self._ensure_prepared(reference_photo, embed=False), metadata
+    
+    def prepare_reference(self, reference_photo: str, embed: bool = True) -> PreparedReference:
+        """Load, encode and (for the local identity layer) embed a reference photo.
+        
+        The result can be passed to `analyze` in place of the path, so analyses
+        of several videos against the same photo share this work.
+        """
+        if not Path(reference_photo).exists():
+            raise FileNotFoundError(f"Reference photo not found: {reference_photo}")
+        digest = file_digest(reference_photo)
+        image = self._load_reference(reference_photo)
+        with span("encode", images=1) as attrs:
+            encoded = self.gemini_analyzer.encoder.encode(image)
+            attrs["bytes"] = len(encoded.data)
+        return PreparedReference(path=str(reference_photo), digest=digest, image=image, encoded=encoded,
+                                 embedding=self._reference_embedding(digest, image) if embed else None)
+    
+    def _ensure_prepared(self, reference_photo, embed: bool = True) -> PreparedReference:
+        if isinstance(reference_photo, PreparedReference):
+            return reference_photo
+        return self.prepare_reference(reference_photo, embed)
+    
+    @staticmethod
+    def _reference_path(reference_photo) -> str:
+        return reference_photo.path if isinstance(reference_photo, PreparedReference) else reference_photo
+    
+    @staticmethod
+    def _load_reference(reference_photo: str) -> np.ndarray:
+        with span("reference"):
+            return np.array(Image.open(reference_photo).convert("RGB"))
+    
+    def _reference_embedding(self, digest: str, ref_image: np.ndarray):
+        """Reference face embedding for the local identity layer, cached by photo content."""
+        if not self.identity_enabled:
+            return None
+        with span("reference_embedding") as attrs:
+            try:
+                return self.face_processor.reference_embedding(ref_image, digest)
+            except Exception as e:
+                print(f"Reference embedding failed: {e}")
+                attrs["error"] = str(e)
+                return None
+    
+    def _extract_planned_frames(self, video_path: str, metadata):
+        """Measure local signals, then decode only the frames the analyzer will use.
+        
+        Returns (extracted frames, local signal dict, (frame times, mouth openings)
+        for the sync layer or None).
+        """
+        signals, candidates, thumbnails, mouth_track = {}, None, None, None
+        if self.face_processor:
+            with span("scan") as attrs:
+                try:
+                    candidates, thumbnails, landmarks = self._scan_faces(video_path, metadata)
+                    attrs["frames"] = len(candidates)
+                    ear = self.face_processor.eye_aspect_ratios(landmarks)
+                    blinks = self.face_processor.detect_blinks(ear, self.video_processor.sampled_fps(metadata))
+                    signals["blink"] = asdict(blinks)
+                    if self.sync_analyzer and metadata.has_audio and metadata.fps:
+                        mouth_track = (np.asarray(candidates) / metadata.fps,
+                                       self.sync_analyzer.mouth_openings(landmarks))
+                except Exception as e:
+                    print(f"Local face analysis failed: {e}")
+                    attrs["error"] = str(e)
+        
+        with span("select", strategy=self.config.frame_selection) as attrs:
+            frame_plan = self._plan_frames(video_path, metadata, candidates, thumbnails)
+            attrs["frames"] = len(frame_plan)
+        extracted = self.video_processor.extract_frames(video_path, frame_indices=frame_plan, metadata=metadata)
+        return extracted, signals, mouth_track
+    
+    def _scan_faces(self, video_path: str, metadata):
+        """Track face landmarks over the target-FPS grid in one decode pass.
+        
+        Grayscale thumbnails for frame selection are taken from the same frames, so
+        the video is only scanned once. Returns (frame indices, thumbnails or None,
+        (N, 478, 3) landmarks).
+        """
+        candidates, thumbnails = [], []
+        keep_thumbnails = self.config.frame_selection == "motion"
+        
+        def frames():
+            for index, rgb in self.video_processor.iter_frames(
+                    video_path, self.config.face_analysis_max_edge, metadata):
+                candidates.append(index)
+                if keep_thumbnails:
+                    thumbnails.append(self.video_processor.thumbnail(rgb, FrameSelector.THUMBNAIL_SIZE))
+                yield rgb
+        
+        landmarks = self.face_processor.track_landmarks(frames())
+        return candidates, np.stack(thumbnails) if thumbnails else None, landmarks
+    
+    def _plan_frames(self, video_path: str, metadata, candidates: list = None,
+                     thumbnails: np.ndarray = None) -> list:
+        """Choose source frame indices for the analyzer's frame budget.
+        
+        "motion" scores grayscale thumbnails on the target-FPS grid and keeps the
+        most informative distinct frames; "uniform" spaces frames evenly.
+        Thumbnails from an earlier scan are reused when given.
+        """
+        budget = self.gemini_analyzer.max_frames
+        if self.config.frame_selection == "motion":
+            if thumbnails is None:
+                candidates, thumbnails = self.video_processor.extract_thumbnails(
+                    video_path, FrameSelector.THUMBNAIL_SIZE, metadata)
+            return [candidates[i] for i in self.frame_selector.select(thumbnails, budget)]
+        return self.video_processor.plan_frames(metadata, budget)
+    
+    def _transcribe_video(self, video_path: str, metadata=None):
+        """Extract the audio track and transcribe it; returns (transcription, AudioData or None)."""
+        audio_data = self.audio_processor.extract_audio(video_path, metadata=metadata)
+        if not audio_data:
+            return "", None
+        return self.audio_processor.transcribe_speech(audio_data), audio_data
+    
+    @staticmethod
+    def _discard_frames(future):
+        """Release frames from an extraction whose result is no longer wanted."""
+        if not future.cancelled() and future.exception() is None:
+            future.result()[0].frames.close()
+    
+    @staticmethod
+    def _analysis_entry(gemini_result: dict, extracted, signals: dict) -> dict:
+        """Everything needed to rebuild a result without re-running the analysis."""
+        return {
+            "gemini": gemini_result,
+            "fps": extracted.fps,
+            "timestamps": extracted.timestamps,
+            "signals": signals,
+        }
+    
+    @staticmethod
+    def _video_entry(gemini_result: dict, metadata) -> dict:
+        """Analysis entry for video mode, where Gemini reports evidence by timestamp."""
+        return {"gemini": gemini_result, "fps": metadata.fps, "timestamps": [], "signals": {}}
+    
+    def _finish(self, result: DetectionResult, entry: dict, cache_key: str,
+                start_time: float) -> DetectionResult:
+        """Build the final result from an analysis entry and store it in the cache."""
+        result = self._build_result(result, entry)
         result.processing_time_seconds = time.time() - start_time
+        
+        gemini_result = entry["gemini"]
+        if cache_key and "error" not in gemini_result and "raw_response" not in gemini_result:
+            with span("cache_store"):
+                self.cache.put(cache_key, {**entry, "result": result.to_dict()})
+        
         print(f"Analysis complete in {result.processing_time_seconds:.1f}s")
         return result
     
-    def _process_gemini_results(self, result: DetectionResult, gemini: dict, fps: float) -> DetectionResult:
+    def _record_payload(self, result: DetectionResult, stats: dict):
+        """Record and report how much was uploaded to Gemini."""
+        result.payload_bytes = stats.get("payload_bytes", 0)
+        if result.payload_bytes:
+            print(f"Sent {stats.get('images', 0)} images, {result.payload_bytes / 1024:.0f} KB to Gemini")
+    
+    def _cache_settings(self, mode: str = "frames") -> dict:
+        """Analysis settings that change Gemini's output and so belong in the cache key."""
+        if mode == "video":
+            return {
+                "mode": mode,
+                "prompt": self.gemini_analyzer.video_prompt,
+                "model": self.gemini_analyzer.model_name,
+                "layer_weights": self.config.layer_weights,
+                "image_encoding": self.gemini_analyzer.encoder.settings,
+                "context_cache": self.gemini_analyzer.context_cache,
+            }
+        return {
+            "mode": mode,
+            "prompt": self.gemini_analyzer.prompt,
+            "model": self.gemini_analyzer.model_name,
+            "max_frames": self.gemini_analyzer.max_frames,
+            "frame_selection": self.config.frame_selection,
+            "layer_weights": self.config.layer_weights,
+            "image_encoding": self.gemini_analyzer.encoder.settings,
+            "context_cache": self.gemini_analyzer.context_cache,
+            # The transcription is part of the prompt
+            "whisper_model": self.config.whisper_model,
+            "vad": [self.config.vad_enabled, self.config.vad_margin_db, self.config.vad_hangover_ms],
+            "local_face_analysis": self.face_processor is not None,
+            "local_identity_analysis": self.identity_enabled,
+            "local_av_sync": self.sync_analyzer is not None,
+        }
+    
+    def _build_result(self, result: DetectionResult, entry: dict) -> DetectionResult:
+        """Turn a raw Gemini dict and local signals into layer results and a verdict.
+        
+        Cache hits go through here too, so verdicts always reflect the current
+        thresholds without another API call.
+        """
+        gemini = entry["gemini"]
+        result.gemini_analysis = str(gemini)
+        result.error = gemini.get("error")
+        if "error" not in gemini:
+            result = self._process_gemini_results(result, gemini, entry["fps"], entry.get("timestamps"))
+        result = self._apply_local_signals(result, entry.get("signals") or {})
+        return self._calculate_verdict(result, gemini)
+    
+    def _apply_local_signals(self, result: DetectionResult, signals: dict) -> DetectionResult:
+        """Merge locally measured signals into the layer results."""
+        blink = signals.get("blink")
+        if blink and blink["duration_seconds"] >= self.config.min_blink_seconds:
+            eye = result.eye_analysis or EyeAnalysisResult(score=0.5)
+            eye.blink_count = blink["blink_count"]
+            eye.blink_rate = round(blink["blink_rate"], 1)
+            eye.findings.append(
+                f"Measured blink rate: {eye.blink_rate}/min "
+                f"({eye.blink_count} blinks over {blink['duration_seconds']:.0f}s)")
+            # Too few blinks is the classic deepfake tell; too many is a weaker signal
+            low, high = eye.expected_rate_range
+            if eye.blink_rate < low:
+                deviation = (low - eye.blink_rate) / low
+            else:
+                deviation = max(0.0, eye.blink_rate - high) / (2 * high)
+            local_score = 0.1 + 0.8 * min(1.0, deviation)
+            eye.score = local_score if result.eye_analysis is None else (eye.score + local_score) / 2
+            result.eye_analysis = eye
+        
+        identity = signals.get("identity")
+        if identity:
+            match = result.identity_match or IdentityMatchResult(score=0.5)
+            match.reference_similarity = round(identity["reference_similarity"], 4)
+            match.frame_variance = round(identity["frame_variance"], 6)
+            match.frames_analyzed = identity["frames_analyzed"]
+            match.findings.append(
+                f"Local face similarity to reference: {match.reference_similarity:.2f} "
+                f"over {match.frames_analyzed} frames")
+            shortfall = max(0.0, self.config.identity_match_threshold - match.reference_similarity)
+            local_score = 0.1 + 0.8 * min(1.0, shortfall / 0.2)
+            match.score = local_score if result.identity_match is None else (match.score + local_score) / 2
+            result.identity_match = match
+        
+        sync = signals.get("sync")
+        if sync:
+            layer = AudioVisualSyncResult(
+                score=0.5,
+                correlation=round(sync["correlation"], 3),
+                lag_seconds=round(sync["lag_seconds"], 2),
+                duration_seconds=round(sync["duration_seconds"], 1),
+            )
+            layer.findings.append(
+                f"Mouth movement vs. speech loudness correlation: {layer.correlation:.2f} "
+                f"at {layer.lag_seconds:+.2f}s lag over {layer.duration_seconds:.0f}s")
+            # Real talking footage correlates clearly near zero lag; dubbed or generated lips do not
+            weak = max(0.0, self.config.av_sync_min_correlation - layer.correlation) / self.config.av_sync_min_correlation
+            offset = max(0.0, abs(layer.lag_seconds) - 0.1) / 0.3
+            layer.score = 0.1 + 0.8 * min(1.0, max(weak, offset))
+            result.audio_visual_sync = layer
+        return result
+    
+    def _process_gemini_results(self, result: DetectionResult, gemini: dict, fps: float,
+                                timestamps: list = None) -> DetectionResult:
         """Convert Gemini analysis to detection layer results."""
         # Book verification
         if "book_analysis" in gemini:
@@ -130,10 +681,19 @@ class DeepfakeDetector:
         
         # Evidence frames
         for ef in gemini.get("evidence_frames", []):
-            frame_idx = ef.get("frame_index", 0)
+            if "timestamp_seconds" in ef:
+                # Video mode: Gemini saw the whole clip and reports time directly
+                seconds = float(ef.get("timestamp_seconds") or 0)
+                frame_idx = int(round(seconds * fps)) if fps else 0
+            else:
+                frame_idx = ef.get("frame_index", 0)
+                if timestamps and 0 <= frame_idx < len(timestamps):
+                    seconds = timestamps[frame_idx]
+                else:
+                    seconds = frame_idx / fps if fps else 0
             result.evidence_frames.append(EvidenceFrame(
                 frame_number=frame_idx,
-                timestamp=format_timestamp(frame_idx / fps if fps else 0),
+                timestamp=format_timestamp(seconds),
                 issue=ef.get("issue", ""),
                 confidence=0.8
             ))
@@ -163,6 +723,8 @@ class DeepfakeDetector:
             scores["body_movement"] = result.body_movement.score
         if result.identity_match:
             scores["identity_match"] = result.identity_match.score
+        if result.audio_visual_sync:
+            scores["audio_visual_sync"] = result.audio_visual_sync.score
         
         if scores:
             weights = self.config.layer_weights
@@ -190,5 +752,7 @@ class DeepfakeDetector:
     
     def close(self):
         """Release resources."""
-        pass
+        self.gemini_analyzer.close()
+        if self.face_processor:
+            self.face_processor.close()
 
@@ -0,0 +1,277 @@
+"""Durable SQLite job queue with leased, resumable workers."""
+
+from __future__ import annotations
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, Optional
+import json
+import os
+import random
+import socket
+import sqlite3
+import threading
+import time
+
+from src.batch import BatchJob
+from src.config import config
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    photo TEXT NOT NULL,
+    video TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    available_at REAL NOT NULL,
+    lease_owner TEXT,
+    lease_expires REAL,
+    result TEXT,
+    error TEXT,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_claim ON jobs (status, available_at);
+"""
+
+STATUSES = ("pending", "running", "done", "failed")
+
+
+class JobQueue:
+    """Analysis jobs persisted in a SQLite file shared by any number of worker processes.
+
+    Claims happen inside `BEGIN IMMEDIATE` transactions, so two workers never
+    take the same job. A claimed job carries a lease that its worker renews
+    with heartbeats; once a lease expires the job can be claimed again, which
+    re-queues work from crashed workers. Failures are retried with exponential
+    backoff until `max_attempts`, and each finished result is stored as JSON
+    so a restarted backlog resumes without repeating completed analyses.
+    """
+
+    def __init__(self, path: str = None, lease_seconds: float = None, max_attempts: int = None,
+                 retry_backoff: float = None):
+        self.path = path or config.jobs_db
+        self.lease_seconds = config.job_lease_seconds if lease_seconds is None else lease_seconds
+        self.max_attempts = max_attempts or config.job_max_attempts
+        self.retry_backoff = config.job_retry_backoff if retry_backoff is None else retry_backoff
+        self._local = threading.local()
+        self._connection().executescript(SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread; autocommit mode so transactions are explicit."""
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        db = self._connection()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            yield db
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+    def enqueue(self, jobs: Iterable[BatchJob]) -> int:
+        """Add jobs; ids already in the queue are left untouched. Returns the number added."""
+        now = time.time()
+        with self._transaction() as db:
+            before = db.total_changes
+            db.executemany(
+                "INSERT OR IGNORE INTO jobs (id, photo, video, available_at, created, updated) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(job.id, job.photo, job.video, now, now, now) for job in jobs])
+            return db.total_changes - before
+
+    def claim(self, worker_id: str) -> Optional[BatchJob]:
+        """Lease the oldest available job to `worker_id`, or return None if there is none."""
+        now = time.time()
+        with self._transaction() as db:
+            db.execute(
+                "UPDATE jobs SET status = 'failed', lease_owner = NULL, updated = ?, "
+                "error = COALESCE(error, 'Lease expired') "
+                "WHERE status = 'running' AND lease_expires < ? AND attempts >= ?",
+                (now, now, self.max_attempts))
+            row = db.execute(
+                "SELECT id, photo, video FROM jobs "
+                "WHERE (status = 'pending' AND available_at <= ?) "
+                "OR (status = 'running' AND lease_expires < ?) "
+                "ORDER BY created, id LIMIT 1",
+                (now, now)).fetchone()
+            if row is None:
+                return None
+            db.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, lease_owner = ?, "
+                "lease_expires = ?, updated = ? WHERE id = ?",
+                (worker_id, now + self.lease_seconds, now, row[0]))
+        return BatchJob(*row)
+
+    def heartbeat(self, job_ids: Iterable[str], worker_id: str) -> int:
+        """Extend the leases `worker_id` still holds; returns how many were renewed."""
+        now = time.time()
+        with self._transaction() as db:
+            before = db.total_changes
+            db.executemany(
+                "UPDATE jobs SET lease_expires = ?, updated = ? "
+                "WHERE id = ? AND status = 'running' AND lease_owner = ?",
+                [(now + self.lease_seconds, now, job_id, worker_id) for job_id in job_ids])
+            return db.total_changes - before
+
+    def complete(self, job_id: str, result: dict):
+        """Store a finished result.
+
+        Accepted even if the lease was lost meanwhile: the analysis is already
+        paid for, and a duplicate run of the job will find it done.
+        """
+        now = time.time()
+        with self._transaction() as db:
+            db.execute(
+                "UPDATE jobs SET status = 'done', result = ?, error = NULL, lease_owner = NULL, "
+                "updated = ? WHERE id = ? AND status != 'done'",
+                (json.dumps(result), now, job_id))
+
+    def fail(self, job_id: str, worker_id: str, error: str, retry: bool = True):
+        """Record a failed attempt, re-queueing with backoff while attempts remain."""
+        now = time.time()
+        with self._transaction() as db:
+            row = db.execute(
+                "SELECT attempts FROM jobs WHERE id = ? AND status = 'running' AND lease_owner = ?",
+                (job_id, worker_id)).fetchone()
+            if row is None:
+                return
+            attempts = row[0]
+            if retry and attempts < self.max_attempts:
+                delay = self.retry_backoff * 2 ** (attempts - 1) * random.uniform(0.5, 1.5)
+                db.execute(
+                    "UPDATE jobs SET status = 'pending', available_at = ?, error = ?, "
+                    "lease_owner = NULL, updated = ? WHERE id = ?",
+                    (now + delay, error, now, job_id))
+            else:
+                db.execute(
+                    "UPDATE jobs SET status = 'failed', error = ?, lease_owner = NULL, updated = ? "
+                    "WHERE id = ?",
+                    (error, now, job_id))
+
+    def retry_failed(self) -> int:
+        """Move permanently failed jobs back to pending with a fresh attempt budget."""
+        now = time.time()
+        with self._transaction() as db:
+            return db.execute(
+                "UPDATE jobs SET status = 'pending', attempts = 0, available_at = ?, updated = ? "
+                "WHERE status = 'failed'",
+                (now, now)).rowcount
+
+    def counts(self) -> Dict[str, int]:
+        """Number of jobs per status."""
+        rows = self._connection().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: dict(rows).get(status, 0) for status in STATUSES}
+
+    def has_unfinished(self) -> bool:
+        """Whether any job is pending or running (possibly under another worker's lease)."""
+        row = self._connection().execute(
+            "SELECT 1 FROM jobs WHERE status IN ('pending', 'running') LIMIT 1").fetchone()
+        return row is not None
+
+    def records(self) -> Iterator[dict]:
+        """Finished and failed jobs as batch-style records, in enqueue order."""
+        rows = self._connection().execute(
+            "SELECT id, photo, video, status, attempts, result, error FROM jobs "
+            "WHERE status IN ('done', 'failed') ORDER BY created, id").fetchall()
+        for job_id, photo, video, status, attempts, result, error in rows:
+            record = {"id": job_id, "photo": photo, "video": video, "attempts": attempts}
+            if status == "done":
+                record["result"] = json.loads(result)
+            else:
+                record["error"] = error
+            yield record
+
+    def close(self):
+        """Close this thread's connection."""
+        db = getattr(self._local, "db", None)
+        if db is not None:
+            db.close()
+            self._local.db = None
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def run_worker(detector, queue: JobQueue, concurrency: int = 1, worker_id: str = None,
+               poll_interval: float = 2.0) -> dict:
+    """Claim and analyze jobs until the queue has nothing left to do.
+
+    `concurrency` threads share one detector and one lease owner id; a
+    background thread renews the leases of every job in flight. Missing input
+    files fail immediately; other errors, including a Gemini call that failed
+    inside the analysis (`DetectionResult.error`), are retried by the queue.
+    """
+    worker_id = worker_id or default_worker_id()
+    active = set()
+    active_lock = threading.Lock()
+    stop = threading.Event()
+    processed = {"done": 0, "errors": 0}
+
+    def record(outcome: str):
+        with active_lock:
+            processed[outcome] += 1
+
+    def heartbeat():
+        while not stop.wait(max(1.0, queue.lease_seconds / 3)):
+            with active_lock:
+                job_ids = list(active)
+            if job_ids:
+                queue.heartbeat(job_ids, worker_id)
+        queue.close()
+
+    def work():
+        try:
+            while True:
+                job = queue.claim(worker_id)
+                if job is None:
+                    if not queue.has_unfinished():
+                        return
+                    time.sleep(poll_interval)
+                    continue
+
+                with active_lock:
+                    active.add(job.id)
+                try:
+                    result = detector.analyze(reference_photo=job.photo, video_path=job.video)
+                    if result.error:
+                        queue.fail(job.id, worker_id, result.error)
+                        print(f"[{job.id}] attempt failed: {result.error}")
+                        record("errors")
+                    else:
+                        queue.complete(job.id, result.to_dict())
+                        print(f"[{job.id}] {result.verdict.value}")
+                        record("done")
+                except FileNotFoundError as e:
+                    queue.fail(job.id, worker_id, str(e), retry=False)
+                    print(f"[{job.id}] failed: {e}")
+                    record("errors")
+                except Exception as e:
+                    queue.fail(job.id, worker_id, str(e))
+                    print(f"[{job.id}] attempt failed: {e}")
+                    record("errors")
+                finally:
+                    with active_lock:
+                        active.discard(job.id)
+        finally:
+            queue.close()
+
+    heartbeat_thread = threading.Thread(target=heartbeat, name="job-heartbeat", daemon=True)
+    heartbeat_thread.start()
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="job-worker") as pool:
+            for future in [pool.submit(work) for _ in range(max(1, concurrency))]:
+                future.result()
+    finally:
+        stop.set()
+        heartbeat_thread.join()
+    return {"worker_id": worker_id, "processed": processed, "queue": queue.counts()}
@@ -2,15 +2,17 @@
 """Deepfake Detection Tool - Main Entry Point."""
 
 import argparse
+import contextlib
 import json
 import sys
 from pathlib import Path
 
-from src.detector import DeepfakeDetector
-from src.cli_output import print_header, print_results
+from src.config import config
+from src.detector import DeepfakeDetector, ANALYSIS_MODES
+from src.cli_output import print_header, print_results, print_batch_summary, print_job_counts
 
 
-def parse_args():
+def parse_args(argv=None):
     """Parse command line arguments."""
     parser = argparse.ArgumentParser(
         description="Deepfake Detection Tool using Gemini",
@@ -19,15 +21,205 @@ def parse_args():
 Examples:
     python -m src.main --photo person.jpg --video test.mp4
     python -m src.main --photo person.jpg --video test.mp4 --output result.json
+    python -m src.main --photo person.jpg --video test.mp4 --cache-dir .cache
+    python -m src.main --photo person.jpg --video test.mp4 --mode video
+    python -m src.main --photo person.jpg --video test.mp4 --trace-file traces.jsonl
+    python -m src.main batch manifest.csv --concurrency 8 --output results.jsonl
+    python -m src.main serve --port 8080 --workers 2
+    python -m src.main jobs enqueue manifest.csv && python -m src.main jobs work
         """)
     parser.add_argument("--photo", "-p", required=True, help="Reference photo path")
     parser.add_argument("--video", "-v", required=True, help="Video file path")
     parser.add_argument("--output", "-o", help="JSON output path")
     parser.add_argument("--api-key", help="Gemini API key (overrides .env)")
-    return parser.parse_args()
+    parser.add_argument("--cache-dir", help="Reuse results for repeated inputs from this directory")
+    parser.add_argument("--mode", choices=ANALYSIS_MODES, default=config.analysis_mode,
+                        help="frames: send sampled stills; video: upload the whole clip via the Files API")
+    parser.add_argument("--trace-file", default=config.trace_file,
+                        help="Append per-stage timing spans to this JSONL file")
+    return parser.parse_args(argv)
+
+
+def parse_batch_args(argv=None):
+    """Parse `batch` subcommand arguments."""
+    parser = argparse.ArgumentParser(
+        prog="python -m src.main batch",
+        description="Analyze many photo/video pairs, streaming one JSON result per line",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Manifest formats:
+    CSV with a header row:  id,photo,video
+    JSONL, one object per line: {"id": "...", "photo": "...", "video": "..."}
+    Directory: videos are paired with {person}_reference.jpg by name prefix
+        """)
+    parser.add_argument("manifest", help="CSV/JSONL manifest or directory of videos")
+    parser.add_argument("--photo", "-p", help="Reference photo for rows/videos without one")
+    parser.add_argument("--concurrency", "-c", type=int, default=config.batch_concurrency,
+                        help="Maximum analyses in flight")
+    parser.add_argument("--output", "-o", help="JSONL output path (default: stdout)")
+    parser.add_argument("--api-key", help="Gemini API key (overrides .env)")
+    parser.add_argument("--cache-dir", help="Reuse results for repeated inputs from this directory")
+    parser.add_argument("--trace-file", default=config.trace_file,
+                        help="Append per-stage timing spans to this JSONL file")
+    return parser.parse_args(argv)
+
+
+def batch_main(argv=None):
+    """Run the `batch` subcommand."""
+    from src.batch import load_jobs, run_batch
+    
+    args = parse_batch_args(argv)
+    try:
+        jobs = load_jobs(args.manifest, photo=args.photo)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Error reading manifest: {e}")
+        sys.exit(1)
+    
+    config.trace_file = args.trace_file
+    try:
+        detector = DeepfakeDetector(api_key=args.api_key, cache_dir=args.cache_dir)
+    except ValueError as e:
+        print(f"Error: {e}\nPlease set GEMINI_API_KEY in .env or use --api-key")
+        sys.exit(1)
+    
+    # Results stream to stdout unless --output is given, so progress goes to stderr
+    out = open(args.output, "w") if args.output else sys.stdout
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            summary = run_batch(detector, jobs, args.concurrency, out)
+    finally:
+        detector.close()
+        if args.output:
+            out.close()
+    
+    print_batch_summary(summary, file=sys.stderr)
+    sys.exit(1 if summary["failed"] else 0)
+
+
+def parse_serve_args(argv=None):
+    """Parse `serve` subcommand arguments."""
+    parser = argparse.ArgumentParser(
+        prog="python -m src.main serve",
+        description="Serve the detector over HTTP, keeping models warm between requests",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Endpoints:
+    POST /analyze   multipart/form-data with `photo` and `video` file fields
+    GET  /healthz   process is up
+    GET  /readyz    models are warm and the queue has room (503 otherwise)
+        """)
+    parser.add_argument("--host", default=config.server_host, help="Bind address")
+    parser.add_argument("--port", type=int, default=config.server_port, help="Port to listen on")
+    parser.add_argument("--workers", "-w", type=int, default=config.server_workers,
+                        help="Analyses run concurrently")
+    parser.add_argument("--queue-size", "-q", type=int, default=config.server_queue_size,
+                        help="Requests allowed to wait for a worker before returning 429")
+    parser.add_argument("--api-key", help="Gemini API key (overrides .env)")
+    parser.add_argument("--cache-dir", help="Reuse results for repeated inputs from this directory")
+    return parser.parse_args(argv)
+
+
+def serve_main(argv=None):
+    """Run the `serve` subcommand."""
+    from src.server import serve
+    
+    args = parse_serve_args(argv)
+    try:
+        detector = DeepfakeDetector(api_key=args.api_key, cache_dir=args.cache_dir)
+    except ValueError as e:
+        print(f"Error: {e}\nPlease set GEMINI_API_KEY in .env or use --api-key")
+        sys.exit(1)
+    
+    serve(detector, host=args.host, port=args.port, workers=args.workers, queue_size=args.queue_size)
+    sys.exit(0)
+
+
+def parse_jobs_args(argv=None):
+    """Parse `jobs` subcommand arguments."""
+    parser = argparse.ArgumentParser(
+        prog="python -m src.main jobs",
+        description="Durable job queue: enqueue a backlog, then run any number of workers against it",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+    python -m src.main jobs enqueue manifest.csv
+    python -m src.main jobs work --concurrency 4 --cache-dir .cache
+    python -m src.main jobs status
+    python -m src.main jobs export --output results.jsonl
+        """)
+    parser.add_argument("--db", default=config.jobs_db, help="SQLite queue file")
+    actions = parser.add_subparsers(dest="action", required=True)
+    
+    enqueue = actions.add_parser("enqueue", help="Add jobs from a manifest or directory")
+    enqueue.add_argument("manifest", help="CSV/JSONL manifest or directory of videos")
+    enqueue.add_argument("--photo", "-p", help="Reference photo for rows/videos without one")
+    
+    work = actions.add_parser("work", help="Process jobs until the queue is drained")
+    work.add_argument("--concurrency", "-c", type=int, default=config.batch_concurrency,
+                      help="Analyses in flight in this worker")
+    work.add_argument("--api-key", help="Gemini API key (overrides .env)")
+    work.add_argument("--cache-dir", help="Reuse results for repeated inputs from this directory")
+    
+    actions.add_parser("status", help="Show job counts by status")
+    actions.add_parser("retry", help="Re-queue permanently failed jobs")
+    
+    export = actions.add_parser("export", help="Write finished results as JSONL")
+    export.add_argument("--output", "-o", help="JSONL output path (default: stdout)")
+    return parser.parse_args(argv)
+
+
+def jobs_main(argv=None):
+    """Run the `jobs` subcommand."""
+    from src.batch import load_jobs
+    from src.jobs import JobQueue, run_worker
+    
+    args = parse_jobs_args(argv)
+    queue = JobQueue(args.db)
+    
+    if args.action == "enqueue":
+        try:
+            jobs = load_jobs(args.manifest, photo=args.photo)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Error reading manifest: {e}")
+            sys.exit(1)
+        added = queue.enqueue(jobs)
+        print(f"Enqueued {added} new job(s), {len(jobs) - added} already queued")
+    elif args.action == "work":
+        try:
+            detector = DeepfakeDetector(api_key=args.api_key, cache_dir=args.cache_dir)
+        except ValueError as e:
+            print(f"Error: {e}\nPlease set GEMINI_API_KEY in .env or use --api-key")
+            sys.exit(1)
+        try:
+            summary = run_worker(detector, queue, concurrency=args.concurrency)
+        finally:
+            detector.close()
+        print(f"Worker {summary['worker_id']}: {summary['processed']['done']} done, "
+              f"{summary['processed']['errors']} errors")
+    elif args.action == "retry":
+        print(f"Re-queued {queue.retry_failed()} failed job(s)")
+    elif args.action == "export":
+        out = open(args.output, "w") if args.output else sys.stdout
+        try:
+            for record in queue.records():
+                out.write(json.dumps(record) + "\n")
+        finally:
+            if args.output:
+                out.close()
+        sys.exit(0)
+    
+    print_job_counts(queue.counts())
+    sys.exit(1 if args.action == "work" and queue.counts()["failed"] else 0)
 
 
 def main():
+    if sys.argv[1:2] == ["batch"]:
+        batch_main(sys.argv[2:])
+    if sys.argv[1:2] == ["serve"]:
+        serve_main(sys.argv[2:])
+    if sys.argv[1:2] == ["jobs"]:
+        jobs_main(sys.argv[2:])
+    
     args = parse_args()
     
     if not Path(args.photo).exists():
@@ -37,8 +229,9 @@ def main():
         print(f"Error: Video file not found: {args.video}")
         sys.exit(1)
     
+    config.trace_file = args.trace_file
     try:
-        detector = DeepfakeDetector(api_key=args.api_key)
+        detector = DeepfakeDetector(api_key=args.api_key, cache_dir=args.cache_dir)
     except ValueError as e:
         print(f"Error: {e}\nPlease set GEMINI_API_KEY in .env or use --api-key")
         sys.exit(1)
@@ -48,7 +241,8 @@ def main():
     try:
         result = detector.analyze(
             reference_photo=args.photo,
-            video_path=args.video)
+            video_path=args.video,
+            mode=args.mode)
     except Exception as e:
         print(f"Error during analysis: {e}")
         sys.exit(1)
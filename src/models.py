@@ -49,6 +49,14 @@ class IdentityMatchResult(LayerResult):
     frames_analyzed: int = 0
 
 
+@dataclass
+class AudioVisualSyncResult(LayerResult):
+    """Mouth movement vs. audio envelope cross-correlation."""
+    correlation: float = 0.0
+    lag_seconds: float = 0.0
+    duration_seconds: float = 0.0
+
+
 @dataclass
 class EvidenceFrame:
     """Evidence frame with detected issue."""
@@ -66,6 +74,7 @@ class DetectionResult:
     verdict: DetectionVerdict = DetectionVerdict.INCONCLUSIVE
     fake_confidence_score: float = 0.5
     processing_time_seconds: float = 0.0
+    payload_bytes: int = 0
     
     book_verification: Optional[BookVerificationResult] = None
     eye_analysis: Optional[EyeAnalysisResult] = None
@@ -75,6 +84,9 @@ class DetectionResult:
     identity_match: Optional[IdentityMatchResult] = None
     evidence_frames: List[EvidenceFrame] = field(default_factory=list)
     gemini_analysis: Optional[str] = None
+    # Set when the Gemini call failed; the verdict is then INCONCLUSIVE by default, not a finding
+    error: Optional[str] = None
+    timings: dict = field(default_factory=dict)
     
     def to_dict(self) -> dict:
         """Convert to dictionary for JSON serialization."""
@@ -84,6 +96,7 @@ class DetectionResult:
             "verdict": self.verdict.value,
             "fake_confidence_score": self.fake_confidence_score,
             "processing_time_seconds": self.processing_time_seconds,
+            "payload_bytes": self.payload_bytes,
             "detection_layers": {
                 "book_verification": self._layer_to_dict(self.book_verification),
                 "eye_analysis": self._layer_to_dict(self.eye_analysis),
@@ -96,6 +109,8 @@ class DetectionResult:
                 {"frame": e.frame_number, "timestamp": e.timestamp, "issue": e.issue}
                 for e in self.evidence_frames
             ],
+            "error": self.error,
+            "timings": self.timings,
         }
     
     def _layer_to_dict(self, layer: Optional[LayerResult]) -> Optional[dict]:
@@ -108,13 +123,48 @@ class DetectionResult:
             result["spelling_errors"] = layer.spelling_errors
         if hasattr(layer, "blink_rate"):
             result["blink_rate"] = layer.blink_rate
+            result["blink_count"] = layer.blink_count
             result["expected_rate_range"] = list(layer.expected_rate_range)
         if hasattr(layer, "reference_similarity"):
             result["reference_similarity"] = layer.reference_similarity
             result["frame_variance"] = layer.frame_variance
+            result["frames_analyzed"] = layer.frames_analyzed
+        if hasattr(layer, "lag_seconds"):
+            result["correlation"] = layer.correlation
+            result["lag_seconds"] = layer.lag_seconds
+            result["duration_seconds"] = layer.duration_seconds
         return result
 
 
+@dataclass
+class SessionResult:
+    """Combined result for several videos checked against one reference photo."""
+    session_id: str = field(default_factory=lambda: str(uuid.uuid4()))
+    verdict: DetectionVerdict = DetectionVerdict.INCONCLUSIVE
+    fake_confidence_score: float = 0.5
+    processing_time_seconds: float = 0.0
+    videos: List[str] = field(default_factory=list)
+    # Aligned with `videos`; a failed video has no result and an error message, a failed
+    # Gemini call keeps its INCONCLUSIVE result next to the error
+    results: List[Optional[DetectionResult]] = field(default_factory=list)
+    errors: List[Optional[str]] = field(default_factory=list)
+    timings: dict = field(default_factory=dict)
+    
+    def to_dict(self) -> dict:
+        """Convert to dictionary for JSON serialization."""
+        return {
+            "session_id": self.session_id,
+            "verdict": self.verdict.value,
+            "fake_confidence_score": self.fake_confidence_score,
+            "processing_time_seconds": self.processing_time_seconds,
+            "videos": [
+                {"video": video, "result": result.to_dict() if result else None, "error": error}
+                for video, result, error in zip(self.videos, self.results, self.errors)
+            ],
+            "timings": self.timings,
+        }
+
+
 @dataclass
 class VideoMetadata:
     """Metadata extracted from video."""
@@ -124,3 +174,13 @@ class VideoMetadata:
     height: int
     total_frames: int
     has_audio: bool = False
+    codec: str = ""
+    rotation: int = 0  # degrees clockwise from the rotation metadata; decoders apply it
+    audio_sample_rate: int = 0
+    
+    @property
+    def display_size(self) -> tuple:
+        """(width, height) of decoded frames once rotation is applied."""
+        if self.rotation % 180 == 90:
+            return self.height, self.width
+        return self.width, self.height
@@ -1,7 +1,11 @@
 """Preprocessing modules."""
 
+from src.preprocessing.frames import FrameStore
+from src.preprocessing.probe import MediaProbe
+from src.preprocessing.selection import FrameSelector
 from src.preprocessing.video import VideoProcessor
 from src.preprocessing.face import FaceProcessor
 from src.preprocessing.audio import AudioProcessor
+from src.preprocessing.sync import SyncAnalyzer
 
-__all__ = ["VideoProcessor", "FaceProcessor", "AudioProcessor"]
+__all__ = ["FrameStore", "MediaProbe", "FrameSelector", "VideoProcessor", "FaceProcessor", "AudioProcessor", "SyncAnalyzer"]
@@ -1,77 +1,203 @@
 """Audio extraction and processing."""
 
 from __future__ import annotations
-from typing import Optional
+from typing import List, Optional, Union
 import subprocess
-import tempfile
-from dataclasses import dataclass
+import wave
+from dataclasses import dataclass, replace
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from src.config import config
+
+from src.models import VideoMetadata
+from src.preprocessing.probe import MediaProbe, get_media_probe
+from src.preprocessing.transcription import TranscriptionWorker, get_transcription_worker
+from src.utils.tracing import span
+
+
+SAMPLE_RATE = 16000
 
 
 @dataclass
 class AudioData:
-    """Extracted audio data."""
-    audio_path: str
-    duration_seconds: float
-    sample_rate: int = 16000
+    """Extracted audio data: 16 kHz mono float32 samples, or a WAV file when one was requested."""
+    samples: Optional[np.ndarray] = None
+    duration_seconds: float = 0.0
+    sample_rate: int = SAMPLE_RATE
+    audio_path: Optional[str] = None
     transcription: str = ""
+    # [[start, end], ...] seconds of detected speech; None until VAD has run
+    speech_segments: Optional[List[List[float]]] = None
 
 
 class AudioProcessor:
     """Handles audio extraction and transcription."""
     
-    def __init__(self):
-        self.whisper_model = None
+    def __init__(self, transcription_worker: Optional[TranscriptionWorker] = None,
+                 probe: Optional[MediaProbe] = None):
+        self.transcription_worker = transcription_worker
+        self.probe = probe or get_media_probe()
     
-    def extract_audio(self, video_path: str, output_path: str = None) -> Optional[AudioData]:
-        """Extract audio from video using ffmpeg."""
-        if output_path is None:
-            temp_dir = tempfile.mkdtemp()
-            output_path = f"{temp_dir}/audio.wav"
+    def extract_audio(self, video_path: str, output_path: str = None,
+                      metadata: Optional[VideoMetadata] = None) -> Optional[AudioData]:
+        """Extract audio from video using ffmpeg.
         
+        Samples are piped from ffmpeg into memory as float32; a WAV file is only
+        written when `output_path` is given. Files without an audio stream (per
+        the shared, memoized probe) return None without starting ffmpeg.
+        """
+        try:
+            metadata = metadata or self.probe.probe(video_path)
+        except ValueError as e:
+            print(f"Audio extraction error: {e}")
+            return None
+        if not metadata.has_audio:
+            return None
+        with span("audio_extract") as attrs:
+            audio = self._extract_audio(video_path, output_path, attrs)
+            if audio:
+                attrs.update(seconds=audio.duration_seconds)
+            return audio
+    
+    def _extract_audio(self, video_path: str, output_path: Optional[str], attrs: dict) -> Optional[AudioData]:
+        target = [output_path] if output_path else ["-f", "s16le", "pipe:1"]
         try:
             result = subprocess.run(
-                ["ffmpeg", "-y", "-i", video_path,
-                 "-vn", "-acodec", "pcm_s16le", "-ar", "16000", "-ac", "1",
-                 output_path],
-                capture_output=True, text=True, timeout=60)
+                ["ffmpeg", "-nostdin", "-y", "-v", "error", "-i", video_path,
+                 "-vn", "-acodec", "pcm_s16le", "-ar", str(SAMPLE_RATE), "-ac", "1"] + target,
+                capture_output=True, timeout=60)
             
             if result.returncode != 0:
-                print(f"FFmpeg error: {result.stderr}")
+                print(f"FFmpeg error: {result.stderr.decode(errors='replace')}")
+                attrs["error"] = f"ffmpeg exited with {result.returncode}"
                 return None
             
-            duration = self._get_duration(output_path)
-            return AudioData(audio_path=output_path, duration_seconds=duration, sample_rate=16000)
+            if output_path:
+                return AudioData(audio_path=output_path, duration_seconds=self._wav_duration(output_path))
+            samples = np.frombuffer(result.stdout, dtype=np.int16).astype(np.float32)
+            samples *= 1.0 / 32768
+            attrs["bytes"] = len(result.stdout)
+            return AudioData(samples=samples, duration_seconds=len(samples) / SAMPLE_RATE)
         except Exception as e:
             print(f"Audio extraction error: {e}")
+            attrs["error"] = str(e)
             return None
     
-    def _get_duration(self, audio_path: str) -> float:
-        """Get audio duration using ffprobe."""
+    @staticmethod
+    def _wav_duration(audio_path: str) -> float:
+        """Duration of the extracted WAV from its header, without another ffprobe run."""
         try:
-            result = subprocess.run(
-                ["ffprobe", "-v", "error", "-show_entries", "format=duration",
-                 "-of", "csv=p=0", audio_path],
-                capture_output=True, text=True, timeout=10)
-            return float(result.stdout.strip())
-        except Exception:
+            with wave.open(audio_path, "rb") as wav:
+                return wav.getnframes() / wav.getframerate()
+        except (OSError, wave.Error, ZeroDivisionError):
             return 0.0
     
-    def transcribe(self, audio_path: str) -> str:
-        """Transcribe audio using Whisper."""
+    def transcribe(self, audio: Union[AudioData, str]) -> str:
+        """Transcribe extracted audio (or a WAV path) using the shared, warm Whisper worker."""
+        if isinstance(audio, AudioData):
+            audio = audio.samples if audio.samples is not None else audio.audio_path
+        with span("transcribe") as attrs:
+            try:
+                worker = self.transcription_worker or get_transcription_worker()
+                text = worker.transcribe(audio)
+                attrs["chars"] = len(text)
+                return text
+            except ImportError:
+                print("Whisper not installed. Skipping transcription.")
+                attrs["skipped"] = "whisper not installed"
+                return ""
+            except Exception as e:
+                print(f"Transcription error: {e}")
+                attrs["error"] = str(e)
+                return ""
+    
+    def warm_up(self) -> bool:
+        """Load the Whisper model now so the first transcription does not pay for it."""
         try:
-            if self.whisper_model is None:
-                import whisper
-                self.whisper_model = whisper.load_model("base")
-            
-            result = self.whisper_model.transcribe(audio_path, language="en", fp16=False)
-            return result.get("text", "")
+            worker = self.transcription_worker or get_transcription_worker()
+            worker.warm_up()
+            return True
         except ImportError:
-            print("Whisper not installed. Skipping transcription.")
-            return ""
+            return False
         except Exception as e:
-            print(f"Transcription error: {e}")
-            return ""
+            print(f"Whisper warm-up failed: {e}")
+            return False
+    
+    def analyze_audio_features(self, audio: AudioData) -> dict:
+        """Voice activity of in-memory audio: whether there is speech and where.
+        
+        Returns {"has_speech", "speech_segments": [[start, end], ...] in seconds,
+        "speech_seconds"}. Audio that only exists as a file is assumed to be all speech.
+        Segments are kept on `audio`, so later callers reuse them.
+        """
+        if audio.samples is None:
+            return {"has_speech": True, "speech_segments": [[0.0, audio.duration_seconds]],
+                    "speech_seconds": audio.duration_seconds}
+        if audio.speech_segments is None:
+            with span("vad") as attrs:
+                audio.speech_segments = self.detect_speech(audio.samples, audio.sample_rate)
+                attrs["segments"] = len(audio.speech_segments)
+        segments = audio.speech_segments
+        speech_seconds = round(sum(end - start for start, end in segments), 3)
+        return {"has_speech": bool(segments), "speech_segments": segments, "speech_seconds": speech_seconds}
     
-    def analyze_audio_features(self, audio_path: str) -> dict:
-        """Analyze basic audio features."""
-        return {"has_speech": True, "speech_segments": []}
+    @staticmethod
+    def detect_speech(samples: np.ndarray, sample_rate: int = SAMPLE_RATE, frame_ms: float = 30,
+                      margin_db: float = None, hangover_ms: float = None,
+                      min_speech_ms: float = 90) -> List[List[float]]:
+        """Energy/zero-crossing voice activity detection over 30 ms frames.
+        
+        A frame is speech when its energy is `margin_db` above the clip's noise
+        floor (10th percentile frame energy), above an absolute floor, and its
+        zero-crossing rate is below that of broadband noise. Bursts shorter than
+        `min_speech_ms` are dropped, and each speech frame keeps the detector on
+        for `hangover_ms` so pauses between words do not split a segment.
+        """
+        margin_db = config.vad_margin_db if margin_db is None else margin_db
+        hangover_ms = config.vad_hangover_ms if hangover_ms is None else hangover_ms
+        frame = max(1, int(sample_rate * frame_ms / 1000))
+        if len(samples) < frame:
+            return []
+        
+        windows = sliding_window_view(samples, frame)[::frame]
+        energy_db = 10 * np.log10(np.einsum("ij,ij->i", windows, windows) / frame + 1e-10)
+        signs = np.signbit(windows)
+        zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / (frame - 1)
+        floor = np.percentile(energy_db, 10)
+        active = (energy_db > max(floor + margin_db, -50.0)) & (zcr < 0.4)
+        
+        min_frames = max(1, round(min_speech_ms / frame_ms))
+        if min_frames > 1:
+            runs = np.convolve(active, np.ones(min_frames, dtype=int), mode="valid") == min_frames
+            active = np.convolve(runs, np.ones(min_frames, dtype=int))[:len(active)] > 0
+        hangover = round(hangover_ms / frame_ms)
+        if hangover:
+            active = np.convolve(active, np.ones(hangover + 1, dtype=int))[:len(active)] > 0
+        
+        edges = np.flatnonzero(np.diff(np.concatenate([[0], active.astype(np.int8), [0]])))
+        seconds = frame / sample_rate
+        duration = len(samples) / sample_rate
+        return [[round(float(start * seconds), 3), round(float(min(end * seconds, duration)), 3)]
+                for start, end in zip(edges[::2], edges[1::2])]
+    
+    @staticmethod
+    def speech_only(audio: AudioData, segments: List[List[float]], gap_seconds: float = 0.3) -> AudioData:
+        """Audio with everything outside `segments` cut out, segments separated by short silences."""
+        rate = audio.sample_rate
+        gap = np.zeros(int(gap_seconds * rate), dtype=np.float32)
+        pieces = []
+        for start, end in segments:
+            pieces += [audio.samples[int(start * rate):int(end * rate)], gap]
+        samples = np.concatenate(pieces[:-1]) if pieces else np.zeros(0, dtype=np.float32)
+        return replace(audio, samples=samples, duration_seconds=len(samples) / rate, speech_segments=None)
+    
+    def transcribe_speech(self, audio: AudioData) -> str:
+        """Transcribe only the detected speech; clips without speech skip Whisper entirely."""
+        if not config.vad_enabled or audio.samples is None:
+            return self.transcribe(audio)
+        features = self.analyze_audio_features(audio)
+        if not features["has_speech"]:
+            print("No speech detected; skipping transcription")
+            return ""
+        return self.transcribe(self.speech_only(audio, features["speech_segments"]))
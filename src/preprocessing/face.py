@@ -1,11 +1,18 @@
 """Face detection and processing using MediaPipe and DeepFace."""
 
 from __future__ import annotations
-from typing import Optional
+from collections import OrderedDict
+from typing import Iterable, Optional, Sequence
+import threading
 import numpy as np
 from dataclasses import dataclass
+from pathlib import Path
 from PIL import Image
-import mediapipe as mp
+
+# FaceMesh landmark indices (p1..p6) for the Eye Aspect Ratio of each eye
+LEFT_EYE = (33, 160, 158, 133, 153, 144)
+RIGHT_EYE = (362, 385, 387, 263, 373, 380)
+NUM_LANDMARKS = 478
 
 
 @dataclass
@@ -19,15 +26,73 @@ class FaceData:
 
 @dataclass
 class FaceMeshData:
-    """Face mesh landmarks from MediaPipe."""
-    landmarks: list
+    """Face mesh landmarks from MediaPipe as a (478, 3) float32 array in pixels."""
+    landmarks: np.ndarray
     frame_index: int = 0
 
 
+@dataclass
+class BlinkStats:
+    """Blink measurement over a frame sequence."""
+    blink_count: int
+    blink_rate: float
+    duration_seconds: float
+    face_coverage: float
+
+
+@dataclass
+class IdentityStats:
+    """Local identity measurement against a reference embedding."""
+    reference_similarity: float
+    frame_variance: float
+    frames_analyzed: int
+
+
+class EmbeddingCache:
+    """Face embeddings keyed by image content hash, in memory and optionally as .npy files."""
+    
+    def __init__(self, cache_dir: Optional[str] = None, max_entries: int = 256):
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        if self.cache_dir:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        if self.cache_dir and (self.cache_dir / f"{key}.npy").exists():
+            embedding = np.load(self.cache_dir / f"{key}.npy")
+            self._remember(key, embedding)
+            return embedding
+        return None
+    
+    def put(self, key: str, embedding: np.ndarray):
+        self._remember(key, embedding)
+        if self.cache_dir:
+            np.save(self.cache_dir / f"{key}.npy", embedding)
+    
+    def _remember(self, key: str, embedding: np.ndarray):
+        with self._lock:
+            self._entries[key] = embedding
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
 class FaceProcessor:
     """Handles face detection, landmark extraction, and embedding."""
     
-    def __init__(self):
+    EMBEDDING_MODEL = "Facenet"
+    
+    def __init__(self, embedding_cache: Optional[EmbeddingCache] = None):
+        self.embedding_cache = embedding_cache or EmbeddingCache()
+        # MediaPipe graphs are not safe to share between threads
+        self._lock = threading.Lock()
+        import mediapipe as mp
         self.mp_face_mesh = mp.solutions.face_mesh
         self.face_mesh = self.mp_face_mesh.FaceMesh(
             static_image_mode=True, max_num_faces=1,
@@ -38,7 +103,8 @@ class FaceProcessor:
     
     def detect_face(self, image: np.ndarray) -> Optional[FaceData]:
         """Detect face in image and return face data."""
-        results = self.face_detection.process(image)
+        with self._lock:
+            results = self.face_detection.process(image)
         if not results.detections:
             return None
         bbox = results.detections[0].location_data.relative_bounding_box
@@ -48,18 +114,50 @@ class FaceProcessor:
             landmarks={})
     
     def get_face_mesh(self, image: np.ndarray, frame_index: int = 0) -> Optional[FaceMeshData]:
-        """Extract 468 face mesh landmarks."""
-        results = self.face_mesh.process(image)
+        """Extract 478 face mesh landmarks."""
+        with self._lock:
+            results = self.face_mesh.process(image)
         if not results.multi_face_landmarks:
             return None
-        landmarks = [{"x": lm.x, "y": lm.y, "z": lm.z} for lm in results.multi_face_landmarks[0].landmark]
-        return FaceMeshData(landmarks=landmarks, frame_index=frame_index)
+        return FaceMeshData(landmarks=self._landmarks_to_array(results, image.shape), frame_index=frame_index)
+    
+    def track_landmarks(self, frames: Iterable[np.ndarray]) -> np.ndarray:
+        """Run FaceMesh in tracking mode over a frame sequence.
+        
+        Returns an (N, 478, 3) float32 array in pixel units, NaN where no face was
+        found. Frames may reuse one buffer; each is processed before the next is read.
+        """
+        tracker = self.mp_face_mesh.FaceMesh(
+            static_image_mode=False, max_num_faces=1,
+            refine_landmarks=True, min_detection_confidence=0.5, min_tracking_confidence=0.5)
+        rows = []
+        try:
+            for frame in frames:
+                results = tracker.process(frame)
+                if results.multi_face_landmarks:
+                    rows.append(self._landmarks_to_array(results, frame.shape))
+                else:
+                    rows.append(np.full((NUM_LANDMARKS, 3), np.nan, dtype=np.float32))
+        finally:
+            tracker.close()
+        if not rows:
+            return np.empty((0, NUM_LANDMARKS, 3), dtype=np.float32)
+        return np.stack(rows)
+    
+    @staticmethod
+    def _landmarks_to_array(results, shape) -> np.ndarray:
+        """Convert normalized MediaPipe landmarks to a pixel-space (478, 3) array."""
+        h, w = shape[:2]
+        points = np.array([(lm.x, lm.y, lm.z) for lm in results.multi_face_landmarks[0].landmark],
+                          dtype=np.float32)
+        points *= np.array([w, h, w], dtype=np.float32)
+        return points
     
     def get_face_embedding(self, image: np.ndarray) -> Optional[np.ndarray]:
         """Get face embedding using DeepFace."""
         try:
             from deepface import DeepFace
-            result = DeepFace.represent(image, model_name="Facenet", enforce_detection=False)
+            result = DeepFace.represent(image, model_name=self.EMBEDDING_MODEL, enforce_detection=False)
             if result and len(result) > 0:
                 return np.array(result[0]["embedding"])
             return None
@@ -67,6 +165,93 @@ class FaceProcessor:
             print(f"Face encoding error: {e}")
             return None
     
+    def face_crop(self, image: np.ndarray, margin: float = 0.2) -> Optional[np.ndarray]:
+        """Crop the detected face with a relative margin, or None if no face is found."""
+        face = self.detect_face(image)
+        if face is None:
+            return None
+        x, y, w, h = face.bbox
+        pad_x, pad_y = int(w * margin), int(h * margin)
+        top, left = max(0, y - pad_y), max(0, x - pad_x)
+        crop = image[top:y + h + pad_y, left:x + w + pad_x]
+        return crop if crop.size else None
+    
+    def get_face_embeddings(self, crops: Sequence[np.ndarray]) -> np.ndarray:
+        """Embed face crops as an (N, D) array, NaN rows where embedding failed.
+        
+        Crops are passed to DeepFace as one batch with detection skipped; versions
+        that do not accept a list fall back to one call per crop.
+        """
+        from deepface import DeepFace
+        if not crops:
+            return np.empty((0, 0), dtype=np.float32)
+        try:
+            batch = DeepFace.represent(list(crops), model_name=self.EMBEDDING_MODEL,
+                                       detector_backend="skip", enforce_detection=False)
+            rows = [r[0]["embedding"] if isinstance(r, list) else r["embedding"] for r in batch]
+            if len(rows) != len(crops):
+                raise ValueError("batch size mismatch")
+        except Exception:
+            rows = []
+            for crop in crops:
+                try:
+                    result = DeepFace.represent(crop, model_name=self.EMBEDDING_MODEL,
+                                                detector_backend="skip", enforce_detection=False)
+                    rows.append(result[0]["embedding"])
+                except Exception as e:
+                    print(f"Face encoding error: {e}")
+                    rows.append(None)
+        
+        dim = next((len(r) for r in rows if r is not None), 0)
+        embeddings = np.full((len(rows), dim), np.nan, dtype=np.float32)
+        for i, row in enumerate(rows):
+            if row is not None:
+                embeddings[i] = row
+        return embeddings
+    
+    def reference_embedding(self, image: np.ndarray, content_hash: str) -> Optional[np.ndarray]:
+        """Embedding of the reference photo's face, cached by the photo's content hash."""
+        cached = self.embedding_cache.get(content_hash)
+        if cached is not None:
+            return cached
+        crop = self.face_crop(image)
+        embeddings = self.get_face_embeddings([crop if crop is not None else image])
+        if not embeddings.size or np.isnan(embeddings[0]).any():
+            return None
+        self.embedding_cache.put(content_hash, embeddings[0])
+        return embeddings[0]
+    
+    def measure_identity(self, reference: np.ndarray, frames: Iterable[np.ndarray]) -> Optional[IdentityStats]:
+        """Compare face crops from `frames` with a reference embedding in one batch."""
+        crops = [crop for crop in (self.face_crop(frame) for frame in frames) if crop is not None]
+        if not crops:
+            return None
+        embeddings = self.get_face_embeddings(crops)
+        embeddings = embeddings[~np.isnan(embeddings).any(axis=1)] if embeddings.size else embeddings
+        if not len(embeddings):
+            return None
+        return self.identity_similarity(reference, embeddings)
+    
+    @staticmethod
+    def identity_similarity(reference: np.ndarray, embeddings: np.ndarray) -> IdentityStats:
+        """Reference similarity and frame-to-frame variance from one Gram matrix.
+        
+        Similarities are cosine mapped to [0, 1] like `compare_faces`. Frame
+        variance is the variance of pairwise similarities between frames.
+        """
+        stacked = np.vstack([reference[None], embeddings]).astype(np.float32)
+        norms = np.linalg.norm(stacked, axis=1, keepdims=True)
+        unit = stacked / np.where(norms > 0, norms, 1)
+        similarity = (unit @ unit.T + 1) / 2
+        
+        to_reference = similarity[0, 1:]
+        pairwise = similarity[1:, 1:][np.triu_indices(len(embeddings), k=1)]
+        return IdentityStats(
+            reference_similarity=float(to_reference.mean()),
+            frame_variance=float(pairwise.var()) if pairwise.size else 0.0,
+            frames_analyzed=len(embeddings),
+        )
+    
     def compare_faces(self, emb1: np.ndarray, emb2: np.ndarray) -> float:
         """Compare two face embeddings and return similarity score."""
         try:
@@ -82,16 +267,52 @@ class FaceProcessor:
     
     def calculate_eye_aspect_ratio(self, mesh: FaceMeshData) -> dict:
         """Calculate Eye Aspect Ratio (EAR) for blink detection."""
-        if not mesh or not mesh.landmarks:
+        if not mesh or mesh.landmarks is None or not len(mesh.landmarks):
             return {"left": 0, "right": 0}
+        left, right = np.nan_to_num(self.eye_aspect_ratios(mesh.landmarks[None])[0])
+        return {"left": float(left), "right": float(right)}
+    
+    @staticmethod
+    def eye_aspect_ratios(landmarks: np.ndarray) -> np.ndarray:
+        """EAR of both eyes for every frame of an (N, 478, 3) array, as (N, 2)."""
+        eyes = landmarks[:, [LEFT_EYE, RIGHT_EYE], :2]  # (N, 2, 6, 2)
+        
+        def dist(a, b):
+            return np.linalg.norm(eyes[:, :, a] - eyes[:, :, b], axis=-1)
+        
+        horizontal = dist(0, 3)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ear = (dist(1, 5) + dist(2, 4)) / (2.0 * horizontal)
+        return np.where(horizontal > 0, ear, np.nan)
+    
+    @staticmethod
+    def detect_blinks(ear: np.ndarray, fps: float, closed_ratio: float = 0.75,
+                      max_closed_seconds: float = 1.0) -> BlinkStats:
+        """Count blinks in a per-frame (N, 2) EAR series.
         
-        def ear(p1, p2, p3, p4, p5, p6):
-            def dist(a, b): return np.sqrt((a["x"]-b["x"])**2 + (a["y"]-b["y"])**2)
-            lm = mesh.landmarks
-            h = dist(lm[p1], lm[p4])
-            return (dist(lm[p2], lm[p6]) + dist(lm[p3], lm[p5])) / (2.0 * h) if h else 0
+        A blink is a run of frames whose mean EAR drops below `closed_ratio` of the
+        clip's median EAR, lasting at most `max_closed_seconds`. The rate is per
+        minute of frames with a detected face.
+        """
+        with np.errstate(invalid="ignore"):
+            mean_ear = ear.mean(axis=1) if len(ear) else np.empty(0)
+        valid = ~np.isnan(mean_ear)
+        duration = float(valid.sum() / fps) if fps else 0.0
+        coverage = float(valid.mean()) if len(valid) else 0.0
+        if not valid.any() or duration <= 0:
+            return BlinkStats(blink_count=0, blink_rate=0.0, duration_seconds=duration, face_coverage=coverage)
         
-        return {"left": ear(33, 160, 158, 133, 153, 144), "right": ear(362, 385, 387, 263, 373, 380)}
+        baseline = np.median(mean_ear[valid])
+        closed = np.where(valid, mean_ear < baseline * closed_ratio, False).astype(np.int8)
+        edges = np.diff(np.concatenate([[0], closed, [0]]))
+        starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+        blinks = int(np.count_nonzero(ends - starts <= max(1, round(max_closed_seconds * fps))))
+        return BlinkStats(
+            blink_count=blinks,
+            blink_rate=float(blinks / duration * 60),
+            duration_seconds=float(duration),
+            face_coverage=coverage,
+        )
     
     def load_reference_image(self, path: str) -> np.ndarray:
         """Load reference image and convert to RGB numpy array."""
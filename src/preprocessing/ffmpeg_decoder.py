@@ -0,0 +1,97 @@
+"""Frame decoding through an ffmpeg rawvideo pipe."""
+
+from __future__ import annotations
+from typing import Callable, Iterator, List, Optional, Tuple
+import shutil
+import subprocess
+import tempfile
+import numpy as np
+
+
+class FFmpegDecoder:
+    """Runs ffmpeg with select/scale filters and reads raw frames from its stdout.
+
+    Frame selection happens inside ffmpeg, so frames off the sampling grid are
+    never scaled, converted or copied, and scaling to the analysis size is done
+    by the decoder. Frames arrive as rgb24 (or gray) and are read straight into
+    a caller-provided buffer, with no BGR->RGB pass.
+    """
+
+    def __init__(self, binary: str = "ffmpeg"):
+        self.binary = binary
+
+    @staticmethod
+    def available(binary: str = "ffmpeg") -> bool:
+        return shutil.which(binary) is not None
+
+    @staticmethod
+    def grid_filter(ratio: float) -> str:
+        """select expression keeping the first frame of each target-FPS interval (see VideoProcessor.on_grid)."""
+        r = f"{ratio:.17g}"
+        return f"select=eq(n\\,0)+gt(floor(n*{r}+1e-6)\\,floor((n-1)*{r}+1e-6))"
+
+    @staticmethod
+    def indices_filter(indices: List[int]) -> str:
+        """select expression keeping exactly the given source frame numbers."""
+        return "select=" + "+".join(f"eq(n\\,{i})" for i in indices)
+
+    def read(self, video_path: str, select: str, size: Tuple[int, int], gray: bool = False,
+             limit: Optional[int] = None, buffers: Optional[Callable[[], np.ndarray]] = None
+             ) -> Iterator[np.ndarray]:
+        """Yield selected frames scaled to `size` (width, height) as (H, W, 3) RGB or (H, W) gray.
+
+        Each frame is read into the array returned by `buffers()`, e.g.
+        `lambda: store.next_slot(shape)` to fill a FrameStore in place (the
+        caller commits each yielded frame). By default one array is allocated
+        and reused, so copy a yielded frame to keep it. `limit` stops ffmpeg
+        after that many selected frames.
+        """
+        frame_bytes = size[0] * size[1] * (1 if gray else 3)
+        if buffers is None:
+            out = np.empty((size[1], size[0]) if gray else (size[1], size[0], 3), dtype=np.uint8)
+            buffers = lambda: out
+        produced, finished, stopped = 0, False, False
+        with tempfile.TemporaryFile() as stderr:
+            process = subprocess.Popen(self._command(video_path, select, size, gray, limit),
+                                       stdout=subprocess.PIPE, stderr=stderr)
+            try:
+                while not (limit and produced >= limit):
+                    buffer = buffers()
+                    view = memoryview(buffer).cast("B")
+                    if len(view) != frame_bytes:
+                        raise ValueError(f"Frame buffer holds {len(view)} bytes, expected {frame_bytes}")
+                    filled = 0
+                    while filled < frame_bytes:
+                        n = process.stdout.readinto(view[filled:])
+                        if not n:
+                            break
+                        filled += n
+                    if filled < frame_bytes:
+                        finished = True
+                        break
+                    produced += 1
+                    yield buffer
+                else:
+                    finished = True
+            finally:
+                if not finished and process.poll() is None:
+                    process.kill()
+                    stopped = True
+                process.stdout.close()
+                returncode = process.wait()
+            if returncode and not stopped:
+                stderr.seek(0)
+                message = stderr.read().decode(errors="replace").strip() or f"ffmpeg exited with {returncode}"
+                if not produced:
+                    raise ValueError(f"Cannot decode video {video_path}: {message}")
+                print(f"ffmpeg stopped after {produced} frames: {message}")
+
+    def _command(self, video_path: str, select: str, size: Tuple[int, int], gray: bool,
+                 limit: Optional[int]) -> list:
+        width, height = size
+        command = [self.binary, "-v", "error", "-nostdin", "-i", video_path, "-an", "-sn", "-dn",
+                   "-vf", f"{select},scale={width}:{height}:flags=area",
+                   "-vsync", "passthrough", "-f", "rawvideo", "-pix_fmt", "gray" if gray else "rgb24"]
+        if limit:
+            command += ["-frames:v", str(limit)]
+        return command + ["pipe:1"]
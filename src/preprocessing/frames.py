@@ -0,0 +1,113 @@
+"""Contiguous frame storage for decoded video frames."""
+
+from __future__ import annotations
+from typing import Optional, Tuple
+import os
+import tempfile
+import weakref
+import numpy as np
+
+from src.config import config
+
+
+def _remove_file(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class FrameStore:
+    """Fixed-capacity (N, H, W, 3) uint8 frame buffer.
+
+    All frames share one preallocated array, so decoders can write straight into
+    `next_slot()` and consumers get zero-copy views from indexing and slicing.
+    Buffers larger than the memory budget are backed by an np.memmap in the
+    scratch directory instead of RAM.
+    """
+
+    def __init__(self, capacity: int, frame_shape: Optional[Tuple[int, int]] = None,
+                 memory_budget_mb: Optional[int] = None, scratch_dir: Optional[str] = None):
+        self.capacity = max(0, capacity)
+        self.memory_budget_mb = config.frame_memory_budget_mb if memory_budget_mb is None else memory_budget_mb
+        self.scratch_dir = scratch_dir or config.frame_scratch_dir or None
+        self.path: Optional[str] = None
+        self._buffer: Optional[np.ndarray] = None
+        self._finalizer = None
+        self._count = 0
+        if frame_shape is not None:
+            self._allocate(frame_shape)
+
+    def _allocate(self, frame_shape: Tuple[int, int]):
+        """Allocate the backing buffer for frames of `frame_shape` (H, W)."""
+        shape = (self.capacity, frame_shape[0], frame_shape[1], 3)
+        nbytes = int(np.prod(shape))
+        if self.memory_budget_mb and nbytes > self.memory_budget_mb * 1024 * 1024:
+            fd, self.path = tempfile.mkstemp(suffix=".frames", dir=self.scratch_dir)
+            os.close(fd)
+            self._finalizer = weakref.finalize(self, _remove_file, self.path)
+            self._buffer = np.memmap(self.path, dtype=np.uint8, mode="w+", shape=shape)
+        else:
+            self._buffer = np.empty(shape, dtype=np.uint8)
+
+    @property
+    def is_memmap(self) -> bool:
+        return self.path is not None
+
+    @property
+    def nbytes(self) -> int:
+        return 0 if self._buffer is None else self._buffer.nbytes
+
+    @property
+    def array(self) -> np.ndarray:
+        """View of the filled frames as one (N, H, W, 3) array."""
+        if self._buffer is None:
+            return np.empty((0, 0, 0, 3), dtype=np.uint8)
+        return self._buffer[:self._count]
+
+    def next_slot(self, frame_shape: Tuple[int, int]) -> np.ndarray:
+        """Return a writable view for the next frame; call `commit()` once it is filled."""
+        if self._buffer is None:
+            self._allocate(frame_shape)
+        if tuple(frame_shape[:2]) != self._buffer.shape[1:3]:
+            raise ValueError(f"Frame shape {frame_shape[:2]} does not match store {self._buffer.shape[1:3]}")
+        if self._count >= self.capacity:
+            self._grow()
+        return self._buffer[self._count]
+
+    def commit(self):
+        """Mark the slot returned by `next_slot()` as filled."""
+        self._count += 1
+
+    def append(self, frame: np.ndarray):
+        """Copy an RGB frame into the store."""
+        np.copyto(self.next_slot(frame.shape), frame)
+        self.commit()
+
+    def _grow(self):
+        """Double capacity when the decoder outruns the frame count estimate."""
+        old = self._buffer
+        self.capacity = max(1, self.capacity * 2)
+        finalizer = self._finalizer
+        self.path, self._finalizer = None, None
+        self._allocate(old.shape[1:3])
+        self._buffer[:self._count] = old[:self._count]
+        del old
+        if finalizer:
+            finalizer()
+
+    def close(self):
+        """Release the buffer and delete any scratch file."""
+        self._buffer = None
+        self._count = 0
+        if self._finalizer:
+            self._finalizer()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, key) -> np.ndarray:
+        return self.array[key]
+
+    def __iter__(self):
+        return iter(self.array)
@@ -0,0 +1,149 @@
+"""Media metadata from a single memoized ffprobe call per file."""
+
+from __future__ import annotations
+from collections import OrderedDict
+from fractions import Fraction
+from typing import Optional
+import json
+import os
+import subprocess
+import threading
+import cv2
+
+from src.models import VideoMetadata
+from src.utils.tracing import span
+
+
+class MediaProbe:
+    """Probes media files and memoizes the metadata by (path, size, mtime).
+
+    One `ffprobe -show_streams -show_format` call describes both the video and
+    the audio stream, so the video and audio preprocessors share a single
+    process spawn and file open per input. A file that changes on disk gets a
+    new key and is probed again. Without ffprobe, OpenCV supplies the video
+    fields and the file is assumed to have no audio.
+    """
+
+    def __init__(self, binary: str = "ffprobe", max_entries: int = 256):
+        self.binary = binary
+        self.max_entries = max_entries
+        self._cache: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def probe(self, path: str) -> VideoMetadata:
+        """Metadata for `path`; raises ValueError if the file cannot be read as media."""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            raise ValueError(f"Cannot open video: {path}") from None
+        key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+
+        with span("probe") as attrs:
+            info = self._run_ffprobe(path)
+            metadata = self._from_ffprobe(info) if info else self._from_opencv(path)
+            attrs["source"] = "ffprobe" if info else "opencv"
+
+        with self._lock:
+            self._cache[key] = metadata
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return metadata
+
+    def _run_ffprobe(self, path: str) -> Optional[dict]:
+        try:
+            result = subprocess.run(
+                [self.binary, "-v", "error", "-show_streams", "-show_format", "-of", "json", path],
+                capture_output=True, text=True, timeout=30)
+        except (OSError, subprocess.SubprocessError):
+            return None
+        if result.returncode != 0:
+            return None
+        try:
+            info = json.loads(result.stdout)
+        except ValueError:
+            return None
+        return info if info.get("streams") else None
+
+    @staticmethod
+    def _from_ffprobe(info: dict) -> VideoMetadata:
+        streams = info.get("streams", [])
+        video = next((s for s in streams if s.get("codec_type") == "video"
+                      and not s.get("disposition", {}).get("attached_pic")), {})
+        audio = next((s for s in streams if s.get("codec_type") == "audio"), {})
+
+        fps = _rate(video.get("avg_frame_rate")) or _rate(video.get("r_frame_rate"))
+        duration = _number(video.get("duration")) or _number(info.get("format", {}).get("duration"))
+        total_frames = int(_number(video.get("nb_frames"))) or int(round(duration * fps))
+
+        # The legacy "rotate" tag is clockwise; display matrix side data is counterclockwise
+        rotation = int(_number(video.get("tags", {}).get("rotate")))
+        for side_data in video.get("side_data_list", []):
+            if "rotation" in side_data:
+                rotation = -int(_number(side_data["rotation"]))
+
+        return VideoMetadata(
+            duration_seconds=duration,
+            fps=fps,
+            width=int(video.get("width", 0)),
+            height=int(video.get("height", 0)),
+            total_frames=total_frames,
+            has_audio=bool(audio),
+            codec=video.get("codec_name", ""),
+            rotation=rotation % 360,
+            audio_sample_rate=int(_number(audio.get("sample_rate"))),
+        )
+
+    @staticmethod
+    def _from_opencv(path: str) -> VideoMetadata:
+        cap = cv2.VideoCapture(path)
+        if not cap.isOpened():
+            raise ValueError(f"Cannot open video: {path}")
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        fourcc = int(cap.get(cv2.CAP_PROP_FOURCC))
+        metadata = VideoMetadata(
+            duration_seconds=total_frames / fps if fps > 0 else 0,
+            fps=fps,
+            width=int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            height=int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            total_frames=total_frames,
+            codec="".join(chr((fourcc >> 8 * i) & 0xFF) for i in range(4)).strip("\x00 ").lower(),
+        )
+        cap.release()
+        return metadata
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+
+def _number(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _rate(value) -> float:
+    """ffprobe frame rate such as "30000/1001"; 0 when unknown."""
+    try:
+        return float(Fraction(value))
+    except (TypeError, ValueError, ZeroDivisionError):
+        return 0.0
+
+
+_probe: Optional[MediaProbe] = None
+_probe_lock = threading.Lock()
+
+
+def get_media_probe() -> MediaProbe:
+    """Return the process-wide probe, creating it on first use."""
+    global _probe
+    with _probe_lock:
+        if _probe is None:
+            _probe = MediaProbe()
+        return _probe
@@ -0,0 +1,84 @@
+"""Informative frame selection from cheap grayscale thumbnails."""
+
+from __future__ import annotations
+from typing import List
+import numpy as np
+
+
+class FrameSelector:
+    """Picks the most informative, non-redundant frames within a fixed budget.
+
+    Candidates are scored on downscaled grayscale thumbnails in one vectorized
+    pass: motion is the mean absolute difference from the previous candidate and
+    sharpness is the variance of a Laplacian. Frames are then taken greedily by
+    score, skipping near-duplicates (by 64-bit difference hash) and frames too
+    close in time to an earlier pick. If the budget cannot be filled, the
+    duplicate filter is relaxed first and then the spacing.
+    """
+
+    # Thumbnail size (width, height); both split evenly into the 9x8 hash grid
+    THUMBNAIL_SIZE = (144, 128)
+
+    def __init__(self, motion_weight: float = 0.5, sharpness_weight: float = 0.5,
+                 duplicate_bits: int = 6):
+        self.motion_weight = motion_weight
+        self.sharpness_weight = sharpness_weight
+        self.duplicate_bits = duplicate_bits
+
+    def select(self, thumbnails: np.ndarray, budget: int) -> List[int]:
+        """Return sorted indices into `thumbnails` (N, H, W) of at most `budget` frames."""
+        count = len(thumbnails)
+        if count <= budget:
+            return list(range(count))
+
+        scores = self.score(thumbnails)
+        hashes = self.difference_hash(thumbnails)
+        order = np.argsort(-scores, kind="stable")
+        min_gap = max(1, count // (budget * 2))
+
+        picked: List[int] = []
+        for check_gap, check_hash in ((True, True), (True, False), (False, False)):
+            for idx in order:
+                if len(picked) >= budget:
+                    break
+                if idx in picked:
+                    continue
+                if picked and check_gap and np.min(np.abs(np.array(picked) - idx)) < min_gap:
+                    continue
+                if picked and check_hash and self._hamming(hashes[picked], hashes[idx]).min() <= self.duplicate_bits:
+                    continue
+                picked.append(int(idx))
+        return sorted(picked)
+
+    def score(self, thumbnails: np.ndarray) -> np.ndarray:
+        """Weighted sum of min-max normalized motion and sharpness per frame."""
+        frames = thumbnails.astype(np.float32)
+        motion = np.empty(len(frames), dtype=np.float32)
+        if len(frames) > 1:
+            motion[1:] = np.abs(np.diff(frames, axis=0)).mean(axis=(1, 2))
+            motion[0] = motion[1:].mean()
+        else:
+            motion[:] = 0.0
+
+        laplacian = (4 * frames[:, 1:-1, 1:-1] - frames[:, :-2, 1:-1] - frames[:, 2:, 1:-1]
+                     - frames[:, 1:-1, :-2] - frames[:, 1:-1, 2:])
+        sharpness = laplacian.var(axis=(1, 2))
+
+        return self.motion_weight * self._normalize(motion) + self.sharpness_weight * self._normalize(sharpness)
+
+    @staticmethod
+    def difference_hash(thumbnails: np.ndarray) -> np.ndarray:
+        """64-bit difference hashes, one per frame, as (N, 8) uint8 rows."""
+        n, h, w = thumbnails.shape
+        grid = thumbnails[:, :h - h % 8, :w - w % 9].astype(np.float32)
+        grid = grid.reshape(n, 8, (h - h % 8) // 8, 9, (w - w % 9) // 9).mean(axis=(2, 4))
+        return np.packbits(grid[:, :, 1:] > grid[:, :, :-1], axis=-1).reshape(n, 8)
+
+    @staticmethod
+    def _hamming(hashes: np.ndarray, other: np.ndarray) -> np.ndarray:
+        return np.unpackbits(np.bitwise_xor(hashes, other), axis=-1).sum(axis=-1)
+
+    @staticmethod
+    def _normalize(values: np.ndarray) -> np.ndarray:
+        spread = values.max() - values.min()
+        return (values - values.min()) / spread if spread > 0 else np.zeros_like(values)
@@ -0,0 +1,117 @@
+"""Audio-visual sync from mouth motion and the audio envelope."""
+
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import List, Optional
+import numpy as np
+
+# FaceMesh landmark indices: inner upper/lower lip midpoints and mouth corners
+UPPER_LIP, LOWER_LIP = 13, 14
+MOUTH_LEFT, MOUTH_RIGHT = 61, 291
+
+
+@dataclass
+class SyncStats:
+    """Cross-correlation between mouth opening and speech loudness."""
+    correlation: float
+    lag_seconds: float
+    duration_seconds: float
+    face_coverage: float
+
+
+class SyncAnalyzer:
+    """Measures how well mouth movement follows the audio.
+
+    Mouth opening (inner lip gap over mouth width, so it is scale invariant) is
+    taken from the landmarks of the face scan, and the audio RMS envelope is
+    sampled at the same frame times. In genuine talking footage the two are
+    clearly correlated with a lag close to zero; dubbed or generated lips show
+    a weak correlation or a visible offset. The peak is searched within
+    `max_lag_seconds` using one FFT cross-correlation, so resolution is one
+    frame of the scan grid (0.1 s at 10 fps).
+
+    Only frames inside detected speech are correlated: music, room noise or an
+    off-screen narrator move the envelope without moving the lips, so clips
+    with less than `min_seconds` of speech on camera are not measured.
+    """
+
+    def __init__(self, max_lag_seconds: float = 0.5, min_seconds: float = 3.0, min_coverage: float = 0.5):
+        self.max_lag_seconds = max_lag_seconds
+        self.min_seconds = min_seconds
+        self.min_coverage = min_coverage
+
+    @staticmethod
+    def mouth_openings(landmarks: np.ndarray) -> np.ndarray:
+        """Mouth opening ratio for every frame of an (N, 478, 3) array; NaN without a face."""
+        points = landmarks[:, [UPPER_LIP, LOWER_LIP, MOUTH_LEFT, MOUTH_RIGHT], :2]
+        gap = np.linalg.norm(points[:, 0] - points[:, 1], axis=-1)
+        width = np.linalg.norm(points[:, 2] - points[:, 3], axis=-1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(width > 0, gap / width, np.nan)
+
+    @staticmethod
+    def envelope(samples: np.ndarray, sample_rate: int, times: np.ndarray, window_seconds: float) -> np.ndarray:
+        """RMS of the audio in a window centered on each time, from one cumulative sum of squares."""
+        energy = np.concatenate([[0.0], np.cumsum(np.square(samples, dtype=np.float64))])
+        half = max(1, int(window_seconds * sample_rate / 2))
+        centers = np.round(times * sample_rate).astype(np.int64)
+        start = np.clip(centers - half, 0, len(samples))
+        end = np.clip(centers + half, 0, len(samples))
+        count = np.maximum(end - start, 1)
+        return np.sqrt((energy[end] - energy[start]) / count)
+
+    @staticmethod
+    def cross_correlation(a: np.ndarray, b: np.ndarray, max_lag: int,
+                          mask: Optional[np.ndarray] = None) -> np.ndarray:
+        """Normalized cross-correlation of two equal-length series for lags -max_lag..max_lag.
+
+        Entry `max_lag + k` correlates a[t + k] with b[t], so a positive peak
+        lag means `a` trails `b`. With a boolean `mask` only pairs where both
+        samples are masked in count; the pair counts per lag come from the same
+        FFT, so the cost does not change.
+        """
+        n = len(a)
+        mask = np.ones(n, dtype=bool) if mask is None else mask
+        a = np.where(mask, (a - a[mask].mean()) / (a[mask].std() or 1.0), 0.0)
+        b = np.where(mask, (b - b[mask].mean()) / (b[mask].std() or 1.0), 0.0)
+        size = 1 << int(np.ceil(np.log2(2 * n)))
+        full = np.fft.irfft(np.fft.rfft(a, size) * np.conj(np.fft.rfft(b, size)), size)
+        weights = np.fft.rfft(mask.astype(np.float64), size)
+        pairs = np.fft.irfft(weights * np.conj(weights), size)
+        lags = np.arange(-max_lag, max_lag + 1)
+        return full[lags % size] / np.maximum(np.round(pairs[lags % size]), 1.0)
+
+    @staticmethod
+    def speech_mask(times: np.ndarray, segments: List[List[float]]) -> np.ndarray:
+        """Which frame times fall inside a [start, end) speech segment."""
+        mask = np.zeros(len(times), dtype=bool)
+        for start, end in segments:
+            mask |= (times >= start) & (times < end)
+        return mask
+
+    def measure(self, mouth: np.ndarray, times: np.ndarray, samples: np.ndarray, sample_rate: int,
+                fps: float, speech: Optional[List[List[float]]] = None) -> Optional[SyncStats]:
+        """Sync of a mouth-opening series sampled at `times` with the audio; None if not measurable.
+
+        `speech` holds the VAD segments in seconds; None treats the whole clip as speech.
+        """
+        valid = ~np.isnan(mouth)
+        voiced = np.ones(len(mouth), dtype=bool) if speech is None else self.speech_mask(times, speech)
+        coverage = float(valid[voiced].mean()) if voiced.any() else 0.0
+        duration = float((valid & voiced).sum() / fps) if fps else 0.0
+        if coverage < self.min_coverage or duration < self.min_seconds or not len(samples):
+            return None
+        mouth = np.interp(np.arange(len(mouth)), np.flatnonzero(valid), mouth[valid])
+        loudness = self.envelope(samples, sample_rate, times, 1.0 / fps)
+        if not loudness[voiced].std() or not mouth[voiced].std():
+            return None
+
+        max_lag = min(len(mouth) // 2, max(1, round(self.max_lag_seconds * fps)))
+        correlation = self.cross_correlation(mouth, loudness, max_lag, voiced)
+        peak = int(np.argmax(correlation))
+        return SyncStats(
+            correlation=float(correlation[peak]),
+            lag_seconds=float((peak - max_lag) / fps),
+            duration_seconds=duration,
+            face_coverage=coverage,
+        )
@@ -0,0 +1,167 @@
+"""Shared Whisper transcription worker."""
+
+from __future__ import annotations
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Optional, Union
+import hashlib
+import queue
+import threading
+import wave
+import numpy as np
+
+from src.config import config
+from src.utils.helpers import file_digest
+
+
+class TranscriptionWorker:
+    """Long-lived Whisper model behind a request queue.
+
+    A single background thread owns the model, so it loads once per process and
+    stays warm across analyses. Transcriptions run one at a time: Whisper's
+    `transcribe` takes a single input, so there is no batched inference. What
+    the worker saves is repeated work. Requests that queue up while a
+    transcription runs (up to `max_pending` at a time) are deduplicated, so
+    identical audio is transcribed once for all of them, and transcripts are
+    cached by a hash of the PCM samples.
+    """
+
+    def __init__(self, model_size: str = None, compute_type: str = None, device: str = None,
+                 cache_size: int = None, max_pending: int = 8):
+        self.model_size = model_size or config.whisper_model
+        self.compute_type = compute_type or config.whisper_compute_type
+        self.device = device or config.whisper_device or None
+        self.cache_size = config.transcript_cache_size if cache_size is None else cache_size
+        self.max_pending = max_pending
+        self.model = None
+        self._cache: OrderedDict = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._queue: queue.Queue = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+    def transcribe(self, audio: Union[str, np.ndarray], timeout: float = None) -> str:
+        """Transcribe 16 kHz mono audio, reusing cached transcripts of identical audio.
+        
+        `audio` is a float32 sample array or the path to a WAV file.
+        """
+        key = self._audio_key(audio)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+
+        future: Future = Future()
+        self._ensure_started()
+        self._queue.put((key, audio, future))
+        return future.result(timeout=timeout)
+    
+    def warm_up(self, timeout: float = None):
+        """Load the model on the worker thread ahead of the first request."""
+        future: Future = Future()
+        self._ensure_started()
+        self._queue.put((None, None, future))
+        future.result(timeout=timeout)
+
+    def _ensure_started(self):
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="whisper-worker", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        """Worker loop: drain queued requests, then transcribe each distinct audio once, in order."""
+        while True:
+            requests = [self._queue.get()]
+            while len(requests) < self.max_pending:
+                try:
+                    requests.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            pending = OrderedDict()
+            for key, audio, future in requests:
+                if key is None:
+                    self._run_warm_up(future)
+                    continue
+                pending.setdefault(key, (audio, []))[1].append(future)
+
+            for key, (audio, futures) in pending.items():
+                try:
+                    text = self._cache_get(key)
+                    if text is None:
+                        text = self._transcribe(audio)
+                        self._cache_put(key, text)
+                except BaseException as e:
+                    for future in futures:
+                        future.set_exception(e)
+                    continue
+                for future in futures:
+                    future.set_result(text)
+
+    def _run_warm_up(self, future: Future):
+        try:
+            self._load_model()
+        except BaseException as e:
+            future.set_exception(e)
+        else:
+            future.set_result(None)
+    
+    def _load_model(self):
+        if self.model is None:
+            import whisper
+            self.model = whisper.load_model(self.model_size, device=self.device)
+        return self.model
+    
+    def _transcribe(self, audio: Union[str, np.ndarray]) -> str:
+        self._load_model()
+        result = self.model.transcribe(audio, language="en", fp16=self.compute_type == "float16")
+        return result.get("text", "")
+
+    def _audio_key(self, audio: Union[str, np.ndarray]) -> str:
+        """Hash the PCM samples rather than the file, so WAV header differences do not change the key."""
+        if isinstance(audio, np.ndarray):
+            digest = hashlib.sha256(f"float32:{len(audio)}".encode())
+            digest.update(np.ascontiguousarray(audio, dtype=np.float32).tobytes())
+            digest.update(f"{self.model_size}:{self.compute_type}".encode())
+            return digest.hexdigest()
+        audio_path = audio
+        try:
+            with wave.open(audio_path, "rb") as wav:
+                digest = hashlib.sha256(repr(wav.getparams()[:3]).encode())
+                digest.update(wav.readframes(wav.getnframes()))
+        except (wave.Error, EOFError):
+            digest = hashlib.sha256(file_digest(audio_path).encode())
+        digest.update(f"{self.model_size}:{self.compute_type}".encode())
+        return digest.hexdigest()
+
+    def _cache_get(self, key: str) -> Optional[str]:
+        with self._cache_lock:
+            if key not in self._cache:
+                return None
+            self._cache.move_to_end(key)
+            return self._cache[key]
+
+    def _cache_put(self, key: str, text: str):
+        if self.cache_size <= 0:
+            return
+        with self._cache_lock:
+            self._cache[key] = text
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+
+_workers: dict = {}
+_workers_lock = threading.Lock()
+
+
+def get_transcription_worker(model_size: str = None, compute_type: str = None,
+                             device: str = None) -> TranscriptionWorker:
+    """Return the process-wide worker for a model configuration, creating it on first use."""
+    key = (model_size or config.whisper_model,
+           compute_type or config.whisper_compute_type,
+           device or config.whisper_device or None)
+    with _workers_lock:
+        if key not in _workers:
+            _workers[key] = TranscriptionWorker(*key)
+        return _workers[key]
@@ -1,100 +1,337 @@
-"""Video processing utilities using OpenCV."""
+"""Video processing utilities using OpenCV, or an ffmpeg pipe for decoding."""
 
 from __future__ import annotations
-from typing import List
+from typing import Iterator, List, Optional, Sequence
+import itertools
+import math
+import time
 import cv2
 import numpy as np
 from pathlib import Path
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from src.config import config
 from src.models import VideoMetadata
+from src.preprocessing.ffmpeg_decoder import FFmpegDecoder
+from src.preprocessing.frames import FrameStore
+from src.preprocessing.probe import MediaProbe, get_media_probe
+from src.utils.tracing import accumulate, span
 
 
 @dataclass
 class ExtractedFrames:
     """Container for extracted video frames."""
-    frames: List[np.ndarray]
+    frames: FrameStore
     timestamps: List[float]
     fps: float
     metadata: VideoMetadata
+    frame_indices: List[int] = field(default_factory=list)
+
+
+VIDEO_DECODERS = ("opencv", "ffmpeg")
 
 
 class VideoProcessor:
-    """Handles video loading and frame extraction."""
+    """Handles video loading and frame extraction.
+    
+    Frames are decoded with OpenCV by default. With the "ffmpeg" decoder,
+    sampling and downscaling happen inside ffmpeg and RGB frames are piped
+    straight into the output buffers; both decoders pick the same source frames.
+    """
     
-    def __init__(self, target_fps: int = 10):
+    # Gaps shorter than this are cheaper to grab through than to seek over
+    SEEK_MIN_GAP_SECONDS = 2.0
+    
+    def __init__(self, target_fps: int = 10, decoder: str = None, probe: Optional[MediaProbe] = None):
         self.target_fps = target_fps
+        self.decoder = decoder or config.video_decoder
+        self.ffmpeg = self._create_ffmpeg_decoder(self.decoder)
+        self.probe = probe or get_media_probe()
+    
+    @staticmethod
+    def _create_ffmpeg_decoder(decoder: str) -> Optional[FFmpegDecoder]:
+        if decoder not in VIDEO_DECODERS:
+            raise ValueError(f"Unknown video decoder: {decoder} (expected one of {', '.join(VIDEO_DECODERS)})")
+        if decoder != "ffmpeg":
+            return None
+        if not FFmpegDecoder.available():
+            print("ffmpeg not found; decoding video with OpenCV")
+            return None
+        return FFmpegDecoder()
+    
+    def grid_ratio(self, fps: float) -> float:
+        """Fraction of source frames kept on the target-FPS grid."""
+        return min(1.0, self.target_fps / fps) if fps and fps > 0 else 1.0
+    
+    @staticmethod
+    def on_grid(index: int, ratio: float) -> bool:
+        """Whether source frame `index` is the first frame of its target-FPS interval.
+        
+        Selecting by interval rather than every int(fps / target_fps)-th frame
+        keeps the sample rate exact for 29.97 and 59.94 fps sources.
+        """
+        return index == 0 or math.floor(index * ratio + 1e-6) > math.floor((index - 1) * ratio + 1e-6)
+    
+    def _grid_indices(self, ratio: float) -> Iterator[int]:
+        """Source frame indices on the target-FPS grid, in order."""
+        return (i for i in itertools.count() if self.on_grid(i, ratio))
     
     def get_metadata(self, video_path: str) -> VideoMetadata:
-        """Extract video metadata."""
+        """Extract video metadata (probed once per file and shared with the audio processor)."""
+        metadata = self.probe.probe(video_path)
+        if not metadata.width or not metadata.height:
+            raise ValueError(f"Cannot open video: {video_path} has no video stream")
+        return metadata
+    
+    def plan_frames(self, metadata: VideoMetadata, num_frames: int) -> List[int]:
+        """Plan evenly spaced source frame indices for `num_frames` samples."""
+        if metadata.total_frames <= 0 or num_frames <= 0:
+            return []
+        indices = np.linspace(0, metadata.total_frames - 1, min(num_frames, metadata.total_frames), dtype=int)
+        return sorted(set(indices.tolist()))
+    
+    def extract_frames(self, video_path: str, max_frames: int = None,
+                       frame_indices: Optional[List[int]] = None,
+                       metadata: Optional[VideoMetadata] = None) -> ExtractedFrames:
+        """Extract frames from video at target FPS, or only the planned `frame_indices`."""
+        metadata = metadata or self.get_metadata(video_path)
+        if self.ffmpeg:
+            return self._extract_ffmpeg(video_path, metadata, max_frames, frame_indices)
         cap = cv2.VideoCapture(video_path)
         if not cap.isOpened():
             raise ValueError(f"Cannot open video: {video_path}")
         
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        duration = total_frames / fps if fps > 0 else 0
+        if frame_indices is not None:
+            with span("decode", planned=len(frame_indices)) as attrs:
+                cap, frames, indices = self._read_planned(cap, video_path, metadata, frame_indices)
+                attrs.update(frames=len(frames), bytes=frames.nbytes)
+            cap.release()
+            return ExtractedFrames(
+                frames=frames,
+                timestamps=[idx / metadata.fps if metadata.fps else 0.0 for idx in indices],
+                fps=metadata.fps,
+                metadata=metadata,
+                frame_indices=indices,
+            )
+        
+        ratio = self.grid_ratio(metadata.fps)
+        capacity = math.ceil(metadata.total_frames * ratio) + 1
+        frames = FrameStore(min(capacity, max_frames) if max_frames else capacity)
+        timestamps, indices = [], []
+        frame_count = 0
+        frame = None
+        
+        with span("decode") as attrs:
+            while True:
+                ret, frame = cap.read(frame)
+                if not ret:
+                    break
+                
+                if self.on_grid(frame_count, ratio):
+                    self._store_rgb(frames, frame)
+                    timestamps.append(frame_count / metadata.fps)
+                    indices.append(frame_count)
+                    
+                    if max_frames and len(frames) >= max_frames:
+                        break
+                
+                frame_count += 1
+            attrs.update(frames=len(frames), bytes=frames.nbytes)
         
         cap.release()
         
-        return VideoMetadata(
-            duration_seconds=duration,
-            fps=fps,
-            width=width,
-            height=height,
-            total_frames=total_frames,
-            has_audio=self._check_audio(video_path),
+        return ExtractedFrames(
+            frames=frames,
+            timestamps=timestamps,
+            fps=self.sampled_fps(metadata),
+            metadata=metadata,
+            frame_indices=indices,
         )
     
-    def _check_audio(self, video_path: str) -> bool:
-        """Check if video has audio track."""
-        try:
-            import subprocess
-            result = subprocess.run(
-                ["ffprobe", "-v", "error", "-select_streams", "a",
-                 "-show_entries", "stream=codec_type", "-of", "csv=p=0", video_path],
-                capture_output=True, text=True, timeout=10
-            )
-            return "audio" in result.stdout
-        except Exception:
-            return False
+    def _extract_ffmpeg(self, video_path: str, metadata: VideoMetadata, max_frames: int = None,
+                        frame_indices: Optional[List[int]] = None) -> ExtractedFrames:
+        """`extract_frames` through the ffmpeg pipe, reading frames directly into the FrameStore."""
+        width, height = metadata.display_size
+        if frame_indices is not None:
+            wanted = sorted(set(frame_indices))
+            select, source, limit = self.ffmpeg.indices_filter(wanted), iter(wanted), len(wanted)
+            capacity = len(wanted)
+        else:
+            ratio = self.grid_ratio(metadata.fps)
+            select, source, limit = self.ffmpeg.grid_filter(ratio), self._grid_indices(ratio), max_frames
+            capacity = math.ceil(metadata.total_frames * ratio) + 1
+            capacity = min(capacity, max_frames) if max_frames else capacity
+        
+        frames, indices = FrameStore(capacity), []
+        if limit != 0:
+            with span("decode", decoder="ffmpeg", planned=len(frame_indices or [])) as attrs:
+                for _, index in zip(self.ffmpeg.read(video_path, select, (width, height), limit=limit,
+                                                     buffers=lambda: frames.next_slot((height, width))),
+                                    source):
+                    frames.commit()
+                    indices.append(index)
+                attrs.update(frames=len(frames), bytes=frames.nbytes)
+        
+        return ExtractedFrames(
+            frames=frames,
+            timestamps=[idx / metadata.fps if metadata.fps else 0.0 for idx in indices],
+            fps=metadata.fps if frame_indices is not None else self.sampled_fps(metadata),
+            metadata=metadata,
+            frame_indices=indices,
+        )
     
-    def extract_frames(self, video_path: str, max_frames: int = None) -> ExtractedFrames:
-        """Extract frames from video at target FPS."""
+    def _read_planned(self, cap: cv2.VideoCapture, video_path: str,
+                      metadata: VideoMetadata, frame_indices: List[int]):
+        """Decode only the requested frames, seeking over long gaps and grabbing through short ones.
+        
+        If the container does not land on the requested frame after a seek, the
+        capture is reopened and the remaining frames are reached with grab() only.
+        """
+        min_gap = max(1, int(metadata.fps * self.SEEK_MIN_GAP_SECONDS))
+        wanted = sorted(set(frame_indices))
+        frames, decoded = FrameStore(len(wanted)), []
+        position, can_seek = 0, True
+        frame = None
+        
+        for idx in wanted:
+            if can_seek and idx - position > min_gap:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, idx)
+                if int(cap.get(cv2.CAP_PROP_POS_FRAMES)) == idx:
+                    position = idx
+                else:
+                    cap.release()
+                    cap = cv2.VideoCapture(video_path)
+                    position, can_seek = 0, False
+            
+            while position < idx and cap.grab():
+                position += 1
+            if position < idx:
+                break
+            
+            ret, frame = cap.read(frame)
+            if not ret:
+                break
+            position += 1
+            self._store_rgb(frames, frame)
+            decoded.append(idx)
+        
+        return cap, frames, decoded
+    
+    def iter_frames(self, video_path: str, max_edge: int = 0, metadata: Optional[VideoMetadata] = None):
+        """Yield (frame index, RGB frame) on the target-FPS grid, downscaled to `max_edge`.
+        
+        The yielded array is reused for the next frame; copy it to keep it.
+        """
+        metadata = metadata or self.get_metadata(video_path)
+        if self.ffmpeg:
+            yield from self._iter_frames_ffmpeg(video_path, max_edge, metadata)
+            return
         cap = cv2.VideoCapture(video_path)
         if not cap.isOpened():
             raise ValueError(f"Cannot open video: {video_path}")
         
-        metadata = self.get_metadata(video_path)
-        frame_interval = max(1, int(metadata.fps / self.target_fps))
-        
-        frames, timestamps = [], []
+        ratio = self.grid_ratio(metadata.fps)
         frame_count = 0
+        frame, rgb, small = None, None, None
+        try:
+            while cap.grab():
+                if self.on_grid(frame_count, ratio):
+                    ret, frame = cap.retrieve(frame)
+                    if not ret:
+                        break
+                    start = time.perf_counter()
+                    rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=rgb)
+                    accumulate("color_convert", time.perf_counter() - start, frames=1, bytes=rgb.nbytes)
+                    h, w = rgb.shape[:2]
+                    if max_edge and max(h, w) > max_edge:
+                        scale = max_edge / max(h, w)
+                        size = (max(1, round(w * scale)), max(1, round(h * scale)))
+                        small = cv2.resize(rgb, size, dst=small, interpolation=cv2.INTER_AREA)
+                        yield frame_count, small
+                    else:
+                        yield frame_count, rgb
+                frame_count += 1
+        finally:
+            cap.release()
+    
+    def _iter_frames_ffmpeg(self, video_path: str, max_edge: int, metadata: VideoMetadata):
+        """`iter_frames` through the ffmpeg pipe; ffmpeg drops off-grid frames and downscales."""
+        width, height = metadata.display_size
+        if max_edge and max(width, height) > max_edge:
+            scale = max_edge / max(width, height)
+            width, height = max(1, round(width * scale)), max(1, round(height * scale))
+        ratio = self.grid_ratio(metadata.fps)
+        frames = self.ffmpeg.read(video_path, self.ffmpeg.grid_filter(ratio), (width, height))
+        try:
+            for rgb, index in zip(frames, self._grid_indices(ratio)):
+                yield index, rgb
+        finally:
+            frames.close()
+    
+    @staticmethod
+    def thumbnail(rgb: np.ndarray, size: tuple) -> np.ndarray:
+        """Grayscale thumbnail of an RGB frame, for cheap frame scoring."""
+        return cv2.resize(cv2.cvtColor(rgb, cv2.COLOR_RGB2GRAY), size, interpolation=cv2.INTER_AREA)
+    
+    def sampled_fps(self, metadata: VideoMetadata) -> float:
+        """Effective frame rate of the target-FPS grid used by iter_frames/extract_thumbnails."""
+        return metadata.fps * self.grid_ratio(metadata.fps) if metadata.fps else 0.0
+    
+    def extract_thumbnails(self, video_path: str, size: tuple, metadata: Optional[VideoMetadata] = None):
+        """Decode grayscale thumbnails on the target-FPS grid for cheap frame scoring.
         
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-            
-            if frame_count % frame_interval == 0:
-                frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                frames.append(frame_rgb)
-                timestamps.append(frame_count / metadata.fps)
-                
-                if max_frames and len(frames) >= max_frames:
-                    break
+        Returns (source frame indices, (N, H, W) uint8 array). Frames off the grid
+        are only grabbed, never converted.
+        """
+        metadata = metadata or self.get_metadata(video_path)
+        ratio = self.grid_ratio(metadata.fps)
+        capacity = max(1, math.ceil(metadata.total_frames * ratio) + 1)
+        thumbnails = np.empty((capacity, size[1], size[0]), dtype=np.uint8)
+        indices = []
+        
+        if self.ffmpeg:
+            def slot():
+                nonlocal thumbnails
+                if len(indices) >= len(thumbnails):
+                    thumbnails = np.concatenate([thumbnails, np.empty_like(thumbnails)])
+                return thumbnails[len(indices)]
             
-            frame_count += 1
+            with span("thumbnails", decoder="ffmpeg") as attrs:
+                for _, index in zip(self.ffmpeg.read(video_path, self.ffmpeg.grid_filter(ratio), size,
+                                                     gray=True, buffers=slot),
+                                    self._grid_indices(ratio)):
+                    indices.append(index)
+                attrs.update(frames=len(indices))
+            return indices, thumbnails[:len(indices)]
         
-        cap.release()
+        cap = cv2.VideoCapture(video_path)
+        if not cap.isOpened():
+            raise ValueError(f"Cannot open video: {video_path}")
+        frame_count = 0
+        frame, gray = None, None
         
-        return ExtractedFrames(
-            frames=frames,
-            timestamps=timestamps,
-            fps=self.target_fps,
-            metadata=metadata,
-        )
+        with span("thumbnails") as attrs:
+            while cap.grab():
+                if self.on_grid(frame_count, ratio):
+                    ret, frame = cap.retrieve(frame)
+                    if not ret:
+                        break
+                    if len(indices) >= len(thumbnails):
+                        thumbnails = np.concatenate([thumbnails, np.empty_like(thumbnails)])
+                    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=gray)
+                    cv2.resize(gray, size, dst=thumbnails[len(indices)], interpolation=cv2.INTER_AREA)
+                    indices.append(frame_count)
+                frame_count += 1
+            attrs.update(frames=len(indices), decoded=frame_count)
+        
+        cap.release()
+        return indices, thumbnails[:len(indices)]
+    
+    def _store_rgb(self, store: FrameStore, frame_bgr: np.ndarray):
+        """Convert a BGR frame to RGB directly into the store's next slot."""
+        start = time.perf_counter()
+        cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2RGB, dst=store.next_slot(frame_bgr.shape))
+        store.commit()
+        accumulate("color_convert", time.perf_counter() - start, frames=1, bytes=frame_bgr.nbytes)
     
     def extract_keyframes(self, video_path: str, num_keyframes: int = 5) -> List[np.ndarray]:
         """Extract evenly spaced keyframes for analysis."""
@@ -120,7 +357,7 @@ class VideoProcessor:
         cv2.imwrite(output_path, cv2.cvtColor(frame, cv2.COLOR_RGB2BGR))
         return output_path
     
-    def frames_to_temp_images(self, frames: List[np.ndarray], temp_dir: str) -> List[str]:
+    def frames_to_temp_images(self, frames: Sequence[np.ndarray], temp_dir: str) -> List[str]:
         """Save frames to temporary image files."""
         Path(temp_dir).mkdir(parents=True, exist_ok=True)
         paths = []
@@ -0,0 +1,248 @@
+"""Long-running HTTP service that keeps the detector warm across requests."""
+
+from __future__ import annotations
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict
+import json
+import tempfile
+import threading
+
+from src.config import config
+from src.detector import ANALYSIS_MODES
+
+
+class QueueFullError(Exception):
+    """Raised when every worker is busy and the request queue is full."""
+
+
+@dataclass
+class Upload:
+    """One uploaded file from a multipart request."""
+    filename: str
+    data: bytes
+
+
+def parse_multipart(content_type: str, body: bytes) -> Dict[str, Upload]:
+    """Parse a multipart/form-data body into uploads keyed by field name."""
+    message = BytesParser(policy=HTTP).parsebytes(
+        f"Content-Type: {content_type}\r\n\r\n".encode("latin-1") + body)
+    if not message.is_multipart():
+        raise ValueError("Expected multipart/form-data")
+
+    uploads = {}
+    for part in message.iter_parts():
+        name = part.get_param("name", header="content-disposition")
+        if name:
+            uploads[name] = Upload(filename=part.get_filename() or name,
+                                   data=part.get_payload(decode=True) or b"")
+    return uploads
+
+
+class DetectionService:
+    """Runs analyses on a fixed worker pool behind a bounded queue.
+
+    At most `workers` analyses run at once and `queue_size` more may wait;
+    anything beyond that is rejected immediately so callers can back off. The
+    HTTP handler reserves a slot before reading the request body, so a full
+    service turns uploads away without buffering them.
+    The detector, and with it the Gemini client and preprocessing models, is
+    shared by every request for the lifetime of the service.
+    """
+
+    def __init__(self, detector, workers: int = None, queue_size: int = None):
+        self.detector = detector
+        self.workers = max(1, workers or config.server_workers)
+        self.queue_size = config.server_queue_size if queue_size is None else queue_size
+        self.capacity = self.workers + self.queue_size
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="analysis")
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._ready = threading.Event()
+        self._closing = False
+
+    def warm_up(self):
+        """Load lazily initialized models, then report ready."""
+        try:
+            if hasattr(self.detector, "warm_up"):
+                self.detector.warm_up()
+        finally:
+            self._ready.set()
+
+    @property
+    def ready(self) -> bool:
+        """Whether the service is warm, open and has room for another request."""
+        with self._lock:
+            return self._ready.is_set() and not self._closing and self._in_flight < self.capacity
+
+    def status(self) -> dict:
+        with self._lock:
+            return {
+                "warm": self._ready.is_set(),
+                "closing": self._closing,
+                "in_flight": self._in_flight,
+                "workers": self.workers,
+                "capacity": self.capacity,
+            }
+
+    def reserve(self):
+        """Claim a slot for one analysis; raises QueueFullError when none is free.
+
+        Follow with `submit(..., reserved=True)`, which owns the slot from then
+        on, or `release()` if the request is abandoned first.
+        """
+        with self._lock:
+            if self._closing or self._in_flight >= self.capacity:
+                raise QueueFullError(f"{self._in_flight} analyses in flight")
+            self._in_flight += 1
+
+    def release(self):
+        """Return a slot; called for abandoned reservations and after each analysis."""
+        with self._lock:
+            self._in_flight -= 1
+
+    def submit(self, photo: Upload, video: Upload, mode: str = None, reserved: bool = False) -> Future:
+        """Queue an analysis of uploaded files; the future resolves to the result dict."""
+        if not reserved:
+            self.reserve()
+
+        try:
+            workdir = tempfile.TemporaryDirectory(prefix="deepfake-upload-")
+            photo_path = self._save(workdir.name, "photo", photo)
+            video_path = self._save(workdir.name, "video", video)
+            return self._pool.submit(self._run, workdir, photo_path, video_path, mode)
+        except BaseException:
+            self.release()
+            raise
+
+    def _run(self, workdir: tempfile.TemporaryDirectory, photo_path: str, video_path: str,
+             mode: str = None) -> dict:
+        options = {"mode": mode} if mode else {}
+        try:
+            return self.detector.analyze(reference_photo=photo_path, video_path=video_path, **options).to_dict()
+        finally:
+            workdir.cleanup()
+            # Free the slot before the future resolves, so the caller's next request finds room
+            self.release()
+
+    @staticmethod
+    def _save(directory: str, stem: str, upload: Upload) -> str:
+        # Keep the extension so format sniffing by suffix still works
+        path = Path(directory) / f"{stem}{Path(upload.filename).suffix.lower()}"
+        path.write_bytes(upload.data)
+        return str(path)
+
+    def close(self):
+        """Stop accepting work, wait for running analyses and release the detector."""
+        with self._lock:
+            self._closing = True
+        self._pool.shutdown(wait=True)
+        self.detector.close()
+
+
+class DetectionRequestHandler(BaseHTTPRequestHandler):
+    """HTTP API: POST /analyze (multipart `photo` + `video`, optional `mode`), GET /healthz, GET /readyz."""
+
+    server_version = "DeepfakeDetector/1.0"
+
+    def do_GET(self):
+        service: DetectionService = self.server.service
+        if self.path == "/healthz":
+            self._send_json(200, {"status": "ok"})
+        elif self.path == "/readyz":
+            self._send_json(200 if service.ready else 503, service.status())
+        else:
+            self._send_json(404, {"error": f"Unknown path: {self.path}"})
+
+    def do_POST(self):
+        service: DetectionService = self.server.service
+        if self.path != "/analyze":
+            self._send_json(404, {"error": f"Unknown path: {self.path}"})
+            return
+
+        # Everything that can reject the request is checked before the body is read
+        length = self.headers.get("Content-Length")
+        if length is None:
+            self._send_json(411, {"error": "Content-Length required"})
+            return
+        try:
+            length = int(length)
+            if length < 0:
+                raise ValueError
+        except ValueError:
+            self._send_json(400, {"error": f"Invalid Content-Length: {self.headers['Content-Length']}"})
+            return
+        if length > config.max_upload_mb * 1024 * 1024:
+            self._send_json(413, {"error": f"Upload exceeds {config.max_upload_mb} MB"})
+            return
+        try:
+            service.reserve()
+        except QueueFullError as e:
+            self._send_json(429, {"error": f"Server busy: {e}"}, {"Retry-After": "5"})
+            return
+
+        try:
+            upload = self._parse_upload(self.rfile.read(length))
+        except BaseException as e:
+            service.release()
+            if not isinstance(e, ValueError):
+                raise
+            self._send_json(400, {"error": str(e)})
+            return
+        future = service.submit(*upload, reserved=True)
+
+        try:
+            self._send_json(200, future.result())
+        except Exception as e:
+            self._send_json(500, {"error": f"Analysis failed: {e}"})
+
+    def _parse_upload(self, body: bytes) -> tuple:
+        """(photo, video, mode) from a multipart body; raises ValueError for a bad request."""
+        uploads = parse_multipart(self.headers.get("Content-Type", ""), body)
+        missing = [field for field in ("photo", "video") if not uploads.get(field, Upload("", b"")).data]
+        if missing:
+            raise ValueError(f"Missing upload field(s): {', '.join(missing)}")
+
+        mode = uploads["mode"].data.decode().strip() if "mode" in uploads else None
+        if mode and mode not in ANALYSIS_MODES:
+            raise ValueError(f"Unknown mode: {mode} (expected one of {', '.join(ANALYSIS_MODES)})")
+        return uploads["photo"], uploads["video"], mode
+
+    def _send_json(self, status: int, payload: dict, headers: dict = None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def create_server(detector, host: str = None, port: int = None, workers: int = None,
+                  queue_size: int = None) -> ThreadingHTTPServer:
+    """Build an HTTP server around `detector`; the service is available as `server.service`."""
+    server = ThreadingHTTPServer((host or config.server_host, config.server_port if port is None else port),
+                                 DetectionRequestHandler)
+    server.service = DetectionService(detector, workers=workers, queue_size=queue_size)
+    return server
+
+
+def serve(detector, host: str = None, port: int = None, workers: int = None, queue_size: int = None):
+    """Serve until interrupted, warming models in the background before reporting ready."""
+    server = create_server(detector, host, port, workers, queue_size)
+    threading.Thread(target=server.service.warm_up, name="warm-up", daemon=True).start()
+    host, port = server.server_address[:2]
+    print(f"Serving on http://{host}:{port} "
+          f"({server.service.workers} workers, queue {server.service.queue_size})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.service.close()
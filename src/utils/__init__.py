@@ -1,5 +1,5 @@
 """Utility functions."""
 
-from src.utils.helpers import format_timestamp, calculate_weighted_score
+from src.utils.helpers import format_timestamp, calculate_weighted_score, file_digest
 
-__all__ = ["format_timestamp", "calculate_weighted_score"]
+__all__ = ["format_timestamp", "calculate_weighted_score", "file_digest"]
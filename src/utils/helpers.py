@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 from typing import List
+import hashlib
 
 
 def format_timestamp(seconds: float) -> str:
@@ -53,3 +54,12 @@ def get_frame_at_percentage(frames: list, percentage: float):
     idx = int(len(frames) * percentage)
     idx = max(0, min(idx, len(frames) - 1))
     return frames[idx]
+
+
+def file_digest(path: str, chunk_size: int = 1 << 20) -> str:
+    """Return the SHA-256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
@@ -0,0 +1,152 @@
+"""Lightweight timing spans for per-stage latency analysis."""
+
+from __future__ import annotations
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from dataclasses import asdict, dataclass, field
+from typing import Iterator, List, Optional
+import functools
+import json
+import threading
+import time
+import uuid
+
+_current: ContextVar[Optional["Tracer"]] = ContextVar("tracer", default=None)
+_export_lock = threading.Lock()
+
+
+@dataclass
+class Span:
+    """One timed stage of an analysis."""
+    name: str
+    start_seconds: float
+    duration_seconds: float
+    thread: str
+    attributes: dict = field(default_factory=dict)
+    error: Optional[str] = None
+    count: int = 1
+
+
+class Tracer:
+    """Collects spans for one analysis.
+
+    Spans are opened with the module-level `span()` helper against the tracer
+    activated for the current context, so instrumented code does not need a
+    tracer passed in and costs almost nothing when none is active. Hot loops
+    (per-frame color conversion) use `accumulate()`, which folds many short
+    timings into a single aggregate span.
+    """
+
+    def __init__(self, trace_id: str = None):
+        self.trace_id = trace_id or uuid.uuid4().hex
+        self.started_at = time.time()
+        self._origin = time.perf_counter()
+        self.spans: List[Span] = []
+        self._aggregates: dict = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def activate(self) -> Iterator["Tracer"]:
+        """Make this the tracer for the current context (thread or task)."""
+        token = _current.set(self)
+        try:
+            yield self
+        finally:
+            _current.reset(token)
+
+    @contextmanager
+    def span(self, name: str, **attributes) -> Iterator[dict]:
+        """Time a block; the yielded dict can be filled with attributes such as frames or bytes.
+
+        Exceptions are recorded and re-raised. Code that handles its own errors
+        can record one by setting an "error" key in the yielded dict.
+        """
+        start = time.perf_counter()
+        error = None
+        try:
+            yield attributes
+        except BaseException as e:
+            error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            error = error or attributes.pop("error", None)
+            self._add(Span(
+                name=name,
+                start_seconds=round(start - self._origin, 6),
+                duration_seconds=round(time.perf_counter() - start, 6),
+                thread=threading.current_thread().name,
+                attributes=attributes,
+                error=error,
+            ))
+
+    def accumulate(self, name: str, seconds: float, **counters):
+        """Add one timing (and numeric counters) to the aggregate span `name`."""
+        now = time.perf_counter()
+        with self._lock:
+            aggregate = self._aggregates.get(name)
+            if aggregate is None:
+                aggregate = self._aggregates[name] = Span(
+                    name=name, start_seconds=round(now - seconds - self._origin, 6), duration_seconds=0.0,
+                    thread=threading.current_thread().name, count=0)
+            aggregate.duration_seconds += seconds
+            aggregate.count += 1
+            for key, value in counters.items():
+                aggregate.attributes[key] = aggregate.attributes.get(key, 0) + value
+
+    def _add(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+
+    def all_spans(self) -> List[Span]:
+        """Recorded spans plus aggregates, ordered by start time."""
+        with self._lock:
+            aggregates = [Span(**{**asdict(a), "duration_seconds": round(a.duration_seconds, 6)})
+                          for a in self._aggregates.values()]
+            return sorted(self.spans + aggregates, key=lambda s: s.start_seconds)
+
+    def to_dict(self) -> dict:
+        """Per-stage totals and the individual spans, for `DetectionResult.to_dict()`."""
+        spans = self.all_spans()
+        stages: dict = {}
+        for s in spans:
+            stages[s.name] = round(stages.get(s.name, 0.0) + s.duration_seconds, 6)
+        return {
+            "trace_id": self.trace_id,
+            "stages": stages,
+            "spans": [asdict(s) for s in spans],
+        }
+
+    def export(self, path: str, **fields):
+        """Append the spans to a JSON-lines file, one span per line tagged with the trace id."""
+        lines = [json.dumps({"trace_id": self.trace_id, "trace_started_at": self.started_at,
+                             **fields, **asdict(s)}, default=str)
+                 for s in self.all_spans()]
+        with _export_lock, open(path, "a") as f:
+            f.write("\n".join(lines) + "\n")
+
+
+def current_tracer() -> Optional[Tracer]:
+    return _current.get()
+
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[dict]:
+    """Time a block under the current tracer; a no-op (still yielding a dict) when none is active."""
+    tracer = _current.get()
+    if tracer is None:
+        yield attributes
+        return
+    with tracer.span(name, **attributes) as attrs:
+        yield attrs
+
+
+def accumulate(name: str, seconds: float, **counters):
+    """Add to an aggregate span under the current tracer, if any."""
+    tracer = _current.get()
+    if tracer is not None:
+        tracer.accumulate(name, seconds, **counters)
+
+
+def run_in_executor(loop, fn, *args):
+    """`loop.run_in_executor(None, fn, *args)` that keeps the current tracer active in the worker thread."""
+    return loop.run_in_executor(None, functools.partial(copy_context().run, fn, *args))
@@ -0,0 +1,93 @@
+"""Tests for voice activity detection on synthetic audio."""
+
+import numpy as np
+import pytest
+
+from src.preprocessing.audio import SAMPLE_RATE, AudioData, AudioProcessor
+
+detect_speech = AudioProcessor.detect_speech
+
+
+def seconds(duration: float) -> np.ndarray:
+    return np.arange(int(duration * SAMPLE_RATE)) / SAMPLE_RATE
+
+
+def room_noise(duration: float, level: float = 1e-3, seed: int = 0) -> np.ndarray:
+    return (np.random.default_rng(seed).standard_normal(len(seconds(duration))) * level).astype(np.float32)
+
+
+def voiced_clip() -> np.ndarray:
+    """Quiet room noise with a 1 s voiced tone burst from 1.0 s to 2.0 s."""
+    samples = room_noise(3.0)
+    burst = slice(SAMPLE_RATE, 2 * SAMPLE_RATE)
+    samples[burst] += 0.3 * np.sin(2 * np.pi * 180 * seconds(1.0)).astype(np.float32)
+    return samples
+
+
+class RecordingWorker:
+    """Stands in for Whisper and records what it was asked to transcribe."""
+
+    def __init__(self):
+        self.calls = []
+
+    def transcribe(self, audio):
+        self.calls.append(audio)
+        return "hello"
+
+
+def test_silence_has_no_speech():
+    assert detect_speech(np.zeros(3 * SAMPLE_RATE, dtype=np.float32), margin_db=12, hangover_ms=300) == []
+
+
+def test_white_noise_has_no_speech():
+    noise = room_noise(3.0, level=0.3)
+    assert detect_speech(noise, margin_db=12, hangover_ms=300) == []
+
+
+def test_voiced_burst_is_one_segment():
+    segments = detect_speech(voiced_clip(), margin_db=12, hangover_ms=300)
+    assert len(segments) == 1
+    start, end = segments[0]
+    assert start == pytest.approx(1.0, abs=0.03)
+    # Hangover keeps the detector on for 300 ms after the last voiced frame
+    assert end == pytest.approx(2.3, abs=0.05)
+
+
+def test_short_click_is_dropped():
+    samples = room_noise(2.0)
+    samples[SAMPLE_RATE:SAMPLE_RATE + 480] += 0.3 * np.sin(2 * np.pi * 180 * seconds(0.03)).astype(np.float32)
+    assert detect_speech(samples, margin_db=12, hangover_ms=300) == []
+
+
+def test_pauses_shorter_than_hangover_do_not_split():
+    samples = voiced_clip()
+    samples[int(1.4 * SAMPLE_RATE):int(1.6 * SAMPLE_RATE)] = room_noise(0.2, seed=1)
+    assert len(detect_speech(samples, margin_db=12, hangover_ms=300)) == 1
+    assert len(detect_speech(samples, margin_db=12, hangover_ms=0)) == 2
+
+
+def test_speech_only_keeps_just_the_segments():
+    samples = np.arange(4 * SAMPLE_RATE, dtype=np.float32)
+    audio = AudioData(samples=samples, duration_seconds=4.0, speech_segments=[[0.0, 4.0]])
+    speech = AudioProcessor.speech_only(audio, [[0.5, 1.0], [2.0, 3.0]], gap_seconds=0.1)
+    first, gap, second = np.split(speech.samples, [SAMPLE_RATE // 2, SAMPLE_RATE // 2 + SAMPLE_RATE // 10])
+    assert np.array_equal(first, samples[SAMPLE_RATE // 2:SAMPLE_RATE])
+    assert not gap.any()
+    assert np.array_equal(second, samples[2 * SAMPLE_RATE:3 * SAMPLE_RATE])
+    assert speech.duration_seconds == pytest.approx(1.6)
+    assert speech.speech_segments is None
+
+
+def test_transcribe_speech_skips_whisper_without_speech(monkeypatch):
+    monkeypatch.setattr("src.preprocessing.audio.config.vad_enabled", True)
+    worker = RecordingWorker()
+    processor = AudioProcessor(transcription_worker=worker, probe=object())
+
+    silent = AudioData(samples=np.zeros(2 * SAMPLE_RATE, dtype=np.float32), duration_seconds=2.0)
+    assert processor.transcribe_speech(silent) == ""
+    assert worker.calls == []
+
+    voiced = AudioData(samples=voiced_clip(), duration_seconds=3.0)
+    assert processor.transcribe_speech(voiced) == "hello"
+    assert len(worker.calls[0]) < len(voiced.samples)
+    assert voiced.speech_segments == detect_speech(voiced.samples)
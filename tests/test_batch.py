@@ -0,0 +1,32 @@
+"""Tests for the bounded-concurrency batch runner."""
+
+import io
+import json
+
+from src.batch import BatchJob, run_batch
+from src.models import DetectionResult, DetectionVerdict
+
+
+class StubDetector:
+    """Fails the Gemini call for videos named "error", raises for "missing"."""
+
+    def analyze(self, reference_photo, video_path, mode=None):
+        if video_path == "missing.mp4":
+            raise FileNotFoundError(f"Video file not found: {video_path}")
+        if video_path == "error.mp4":
+            return DetectionResult(error="503 UNAVAILABLE")
+        return DetectionResult(verdict=DetectionVerdict.LIKELY_AUTHENTIC, fake_confidence_score=0.1)
+
+
+def test_gemini_errors_count_as_failed():
+    jobs = [BatchJob(name, "photo.jpg", f"{name}.mp4") for name in ("ok", "error", "missing")]
+    out = io.StringIO()
+    summary = run_batch(StubDetector(), jobs, concurrency=2, out=out)
+    assert summary["succeeded"] == 1 and summary["failed"] == 2
+    assert summary["verdicts"] == {"LIKELY_AUTHENTIC": 1}
+
+    records = {r["id"]: r for r in map(json.loads, out.getvalue().splitlines())}
+    assert "error" not in records["ok"]
+    assert records["error"]["error"] == "503 UNAVAILABLE"
+    assert records["error"]["result"]["verdict"] == "INCONCLUSIVE"
+    assert "result" not in records["missing"]
@@ -0,0 +1,36 @@
+"""Tests for the on-disk result cache."""
+
+import os
+import time
+
+from src.cache import ResultCache
+
+
+def age(cache, key, seconds):
+    """Pretend an entry was created `seconds` ago."""
+    path = cache._path(key)
+    stat = path.stat()
+    os.utime(path, (stat.st_atime, stat.st_mtime - seconds))
+
+
+def test_ttl_counts_from_creation_even_when_read(tmp_path):
+    cache = ResultCache(str(tmp_path), max_mb=10, ttl_hours=1)
+    cache.put("a", {"value": 1})
+    age(cache, "a", 1800)
+    assert cache.get("a")["value"] == 1
+    age(cache, "a", 1900)
+    cache.put("b", {"value": 2})
+    assert not cache._path("a").exists()
+    assert cache.get("b")["value"] == 2
+
+
+def test_eviction_drops_least_recently_read(tmp_path):
+    cache = ResultCache(str(tmp_path), max_mb=10, ttl_hours=0)
+    for key in ("a", "b", "c"):
+        cache.put(key, {"blob": "x" * 1000})
+        time.sleep(0.01)
+    cache.get("a")
+    cache.max_bytes = 2 * cache._path("a").stat().st_size + 10
+    cache.put("c", {"blob": "x" * 1000})
+    assert cache.get("a") and cache.get("c")
+    assert not cache._path("b").exists()
@@ -0,0 +1,110 @@
+"""Tests for Gemini context caching against the fake client."""
+
+import time
+
+import numpy as np
+import pytest
+from google.genai import errors
+
+from benchmarks.fake_gemini import FakeCaches, FakeGeminiAnalyzer
+from src.analyzers.caching import CachedContext, ContextCacheRegistry
+
+MODEL = "gemini-test"
+PREFIX = ["analysis prompt " * 100]
+
+
+class RefusingCaches(FakeCaches):
+    """Rejects every cache like the API does for unsupported content."""
+
+    def create(self, model, config=None):
+        self.created += 1
+        raise errors.APIError(400, {"error": {"message": "too small", "status": "INVALID_ARGUMENT"}})
+
+
+class Client:
+    """Just the `caches` surface of a genai client."""
+
+    def __init__(self, caches):
+        self.caches = caches
+
+
+def test_creates_once_and_reuses():
+    client = Client(FakeCaches())
+    registry = ContextCacheRegistry(ttl=600, refresh=60, min_tokens=100)
+    key, first = registry.get_or_create(client, MODEL, PREFIX)
+    assert registry.get_or_create(client, MODEL, PREFIX) == (key, first)
+    assert client.caches.created == 1
+    assert registry.get_or_create(client, MODEL, PREFIX, namespace="other")[1].name != first.name
+
+
+def test_small_prefix_is_sent_inline():
+    client = Client(FakeCaches())
+    registry = ContextCacheRegistry(ttl=600, refresh=60, min_tokens=10_000)
+    assert registry.get_or_create(client, MODEL, PREFIX) is None
+    assert client.caches.created == 0
+
+
+def test_expiring_cache_is_extended():
+    client = Client(FakeCaches())
+    registry = ContextCacheRegistry(ttl=600, refresh=60, min_tokens=100)
+    key, entry = registry.get_or_create(client, MODEL, PREFIX)
+    registry.put(key, CachedContext(entry.name, time.time() + 45, entry.tokens))
+    _, extended = registry.get_or_create(client, MODEL, PREFIX)
+    assert extended.name == entry.name and extended.expires_at > time.time() + 500
+    assert client.caches.created == 1
+
+
+def test_cache_gone_from_server_is_recreated():
+    client = Client(FakeCaches())
+    registry = ContextCacheRegistry(ttl=600, refresh=60, min_tokens=100)
+    key, entry = registry.get_or_create(client, MODEL, PREFIX)
+    client.caches.delete(entry.name)
+    registry.put(key, CachedContext(entry.name, time.time() + 45, entry.tokens))
+    _, recreated = registry.get_or_create(client, MODEL, PREFIX)
+    assert recreated.name != entry.name
+    assert client.caches.created == 2
+
+
+def test_refused_prefix_is_not_retried():
+    client = Client(RefusingCaches())
+    registry = ContextCacheRegistry(ttl=600, refresh=60, min_tokens=100)
+    assert registry.get_or_create(client, MODEL, PREFIX) is None
+    assert registry.get_or_create(client, MODEL, PREFIX) is None
+    assert client.caches.created == 1
+
+
+def test_registry_persists_entries(tmp_path):
+    path = str(tmp_path / "caches.json")
+    client = Client(FakeCaches())
+    key, entry = ContextCacheRegistry(path, ttl=600, refresh=60, min_tokens=100).get_or_create(client, MODEL, PREFIX)
+    assert ContextCacheRegistry(path, ttl=600, refresh=60, min_tokens=100).get(key) == entry
+
+
+@pytest.fixture
+def analyzer():
+    caches = ContextCacheRegistry(ttl=600, refresh=60, min_tokens=0)
+    return FakeGeminiAnalyzer(latency=0, caches=caches, context_cache="reference")
+
+
+def test_analyzer_sends_requests_against_the_cache(analyzer):
+    reference = np.full((64, 64, 3), 128, dtype=np.uint8)
+    frames = [np.full((64, 64, 3), i, dtype=np.uint8) for i in range(3)]
+    for _ in range(2):
+        assert analyzer.analyze(reference, frames)["overall_assessment"] == "LIKELY_AUTHENTIC"
+    assert analyzer.client.caches.created == 1
+    assert analyzer.client.counter["cached_calls"] == 2
+
+
+def test_analyzer_falls_back_inline_when_cache_is_stale(analyzer):
+    reference = np.full((64, 64, 3), 128, dtype=np.uint8)
+    frames = [np.full((64, 64, 3), i, dtype=np.uint8) for i in range(3)]
+    analyzer.analyze(reference, frames)
+    analyzer.client.caches.delete("cachedContents/1")
+
+    assert analyzer.analyze(reference, frames)["overall_assessment"] == "LIKELY_AUTHENTIC"
+    assert analyzer.client.counter["calls"] == 2
+    assert analyzer.client.counter["cached_calls"] == 1
+
+    analyzer.analyze(reference, frames)
+    assert analyzer.client.caches.created == 2
+    assert analyzer.client.counter["cached_calls"] == 2
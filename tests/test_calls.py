@@ -0,0 +1,53 @@
+"""Tests for the Gemini call layer: retries and rate-limit accounting."""
+
+from types import SimpleNamespace
+
+import pytest
+from google.genai import errors
+
+from src.analyzers.calls import GeminiCaller, RateLimiter
+
+
+class FlakyModels:
+    """Fails the first `failures` requests with `code`, then answers."""
+
+    def __init__(self, failures: int, code: int = 503):
+        self.failures = failures
+        self.code = code
+        self.calls = 0
+
+    def generate_content(self, model, contents, config=None):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise errors.APIError(self.code, {"error": {"message": "unavailable", "status": "UNAVAILABLE"}})
+        return SimpleNamespace(text="ok", usage_metadata=None)
+
+
+def caller(models, max_retries=3):
+    limiter = RateLimiter(rpm=600, tpm=100_000)
+    return GeminiCaller(SimpleNamespace(models=models), "gemini-test", limiter, max_retries=max_retries,
+                        deadline=10, backoff_base=0.001, backoff_max=0.001)
+
+
+def test_retries_debit_tokens_once():
+    call = caller(FlakyModels(failures=2))
+    assert call.generate(["prompt"], tokens=1000) == "ok"
+    assert call.client.models.calls == 3
+    # Refill during the test adds a little; failed attempts must not have cost anything
+    assert 99_000 <= call.limiter.tokens.tokens <= 99_100
+    assert call.limiter.requests.tokens < 598
+
+
+def test_gives_up_after_max_retries():
+    call = caller(FlakyModels(failures=10), max_retries=2)
+    with pytest.raises(errors.APIError):
+        call.generate(["prompt"], tokens=1000)
+    assert call.client.models.calls == 3
+    assert call.limiter.tokens.tokens >= 100_000 - 1
+
+
+def test_non_retryable_error_is_raised_immediately():
+    call = caller(FlakyModels(failures=1, code=400))
+    with pytest.raises(errors.APIError):
+        call.generate(["prompt"], tokens=1000)
+    assert call.client.models.calls == 1
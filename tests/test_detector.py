@@ -0,0 +1,177 @@
+"""End-to-end detector tests on synthetic clips with the fake Gemini client."""
+
+import asyncio
+import hashlib
+import json
+
+import pytest
+from google.genai import errors
+
+from benchmarks.fake_gemini import CANNED_RESPONSE, FakeGeminiAnalyzer, FakeModels
+from benchmarks.synthetic import VideoSpec, make_photo, make_video
+from src.detector import DeepfakeDetector
+from src.models import DetectionVerdict
+
+
+class FailingModels(FakeModels):
+    """Answers every request with a non-retryable API error."""
+
+    def _response(self, config):
+        with self._lock:
+            self.counter["calls"] += 1
+        raise errors.APIError(400, {"error": {"message": "bad request", "status": "INVALID_ARGUMENT"}})
+
+
+class ScriptedModels(FakeModels):
+    """Answers requests for chosen uploaded videos with a deepfake report or an API error."""
+
+    DEEPFAKE = {**{key: {**value, "score": 0.95} if isinstance(value, dict) else value
+                   for key, value in CANNED_RESPONSE.items()},
+                "overall_assessment": "LIKELY_DEEPFAKE", "confidence": 0.95}
+
+    def __init__(self, outcomes: dict, **kwargs):
+        super().__init__(0, **kwargs)
+        self.outcomes = outcomes
+
+    def generate_content(self, model, contents, config=None):
+        uris = {getattr(part.file_data, "file_uri", None) for part in contents
+                if getattr(part, "file_data", None) is not None}
+        outcome = next((self.outcomes[uri] for uri in uris if uri in self.outcomes), None)
+        if outcome == "error":
+            raise errors.APIError(400, {"error": {"message": "bad request", "status": "INVALID_ARGUMENT"}})
+        response = super().generate_content(model, contents, config)
+        if outcome == "deepfake":
+            response.text = json.dumps(self.DEEPFAKE)
+        return response
+
+
+def file_uri(video: str) -> str:
+    """URI the fake Files API gives an uploaded video."""
+    return f"https://fake.invalid/files/{hashlib.sha256(video.encode()).hexdigest()[:12]}"
+
+
+@pytest.fixture(scope="module")
+def media(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("media")
+    return str(make_photo(directory)), str(make_video(VideoSpec(320, 240, 25, 2), directory))
+
+
+@pytest.fixture(scope="module")
+def clips(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("clips")
+    return [str(make_video(VideoSpec(320, 240, 25, 2), directory, seed=seed)) for seed in (1, 2, 3)]
+
+
+@pytest.fixture
+def detector(tmp_path):
+    detector = DeepfakeDetector(cache_dir=str(tmp_path / "cache"), analyzer=FakeGeminiAnalyzer(latency=0))
+    yield detector
+    detector.close()
+
+
+def failing(detector):
+    client = detector.gemini_analyzer.client
+    client.models = FailingModels(0, counter=client.counter)
+    client.aio.models = FailingModels(0, is_async=True, counter=client.counter)
+    return detector
+
+
+def scripted(detector, outcomes: dict):
+    client = detector.gemini_analyzer.client
+    client.models = ScriptedModels({file_uri(video): outcome for video, outcome in outcomes.items()},
+                                   counter=client.counter)
+    return detector
+
+
+def test_frames_mode_sends_the_frame_budget(detector, media, monkeypatch):
+    analyzer = detector.gemini_analyzer
+    sent = []
+    analyze = analyzer.analyze
+
+    def recording(reference, frames, *args, **kwargs):
+        sent.append(len(frames))
+        return analyze(reference, frames, *args, **kwargs)
+
+    monkeypatch.setattr(analyzer, "analyze", recording)
+    result = detector.analyze(*media, mode="frames")
+    assert result.verdict == DetectionVerdict.LIKELY_AUTHENTIC
+    assert result.error is None
+    assert result.payload_bytes > 0
+    assert sent == [analyzer.max_frames]
+    assert analyzer.calls == 1
+
+
+def test_video_mode_uploads_once(detector, media):
+    for _ in range(2):
+        detector.cache = None
+        result = detector.analyze(*media, mode="video")
+        assert result.verdict == DetectionVerdict.LIKELY_AUTHENTIC
+    assert detector.gemini_analyzer.client.files.uploads == 1
+    assert detector.gemini_analyzer.calls == 2
+
+
+def test_repeat_analysis_is_served_from_cache(detector, media):
+    first = detector.analyze(*media)
+    second = detector.analyze(*media)
+    assert detector.gemini_analyzer.calls == 1
+    assert second.verdict == first.verdict
+    assert second.fake_confidence_score == first.fake_confidence_score
+    # A different mode is a different analysis
+    detector.analyze(*media, mode="video")
+    assert detector.gemini_analyzer.calls == 2
+
+
+def test_async_analysis_matches_sync(detector, media):
+    result = asyncio.run(detector.analyze_async(*media, mode="frames"))
+    assert result.verdict == DetectionVerdict.LIKELY_AUTHENTIC
+    assert detector.gemini_analyzer.calls == 1
+
+
+@pytest.mark.parametrize("mode", ["frames", "video"])
+def test_api_error_is_reported_and_not_cached(detector, media, mode):
+    result = failing(detector).analyze(*media, mode=mode)
+    assert result.verdict == DetectionVerdict.INCONCLUSIVE
+    assert "bad request" in result.error
+    assert result.to_dict()["error"] == result.error
+    failing(detector).analyze(*media, mode=mode)
+    assert detector.gemini_analyzer.calls == 2
+
+
+def test_missing_video_raises(detector, media):
+    with pytest.raises(FileNotFoundError):
+        detector.analyze(media[0], "missing.mp4")
+
+
+def test_session_of_authentic_clips_prepares_reference_once(detector, media, clips, monkeypatch):
+    loads = []
+    load_reference = detector._load_reference
+
+    def counting(path):
+        loads.append(path)
+        return load_reference(path)
+
+    monkeypatch.setattr(detector, "_load_reference", counting)
+    session = detector.analyze_many(media[0], clips, mode="frames")
+    assert loads == [media[0]]
+    assert session.verdict == DetectionVerdict.LIKELY_AUTHENTIC
+    assert session.errors == [None, None, None]
+    assert session.fake_confidence_score == max(r.fake_confidence_score for r in session.results)
+    assert detector.gemini_analyzer.calls == 3
+
+
+@pytest.mark.parametrize("missing, message", [(True, "not found"), (False, "bad request")])
+def test_session_with_a_failed_clip_is_inconclusive(detector, media, clips, missing, message):
+    videos = clips[:2] + ["missing.mp4" if missing else clips[2]]
+    session = scripted(detector, {clips[2]: "error"}).analyze_many(media[0], videos, mode="video")
+    assert session.verdict == DetectionVerdict.INCONCLUSIVE
+    assert session.errors[:2] == [None, None]
+    assert message in session.errors[2]
+    assert session.to_dict()["videos"][2]["error"] == session.errors[2]
+
+
+def test_one_deepfake_clip_decides_the_session(detector, media, clips):
+    session = scripted(detector, {clips[1]: "deepfake", clips[2]: "error"}).analyze_many(
+        media[0], clips, mode="video")
+    assert session.results[1].verdict == DetectionVerdict.LIKELY_DEEPFAKE
+    assert session.verdict == DetectionVerdict.LIKELY_DEEPFAKE
+    assert session.fake_confidence_score == session.results[1].fake_confidence_score
@@ -0,0 +1,126 @@
+"""Tests for the SQLite job queue and its worker loop."""
+
+import time
+
+import pytest
+
+from src.batch import BatchJob
+from src.jobs import JobQueue, run_worker
+from src.models import DetectionResult, DetectionVerdict
+
+
+class StubDetector:
+    """Returns queued outcomes in order: a DetectionResult, or an exception to raise."""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    def analyze(self, reference_photo, video_path, mode=None):
+        self.calls += 1
+        outcome = self.outcomes.pop(0) if len(self.outcomes) > 1 else self.outcomes[0]
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+def authentic():
+    return DetectionResult(verdict=DetectionVerdict.LIKELY_AUTHENTIC, fake_confidence_score=0.1)
+
+
+def api_error():
+    return DetectionResult(error="503 UNAVAILABLE")
+
+
+@pytest.fixture
+def queue(tmp_path):
+    q = JobQueue(str(tmp_path / "jobs.sqlite"), lease_seconds=30, max_attempts=3, retry_backoff=0)
+    q.enqueue([BatchJob("a", "photo.jpg", "a.mp4"), BatchJob("b", "photo.jpg", "b.mp4")])
+    yield q
+    q.close()
+
+
+def test_claim_leases_each_job_once(queue):
+    first = queue.claim("w1")
+    second = queue.claim("w2")
+    assert {first.id, second.id} == {"a", "b"}
+    assert queue.claim("w3") is None
+    assert queue.counts()["running"] == 2
+
+
+def test_enqueue_ignores_known_ids(queue):
+    assert queue.enqueue([BatchJob("a", "photo.jpg", "a.mp4"), BatchJob("c", "photo.jpg", "c.mp4")]) == 1
+
+
+def test_expired_lease_is_reclaimed(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite"), lease_seconds=0.05, max_attempts=3, retry_backoff=0)
+    queue.enqueue([BatchJob("a", "photo.jpg", "a.mp4")])
+    assert queue.claim("crashed").id == "a"
+    assert queue.claim("w2") is None
+    time.sleep(0.1)
+    assert queue.claim("w2").id == "a"
+    # The crashed worker no longer holds the lease, so its late failure is ignored
+    queue.fail("a", "crashed", "boom")
+    assert queue.counts()["running"] == 1
+
+
+def test_heartbeat_keeps_lease(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite"), lease_seconds=0.2, max_attempts=3, retry_backoff=0)
+    queue.enqueue([BatchJob("a", "photo.jpg", "a.mp4")])
+    queue.claim("w1")
+    time.sleep(0.1)
+    assert queue.heartbeat(["a"], "w1") == 1
+    time.sleep(0.15)
+    assert queue.claim("w2") is None
+
+
+def test_failure_backs_off_before_retry(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite"), lease_seconds=30, max_attempts=3, retry_backoff=60)
+    queue.enqueue([BatchJob("a", "photo.jpg", "a.mp4")])
+    queue.claim("w1")
+    queue.fail("a", "w1", "503 UNAVAILABLE")
+    assert queue.counts()["pending"] == 1
+    assert queue.claim("w1") is None
+
+
+def test_max_attempts_fails_permanently(queue):
+    for _ in range(3):
+        job = queue.claim("w1")
+        assert job.id == "a"
+        queue.fail("a", "w1", "503 UNAVAILABLE")
+    assert queue.counts()["failed"] == 1
+    records = {r["id"]: r for r in queue.records()}
+    assert records["a"]["attempts"] == 3
+    assert records["a"]["error"] == "503 UNAVAILABLE"
+
+
+def test_retry_failed_resets_attempts(queue):
+    queue.claim("w1")
+    queue.fail("a", "w1", "missing", retry=False)
+    assert queue.retry_failed() == 1
+    assert queue.counts()["failed"] == 0
+
+
+def test_worker_retries_gemini_errors_then_completes(queue):
+    detector = StubDetector(api_error(), authentic())
+    summary = run_worker(detector, queue, poll_interval=0.01)
+    assert summary["queue"]["done"] == 2
+    assert summary["processed"] == {"done": 2, "errors": 1}
+    records = {r["id"]: r for r in queue.records()}
+    assert records["a"]["attempts"] == 2
+    assert records["a"]["result"]["verdict"] == "LIKELY_AUTHENTIC"
+
+
+def test_worker_gives_up_after_max_attempts(queue):
+    detector = StubDetector(api_error())
+    summary = run_worker(detector, queue, concurrency=2, poll_interval=0.01)
+    assert summary["queue"]["failed"] == 2
+    assert detector.calls == 6
+    assert all(r["error"] == "503 UNAVAILABLE" for r in queue.records())
+
+
+def test_worker_does_not_retry_missing_inputs(queue):
+    detector = StubDetector(FileNotFoundError("Video file not found: a.mp4"))
+    summary = run_worker(detector, queue, poll_interval=0.01)
+    assert summary["queue"]["failed"] == 2
+    assert detector.calls == 2
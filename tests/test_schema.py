@@ -0,0 +1,87 @@
+"""Tests for validating Gemini's JSON response."""
+
+import json
+
+import pytest
+
+from src.analyzers.schema import (MAX_EVIDENCE, MAX_ITEMS, MAX_KEY_FINDINGS, MAX_TEXT, ResponseError,
+                                  parse_report, response_schema)
+
+
+def report(**fields) -> str:
+    return json.dumps({"overall_assessment": "LIKELY_AUTHENTIC", "confidence": 0.2, **fields})
+
+
+def test_fenced_response_is_unwrapped():
+    parsed = parse_report("```json\n" + report(key_findings=["clear book title"]) + "\n```")
+    assert parsed.overall_assessment == "LIKELY_AUTHENTIC"
+    assert parsed.key_findings == ["clear book title"]
+
+
+def test_scores_are_clamped():
+    parsed = parse_report(report(confidence=1.7, eye_analysis={"score": -0.3},
+                                 ai_signals={"score": "0.4"}, identity_analysis={"score": "high"}))
+    assert parsed.confidence == 1.0
+    assert parsed.eye_analysis.score == 0.0
+    assert parsed.ai_signals.score == 0.4
+    assert parsed.identity_analysis.score == 0.5
+
+
+def test_unknown_enum_values_fall_back():
+    parsed = parse_report(report(overall_assessment="PROBABLY_FAKE",
+                                 movement_analysis={"body_pacing": "Robotic"},
+                                 identity_analysis={"consistency": "perfect"}))
+    assert parsed.overall_assessment == "INCONCLUSIVE"
+    assert parsed.movement_analysis.body_pacing == "robotic"
+    assert parsed.identity_analysis.consistency == "unknown"
+
+
+def test_lists_and_text_are_truncated():
+    long_text = "x" * (MAX_TEXT + 50)
+    parsed = parse_report(report(
+        key_findings=[long_text] * (MAX_KEY_FINDINGS + 3),
+        eye_analysis={"observations": [f"observation {i}" for i in range(MAX_ITEMS + 3)]},
+        book_analysis={"title": long_text},
+        evidence_frames=[{"frame_index": i, "issue": long_text} for i in range(MAX_EVIDENCE + 3)],
+    ))
+    assert len(parsed.key_findings) == MAX_KEY_FINDINGS
+    assert all(len(finding) == MAX_TEXT for finding in parsed.key_findings)
+    assert parsed.eye_analysis.observations == [f"observation {i}" for i in range(MAX_ITEMS)]
+    assert len(parsed.book_analysis.title) == MAX_TEXT
+    assert len(parsed.evidence_frames) == MAX_EVIDENCE
+    assert len(parsed.evidence_frames[0].issue) == MAX_TEXT
+
+
+def test_missing_sections_and_unexpected_keys():
+    data = parse_report(report(notes="extra", book_analysis=None)).to_dict()
+    assert "notes" not in data and "book_analysis" not in data
+    assert data["key_findings"] == [] and data["evidence_frames"] == []
+
+
+@pytest.mark.parametrize("text", ["", "not json", "{\"overall_assessment\": ", "[1, 2]", "```\n```"])
+def test_invalid_responses_raise(text):
+    with pytest.raises(ResponseError):
+        parse_report(text)
+
+
+def test_frame_evidence():
+    parsed = parse_report(report(evidence_frames=[
+        {"frame_index": 3, "issue": "warped hand"},
+        {"frame_index": -2, "issue": "clamped to the first frame"},
+        {"frame_index": "three", "issue": "dropped"},
+        "not an object",
+    ]))
+    assert [item.frame_index for item in parsed.evidence_frames] == [3, 0]
+    assert parsed.to_dict()["evidence_frames"][0] == {"issue": "warped hand", "frame_index": 3}
+
+
+def test_timestamp_evidence():
+    parsed = parse_report(report(evidence_frames=[{"timestamp_seconds": 12.5, "issue": "lips lag"}]))
+    assert parsed.to_dict()["evidence_frames"] == [{"issue": "lips lag", "timestamp_seconds": 12.5}]
+
+
+def test_schema_keys_evidence_by_mode():
+    frames = response_schema(video=False).properties["evidence_frames"].items.properties
+    video = response_schema(video=True).properties["evidence_frames"].items.properties
+    assert "frame_index" in frames and "timestamp_seconds" not in frames
+    assert "timestamp_seconds" in video and "frame_index" not in video
@@ -0,0 +1,162 @@
+"""Tests for the HTTP service against a stub detector."""
+
+import http.client
+import json
+import threading
+import time
+import uuid
+
+import pytest
+
+from src.models import DetectionResult, DetectionVerdict
+from src.server import DetectionService, QueueFullError, Upload, create_server
+
+
+class StubDetector:
+    """Records calls and optionally blocks each analysis until released."""
+
+    def __init__(self, block: bool = False):
+        self.calls = []
+        self.release = threading.Event()
+        if not block:
+            self.release.set()
+        self.started = threading.Semaphore(0)
+        self.warmed = False
+        self.closed = False
+
+    def warm_up(self):
+        self.warmed = True
+
+    def analyze(self, reference_photo, video_path, mode=None):
+        self.calls.append((reference_photo, video_path, mode))
+        self.started.release()
+        self.release.wait(10)
+        return DetectionResult(verdict=DetectionVerdict.LIKELY_AUTHENTIC, fake_confidence_score=0.1)
+
+    def close(self):
+        self.closed = True
+
+
+def multipart(fields: dict) -> tuple:
+    boundary = uuid.uuid4().hex
+    body = b""
+    for name, (filename, data) in fields.items():
+        disposition = f'form-data; name="{name}"' + (f'; filename="{filename}"' if filename else "")
+        body += (f"--{boundary}\r\nContent-Disposition: {disposition}\r\n\r\n").encode() + data + b"\r\n"
+    body += f"--{boundary}--\r\n".encode()
+    return f"multipart/form-data; boundary={boundary}", body
+
+
+UPLOAD = {"photo": ("person.jpg", b"jpeg"), "video": ("clip.mp4", b"mp4")}
+
+
+@pytest.fixture
+def running():
+    servers = []
+
+    def start(detector, workers=1, queue_size=0, warm=True):
+        server = create_server(detector, host="127.0.0.1", port=0, workers=workers, queue_size=queue_size)
+        if warm:
+            server.service.warm_up()
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.service.detector.release.set()
+        server.shutdown()
+        server.server_close()
+        server.service.close()
+
+
+def request(server, method, path, body=b"", headers=None, send_body=True):
+    connection = http.client.HTTPConnection(*server.server_address[:2], timeout=10)
+    connection.putrequest(method, path)
+    for name, value in (headers or {}).items():
+        connection.putheader(name, value)
+    connection.endheaders()
+    if send_body and body:
+        connection.send(body)
+    response = connection.getresponse()
+    payload = json.loads(response.read() or b"{}")
+    connection.close()
+    return response.status, payload, response
+
+
+def post(server, fields=UPLOAD, **kwargs):
+    content_type, body = multipart(fields)
+    return request(server, "POST", "/analyze", body,
+                   {"Content-Type": content_type, "Content-Length": str(len(body))}, **kwargs)
+
+
+def test_analyze_returns_result(running):
+    detector = StubDetector()
+    server = running(detector)
+    status, payload, _ = post(server, {**UPLOAD, "mode": (None, b"video")})
+    assert status == 200
+    assert payload["verdict"] == "LIKELY_AUTHENTIC"
+    photo, video, mode = detector.calls[0]
+    assert photo.endswith("photo.jpg") and video.endswith("video.mp4") and mode == "video"
+    assert server.service.status()["in_flight"] == 0
+
+
+def test_health_and_readiness(running):
+    server = running(StubDetector(), warm=False)
+    assert request(server, "GET", "/healthz")[0] == 200
+    assert request(server, "GET", "/readyz")[0] == 503
+    server.service.warm_up()
+    assert server.service.detector.warmed
+    assert request(server, "GET", "/readyz")[0] == 200
+
+
+@pytest.mark.parametrize("length, status", [(None, 411), ("abc", 400), ("-1", 400), (str(10 ** 12), 413)])
+def test_rejects_bad_content_length(running, length, status):
+    server = running(StubDetector())
+    headers = {"Content-Type": "multipart/form-data; boundary=x"}
+    if length is not None:
+        headers["Content-Length"] = length
+    assert request(server, "POST", "/analyze", headers=headers)[0] == status
+    assert server.service.status()["in_flight"] == 0
+
+
+def test_rejects_invalid_uploads(running):
+    server = running(StubDetector())
+    assert post(server, {"photo": UPLOAD["photo"]})[0] == 400
+    assert post(server, {**UPLOAD, "mode": (None, b"fast")})[0] == 400
+    assert server.service.status()["in_flight"] == 0
+
+
+def test_busy_service_answers_429_before_reading_body(running):
+    detector = StubDetector(block=True)
+    server = running(detector, workers=1, queue_size=0)
+    first = threading.Thread(target=post, args=(server,))
+    first.start()
+    assert detector.started.acquire(timeout=5)
+
+    # Headers only: the server must answer without waiting for the announced body
+    status, payload, response = post(server, send_body=False)
+    assert status == 429
+    assert response.getheader("Retry-After") == "5"
+    assert request(server, "GET", "/readyz")[0] == 503
+
+    detector.release.set()
+    first.join(5)
+    assert server.service.status()["in_flight"] == 0
+
+
+def test_service_capacity_counts_queued_work():
+    detector = StubDetector(block=True)
+    service = DetectionService(detector, workers=1, queue_size=1)
+    futures = [service.submit(Upload("p.jpg", b"p"), Upload("v.mp4", b"v")) for _ in range(2)]
+    with pytest.raises(QueueFullError):
+        service.reserve()
+    detector.release.set()
+    assert all(f.result(5)["verdict"] == "LIKELY_AUTHENTIC" for f in futures)
+    deadline = time.monotonic() + 5
+    while service.status()["in_flight"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    service.reserve()
+    service.release()
+    service.close()
+    assert detector.closed
@@ -0,0 +1,43 @@
+"""Tests for audio-visual sync measurement."""
+
+import numpy as np
+
+from src.preprocessing.sync import SyncAnalyzer
+
+FPS = 10.0
+RATE = 1000
+
+
+def talking_clip(seconds: float, lag_frames: int = 0):
+    """Mouth openings and audio whose loudness is the mouth series rolled by `lag_frames`."""
+    rng = np.random.default_rng(0)
+    times = np.arange(int(seconds * FPS)) / FPS
+    mouth = rng.random(len(times))
+    loudness = np.roll(mouth, lag_frames)
+    block = int(RATE / FPS)
+    # Center each frame's loudness block on its frame time, as the envelope samples it
+    envelope = np.roll(np.repeat(loudness, block), -block // 2)
+    samples = envelope * np.where(np.arange(len(envelope)) % 2, 1.0, -1.0)
+    return times, mouth, samples.astype(np.float32)
+
+
+def test_measures_lag_within_speech():
+    times, mouth, samples = talking_clip(20, lag_frames=-2)
+    stats = SyncAnalyzer().measure(mouth, times, samples, RATE, FPS, speech=[[5.0, 15.0]])
+    assert stats.correlation > 0.8
+    assert stats.lag_seconds == 0.2
+    assert stats.duration_seconds == 10.0
+
+
+def test_too_little_speech_is_not_measured():
+    times, mouth, samples = talking_clip(20)
+    assert SyncAnalyzer().measure(mouth, times, samples, RATE, FPS, speech=[[0.0, 2.0]]) is None
+    assert SyncAnalyzer().measure(mouth, times, samples, RATE, FPS, speech=[]) is None
+
+
+def test_mask_of_ones_matches_plain_correlation():
+    rng = np.random.default_rng(1)
+    a, b = rng.random(64), rng.random(64)
+    plain = SyncAnalyzer.cross_correlation(a, b, 5)
+    masked = SyncAnalyzer.cross_correlation(a, b, 5, np.ones(64, dtype=bool))
+    assert np.allclose(plain, masked)